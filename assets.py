@@ -0,0 +1,217 @@
+"""Self-hosted, bundled and fingerprinted static assets.
+
+Third-party libraries are downloaded once into ``static/vendor`` so the app
+works without internet access on the plant network. ``build`` then
+concatenates each bundle in ``BUNDLES`` unchanged and writes the result to
+``static/dist/<name>.<hash>.<ext>`` together with a ``manifest.json``
+mapping bundle names to those files. Sources are not minified; gzip in
+front of the app recovers most of the size. Fingerprinted files
+never change, so they can be served with an ``immutable`` cache header.
+
+Until a build has been run, :class:`AssetManifest` falls back to the
+individual source files (or the CDN for vendor files that have not been
+downloaded), so a fresh checkout keeps working.
+"""
+
+import hashlib
+import json
+import os
+import re
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+# static-relative path -> pinned upstream URL
+VENDOR_ASSETS = {
+    'vendor/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+    'vendor/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+    'vendor/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+    'vendor/jquery.min.js': 'https://code.jquery.com/jquery-3.6.0.min.js',
+    'vendor/jquery.dataTables.min.css': 'https://cdn.datatables.net/1.13.4/css/jquery.dataTables.min.css',
+    'vendor/jquery.dataTables.min.js': 'https://cdn.datatables.net/1.13.4/js/jquery.dataTables.min.js',
+    'vendor/jspdf.umd.min.js': 'https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js',
+    'vendor/jspdf.plugin.autotable.min.js': 'https://cdn.jsdelivr.net/npm/jspdf-autotable@3.5.25/dist/jspdf.plugin.autotable.min.js',
+}
+
+# bundle name -> static-relative source files, in load order
+BUNDLES = {
+    'base.css': [
+        'vendor/bootstrap.min.css',
+        'css/theme.css',
+        'css/style.css',
+        'css/bootstrap_overrides.css',
+    ],
+    'base.js': [
+        'vendor/bootstrap.bundle.min.js',
+        'js/asset_loader.js',
+        'js/theme.js',
+        'js/editable.js',
+        'js/sql_popup.js',
+        'js/validation.js',
+        'js/data_events.js',
+    ],
+    'charts.js': ['vendor/chart.umd.js'],
+    'datatables.css': ['vendor/jquery.dataTables.min.css'],
+    'datatables.js': ['vendor/jquery.min.js', 'vendor/jquery.dataTables.min.js'],
+    # Loaded on demand through window.loadAssets()
+    'pdf.js': [
+        'vendor/jspdf.umd.min.js',
+        'vendor/jspdf.plugin.autotable.min.js',
+        'js/html2canvas.min.js',
+    ],
+    'report_window.js': ['js/report_window.js'],
+    # Per-page scripts
+    'aoi.js': [
+        'js/report_utils.js',
+        'js/std_chart.js',
+        'js/chart_modal.js',
+        'js/aoi_dashboard.js',
+        'js/tabs.js',
+        'js/aoi_sql.js',
+    ],
+    'final_inspect.js': [
+        'js/report_utils.js',
+        'js/std_chart.js',
+        'js/aoi_dashboard.js',
+        'js/tabs.js',
+        'js/aoi_sql.js',
+    ],
+    'analysis.js': [
+        'js/report_utils.js',
+        'js/tabs.js',
+        'js/std_chart.js',
+        'js/analysis.js',
+        'js/moat_sql.js',
+    ],
+    'aoi_operator_report.js': ['js/aoi_operator_report.js'],
+    'control_chart.js': ['js/chart-popup.js'],
+    'compare_aoi_fi.js': [
+        'js/report_utils.js',
+        'js/tabs.js',
+        'js/chart_modal.js',
+        'js/aoi_fi_compare.js',
+    ],
+    'jobs.js': ['js/report_utils.js', 'js/jobs.js'],
+    'operator_grades.js': ['js/operator_grades.js'],
+    'part_markings.js': ['js/report_utils.js', 'js/part_markings.js'],
+    'reports.js': ['js/generate_reports.js'],
+    'rework.js': ['js/report_utils.js', 'js/stencil_lookup.js'],
+}
+
+# Bundles fetched by the browser only when a feature needs them
+LAZY_BUNDLES = ('pdf.js', 'report_window.js')
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+
+_SOURCE_MAP = re.compile(r'^\s*(//|/\*)# sourceMappingURL=.*$', re.MULTILINE)
+
+
+def _fetch_url(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        return resp.read()
+
+
+def vendor(static_dir: str, assets: Dict[str, str] = VENDOR_ASSETS,
+           fetch: Callable[[str], bytes] = _fetch_url, force: bool = False) -> List[str]:
+    """Download missing vendor files into *static_dir* and return their paths."""
+    written = []
+    for path, url in assets.items():
+        target = os.path.join(static_dir, path)
+        if os.path.exists(target) and not force:
+            continue
+        data = fetch(url)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as fh:
+            fh.write(data)
+        written.append(path)
+    return written
+
+
+def _read_source(static_dir: str, path: str) -> str:
+    with open(os.path.join(static_dir, path), encoding='utf-8') as fh:
+        return _SOURCE_MAP.sub('', fh.read()).rstrip() + '\n'
+
+
+def build(static_dir: str, bundles: Dict[str, List[str]] = BUNDLES) -> Dict[str, str]:
+    """Write fingerprinted bundles and the manifest into ``static/dist``.
+
+    Returns the manifest, which maps each bundle name to its
+    static-relative output path. Files left over from earlier builds are
+    removed.
+    """
+    missing = [p for files in bundles.values() for p in files
+               if not os.path.exists(os.path.join(static_dir, p))]
+    if missing:
+        raise FileNotFoundError(f"Missing asset sources: {', '.join(sorted(set(missing)))}")
+    dist = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name, files in bundles.items():
+        # A leading ';' keeps a file without a trailing semicolon from
+        # running into the next one
+        sep = '\n' if name.endswith('.css') else '\n;'
+        content = sep.join(_read_source(static_dir, p) for p in files).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{digest}{ext}'
+        with open(os.path.join(dist, filename), 'wb') as fh:
+            fh.write(content)
+        manifest[name] = f'{DIST_DIR}/{filename}'
+    keep = {os.path.basename(p) for p in manifest.values()} | {MANIFEST_NAME}
+    for filename in os.listdir(dist):
+        if filename not in keep:
+            os.remove(os.path.join(dist, filename))
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Resolve bundle names to URLs, preferring the built manifest.
+
+    ``url_for`` turns a static-relative path into a URL. The manifest is
+    re-read when its modification time changes, so rebuilding assets does
+    not require a restart.
+    """
+
+    def __init__(self, static_dir: str, url_for: Callable[[str], str],
+                 bundles: Dict[str, List[str]] = BUNDLES,
+                 vendor_assets: Dict[str, str] = VENDOR_ASSETS):
+        self.static_dir = static_dir
+        self.url_for = url_for
+        self.bundles = bundles
+        self.vendor_assets = vendor_assets
+        self._manifest: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+
+    @property
+    def manifest(self) -> Dict[str, str]:
+        path = os.path.join(self.static_dir, DIST_DIR, MANIFEST_NAME)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._manifest, self._mtime = {}, None
+            return self._manifest
+        if mtime != self._mtime:
+            with open(path) as fh:
+                self._manifest = json.load(fh)
+            self._mtime = mtime
+        return self._manifest
+
+    def urls(self, name: str) -> List[str]:
+        """Return the URLs to load for bundle *name*, in order."""
+        built = self.manifest.get(name)
+        if built:
+            return [self.url_for(built)]
+        urls = []
+        for path in self.bundles[name]:
+            if path in self.vendor_assets and not os.path.exists(os.path.join(self.static_dir, path)):
+                urls.append(self.vendor_assets[path])
+            else:
+                urls.append(self.url_for(path))
+        return urls
+
+    def lazy_urls(self) -> Dict[str, List[str]]:
+        """URLs of the on-demand bundles keyed by name without extension."""
+        return {os.path.splitext(name)[0]: self.urls(name) for name in LAZY_BUNDLES}
@@ -0,0 +1,350 @@
+"""Benchmark every page, JSON endpoint and ingestion path on synthetic data.
+
+    python benchmark.py --rows 100k --output bench.json
+    python benchmark.py --rows 100k --baseline bench.json
+
+The first form generates a database with :mod:`synthetic_data`, times each
+request through the Flask test client and writes the results as JSON. With
+``--baseline`` the run is compared against an earlier results file, and
+the exit status is 1 when a case got slower than ``--threshold`` (relative)
+and ``--min-delta-ms`` (absolute), or started failing.
+
+Generating millions of rows takes minutes; ``--db`` keeps the generated
+database and reuses it on later runs. Each run works on a copy, because
+the ingestion cases append rows.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from synthetic_data import DEFAULT_START, aoi_workbook, moat_workbook, parse_scale, populate
+
+# (case name, URL template); templates are filled from sample_context()
+ROUTES = [
+    ('home', '/'),
+    ('docs', '/docs'),
+    ('jobs', '/jobs'),
+    ('api_jobs', '/api/jobs'),
+    ('aoi', '/aoi'),
+    ('aoi_report_data_daily', '/aoi/report-data?freq=daily'),
+    ('aoi_report_data_weekly', '/aoi/report-data?freq=weekly'),
+    ('aoi_report_data_monthly', '/aoi/report-data?freq=monthly'),
+    ('final_inspect', '/final-inspect'),
+    ('fi_report_data_daily', '/final-inspect/report-data?freq=daily'),
+    ('fi_report_data_monthly', '/final-inspect/report-data?freq=monthly'),
+    ('analysis', '/analysis'),
+    ('analysis_chart_data', '/analysis/chart-data?start={start}&end={end}'),
+    ('analysis_stddev_data', '/analysis/stddev-data?start={start}&end={end}'),
+    ('analysis_spc_moat', '/analysis/spc-violations?type=moat'),
+    ('analysis_spc_aoi', '/analysis/spc-violations?type=aoi'),
+    ('analysis_report_data', '/analysis/report-data?freq=daily'),
+    ('compare', '/analysis/compare?start={start}&end={end}'),
+    ('compare_rows_aoi', '/analysis/compare/aoi/rows?start={start}&end={end}'),
+    ('compare_rows_fi', '/analysis/compare/fi/rows?start={start}&end={end}'),
+    ('compare_job', '/analysis/compare/jobs?job_number={job}'),
+    ('compare_jobs_batch', '/analysis/compare/jobs/batch?job_numbers={jobs}'),
+    ('operator_grades', '/analysis/operator-grades?start={start}&end={end}'),
+    ('operator_grades_json', '/analysis/operator-grades?start={start}&end={end}&format=json'),
+    ('operator_grade_series', '/analysis/operator-grades/series?freq=weekly'),
+    ('reports', '/reports'),
+    ('aoi_operator_report', '/reports/aoi-operators'),
+    ('aoi_operator_report_data', '/reports/aoi-operators/data?start={start}&end={end}'),
+    ('render_aoi_pdf', '/reports/render/aoi?period=weekly&format=pdf&start={start}&end={end}'),
+    ('render_fi_html', '/reports/render/fi?period=weekly&format=html&start={start}&end={end}'),
+    ('render_moat_pdf', '/reports/render/moat?period=weekly&format=pdf&start={start}&end={end}'),
+    ('snapshot_list', '/reports/snapshots/aoi-operators'),
+    ('snapshot_latest', '/reports/snapshots/aoi-operators/monthly/latest'),
+    ('filters_aoi', '/filters/aoi'),
+    ('filters_moat', '/filters/moat'),
+    ('export_aoi_csv', '/export/aoi?format=csv&start={start}&end={end}'),
+    ('export_moat_xlsx', '/export/moat?format=xlsx&start={start}&end={end}'),
+    ('uploads', '/uploads'),
+    ('metrics', '/metrics'),
+    ('integrations', '/admin/integrations'),
+    ('materials_status', '/admin/materials'),
+    ('part_markings', '/part-markings'),
+    ('rework', '/rework'),
+    ('settings', '/settings'),
+]
+
+# GET endpoints deliberately left out: auth, static files, the
+# long-lived event stream, pass-through file downloads and SAP lookups
+EXCLUDED_ENDPOINTS = {
+    'static', 'login', 'logout', 'data_events_feed', 'aoi_html',
+    'final_inspect_html', 'sap_material', 'sap_materials',
+}
+
+UPLOAD_ROWS = 500
+MOAT_UPLOAD_MODELS = 200
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 2.0
+
+_SQL_TIMING = re.compile(r'desc="(\d+) statements"')
+
+
+def uncovered_endpoints(app) -> List[str]:
+    """GET endpoints with no benchmark case, so new routes are not missed."""
+    adapter = app.url_map.bind('localhost')
+    covered = {adapter.match(path.split('?')[0])[0] for _, path in ROUTES}
+    return sorted(
+        rule.endpoint
+        for rule in app.url_map.iter_rules()
+        if 'GET' in rule.methods
+        and rule.endpoint not in covered
+        and rule.endpoint not in EXCLUDED_ENDPOINTS
+    )
+
+
+def sample_context(conn) -> Dict[str, str]:
+    """Pick the last 30 days of data and a few job numbers to query."""
+    end = conn.execute('SELECT MAX(report_date) FROM aoi_reports').fetchone()[0] or date.today().isoformat()
+    start = (date.fromisoformat(end) - timedelta(days=29)).isoformat()
+    jobs = [r[0] for r in conn.execute(
+        'SELECT DISTINCT job_number FROM aoi_reports WHERE report_date >= ? LIMIT 50', (start,)
+    )] or ['J100000']
+    return {'start': start, 'end': end, 'job': jobs[0], 'jobs': ','.join(jobs)}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'runs': len(ordered),
+    }
+
+
+def time_case(request: Callable, repeat: int, warmup: int) -> Dict:
+    """Time *request* (returning a response) and summarise the runs."""
+    samples = []
+    resp = None
+    for i in range(warmup + repeat):
+        start = time.perf_counter()
+        resp = request(i)
+        resp.get_data()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    result = summarize(samples)
+    result['status'] = resp.status_code
+    match = _SQL_TIMING.search(resp.headers.get('Server-Timing', ''))
+    result['sql_statements'] = int(match.group(1)) if match else None
+    return result
+
+
+def run_routes(client, ctx: Dict[str, str], repeat: int, warmup: int, only: Optional[str] = None) -> Dict[str, Dict]:
+    results = {}
+    for name, template in ROUTES:
+        if only and not re.search(only, name):
+            continue
+        path = template.format(**ctx)
+        result = time_case(lambda i: client.get(path), repeat, warmup)
+        result.update(kind='route', path=path)
+        results[name] = result
+    return results
+
+
+def _ingestion_cases(client, run_module, workdir: str, day: date) -> Dict[str, Callable]:
+    aoi_file = aoi_workbook(UPLOAD_ROWS)
+    moat_file = moat_workbook(MOAT_UPLOAD_MODELS)
+    ppm_root = os.path.join(workdir, 'ppm')
+
+    def upload(path, field, data, filename, **form):
+        form[field] = (io.BytesIO(data), filename)
+        return client.post(path, data=form, content_type='multipart/form-data')
+
+    def ppm_import(i):
+        folder = os.path.join(ppm_root, 'Line1', (day + timedelta(days=i)).strftime('%Y%m%d'))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f'ppm-{i}.xlsx'), 'wb') as fh:
+            fh.write(moat_file)
+        run_module.app.config['PUBLIC_PPM_DIR'] = ppm_root
+        message = run_module.import_public_ppm_reports()
+        return run_module.app.response_class(message, status=200 if message.startswith('Imported') else 500)
+
+    single = {
+        'shift': '1', 'operator': 'OP0001', 'customer': 'CUST000', 'assembly': 'ASM-00001',
+        'qty_inspected': '100', 'qty_rejected': '2',
+    }
+    return {
+        'ingest_aoi_upload': lambda i: upload(
+            '/aoi', 'excel_file', aoi_file, 'aoi.xlsx', report_date=day.isoformat(), shift='1'),
+        'ingest_fi_upload': lambda i: upload(
+            '/final-inspect', 'excel_file', aoi_file, 'fi.xlsx', report_date=day.isoformat(), shift='1'),
+        'ingest_moat_upload': lambda i: upload(
+            '/analysis', 'ppm_report', moat_file, f'{day + timedelta(days=i)}_L1.xlsx'),
+        'ingest_aoi_single': lambda i: client.post('/aoi', data=dict(single, report_date=day.isoformat())),
+        'ingest_ppm_import': ppm_import,
+    }
+
+
+def run_ingestion(client, run_module, workdir: str, ctx: Dict[str, str], repeat: int,
+                  only: Optional[str] = None) -> Dict[str, Dict]:
+    day = date.fromisoformat(ctx['end']) + timedelta(days=1)
+    results = {}
+    for name, request in _ingestion_cases(client, run_module, workdir, day).items():
+        if only and not re.search(only, name):
+            continue
+        result = time_case(request, repeat, 0)
+        result.update(kind='ingest', path=None)
+        results[name] = result
+    return results
+
+
+def load_app(database: str, workdir: str):
+    """Import the app pointed at *database* with uploads kept in *workdir*."""
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    import run
+    run.DATABASE = database
+    run.SLOW_QUERY_SECONDS = float('inf')
+    run.app.config.update(
+        WTF_CSRF_ENABLED=False,
+        UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+        PUBLIC_PPM_DIR='',
+    )
+    os.makedirs(run.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    run.init_db()
+    return run
+
+
+def run_suite(rows: int, seed: int = 0, repeat: int = 5, warmup: int = 1, db: Optional[str] = None,
+              only: Optional[str] = None, ingest: bool = True, workdir: Optional[str] = None) -> Dict:
+    """Generate (or reuse) a database, run every case and return the results."""
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='spcapp-bench-')
+    database = os.path.join(workdir, 'bench.db')
+    try:
+        run = load_app(database, workdir)
+        meta = {'rows': rows, 'seed': seed, 'repeat': repeat, 'warmup': warmup}
+        if db and os.path.exists(db):
+            shutil.copyfile(db, database)
+            run.init_db()
+        else:
+            conn = run.get_db()
+            started = time.perf_counter()
+            meta['counts'] = populate(conn, rows, seed, password_hash=run.generate_password_hash('synthetic'))
+            conn.close()
+            meta['counts']['report_snapshots'] = run.run_report_snapshots(since=DEFAULT_START)
+            meta['generate_seconds'] = round(time.perf_counter() - started, 2)
+            if db:
+                shutil.copyfile(database, db)
+
+        conn = run.get_db()
+        ctx = sample_context(conn)
+        conn.close()
+        meta.update(
+            created_at=datetime.now().isoformat(timespec='seconds'),
+            python=platform.python_version(),
+            sqlite=sqlite3.sqlite_version,
+            context=ctx,
+        )
+        with run.app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess['user'] = 'ADMIN'
+            results = run_routes(client, ctx, repeat, warmup, only)
+            if ingest:
+                results.update(run_ingestion(client, run, workdir, ctx, repeat, only))
+        return {'meta': meta, 'results': results}
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD,
+            min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> List[Dict]:
+    """Return one row per case in both runs, flagging regressions.
+
+    A case regresses when its median grew by more than *threshold*
+    (relative) and *min_delta_ms* (absolute, to ignore noise on fast
+    routes), or when it no longer returns the status it used to.
+    """
+    rows = []
+    for name, cur in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        delta = cur['median_ms'] - base['median_ms']
+        ratio = cur['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        slower = ratio > 1 + threshold and delta > min_delta_ms
+        broken = cur['status'] != base['status'] and cur['status'] >= 400
+        rows.append({
+            'name': name,
+            'baseline_ms': base['median_ms'],
+            'current_ms': cur['median_ms'],
+            'ratio': round(ratio, 3),
+            'status': cur['status'],
+            'regression': slower or broken,
+        })
+    return rows
+
+
+def format_results(results: Dict) -> str:
+    lines = [f"{'case':32} {'status':>6} {'median ms':>10} {'p95 ms':>10} {'sql':>6}"]
+    for name, r in results['results'].items():
+        sql = '' if r['sql_statements'] is None else r['sql_statements']
+        lines.append(f"{name:32} {r['status']:>6} {r['median_ms']:>10.2f} {r['p95_ms']:>10.2f} {sql:>6}")
+    return '\n'.join(lines)
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = [f"{'case':32} {'baseline':>10} {'current':>10} {'ratio':>7}"]
+    for r in rows:
+        flag = '  REGRESSION' if r['regression'] else ''
+        lines.append(f"{r['name']:32} {r['baseline_ms']:>10.2f} {r['current_ms']:>10.2f} {r['ratio']:>7.2f}{flag}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', default='10k', help='Synthetic rows: 10k, 100k, 1m, 5m or any count.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case.')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per route before timing.')
+    parser.add_argument('--db', help='Generated database to reuse, created on first use.')
+    parser.add_argument('--only', help='Run only cases whose name matches this regex.')
+    parser.add_argument('--no-ingest', action='store_true', help='Skip the upload and import cases.')
+    parser.add_argument('--output', help='Write results JSON here.')
+    parser.add_argument('--baseline', help='Compare against this results JSON.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative slowdown that counts as a regression (0.25 = 25%%).')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help='Ignore slowdowns smaller than this many milliseconds.')
+    args = parser.parse_args(argv)
+
+    results = run_suite(parse_scale(args.rows), args.seed, args.repeat, args.warmup,
+                        args.db, args.only, not args.no_ingest)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline['meta'].get('rows') != results['meta']['rows']:
+            print(f"warning: baseline used {baseline['meta'].get('rows')} rows", file=sys.stderr)
+        rows = compare(baseline, results, args.threshold, args.min_delta_ms)
+        print()
+        print(format_comparison(rows))
+        regressions = [r['name'] for r in rows if r['regression']]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""In-process request and SQL metrics in the Prometheus text format.
+
+:class:`Registry` holds counters and histograms keyed by label values and
+renders them for a ``/metrics`` scrape. :class:`TimedConnection` is a
+``sqlite3`` connection factory that reports each statement and fetch to an
+observer, which lets the app count queries and SQL time per request
+without touching the call sites.
+
+Metrics live in the memory of one process; with several workers each
+exposes its own numbers, as the Prometheus client libraries do.
+"""
+
+import bisect
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Labels, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(n, '')) for n in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_label_text(self.labels, k)} {_number(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    """A value read from *collect* at scrape time.
+
+    *collect* returns ``(label values, value)`` pairs, so gauges can expose
+    state owned elsewhere, such as cache sizes.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]] = lambda: ()):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        return [
+            f'{self.name}{_label_text(self.labels, tuple(k))} {_number(v)}'
+            for k, v in sorted(self.collect())
+            if v is not None
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._data: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][idx] += 1
+            data[1] += value
+            data[2] += 1
+
+    def count(self, **labels) -> int:
+        data = self._data.get(self._key(labels))
+        return data[2] if data else 0
+
+    def sum(self, **labels) -> float:
+        data = self._data.get(self._key(labels))
+        return data[1] if data else 0.0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._data.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                running += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_label_text(self.labels, key, le)} {running}')
+            lines.append(f'{self.name}_sum{_label_text(self.labels, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_label_text(self.labels, key)} {count}')
+        return lines
+
+
+class Registry:
+    """A named collection of metrics rendered together."""
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        metric.name = self.prefix + metric.name
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), collect=lambda: ()) -> Gauge:
+        return self._add(Gauge(name, help, labels, collect))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines += self._metrics[name].render()
+        return '\n'.join(lines) + '\n'
+
+
+# Called with (sql, seconds, is_statement) after every execute or fetch
+QueryObserver = Callable[[str, float, bool], None]
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times ``execute*`` and ``fetch*`` calls.
+
+    Rows read by iterating the cursor directly are not timed, to keep the
+    per-row cost of large exports unchanged.
+    """
+
+    _sql = ''
+
+    def _timed(self, method, sql, statement, *args):
+        observer = type(self.connection).observer
+        if observer is None:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            observer(sql, time.perf_counter() - start, statement)
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        return self._timed(super().execute, sql, True, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        return self._timed(super().executemany, sql, True, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._sql = sql_script
+        return self._timed(super().executescript, sql_script, True, sql_script)
+
+    def fetchone(self):
+        return self._timed(super().fetchone, self._sql, False)
+
+    def fetchmany(self, size=None):
+        args = () if size is None else (size,)
+        return self._timed(super().fetchmany, self._sql, False, *args)
+
+    def fetchall(self):
+        return self._timed(super().fetchall, self._sql, False)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection factory whose cursors report to :attr:`observer`.
+
+    Use as ``sqlite3.connect(path, factory=TimedConnection)``; the class
+    attribute ``observer`` is shared by every connection.
+    """
+
+    observer: Optional[QueryObserver] = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts create plain cursors, so route them through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
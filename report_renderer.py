@@ -0,0 +1,245 @@
+"""Server-side rendering of report sections to PDF and HTML.
+
+A report is a title plus a list of sections. Each section is a dict with a
+``title`` and any of ``summary`` (a line of text), ``chart`` and ``table``::
+
+    {
+        'title': 'Operators',
+        'summary': 'Total inspected: 120',
+        'chart': {'kind': 'bar', 'labels': ['A', 'B'],
+                  'series': [{'label': 'Rejected', 'values': [3, 5]}]},
+        'table': {'columns': ['Operator', 'Rejected'], 'rows': [['A', 3]]},
+    }
+
+PDF output is written directly with the standard Helvetica fonts, so it
+needs no third-party packages and renders the same on every machine. The
+output is deterministic, which lets callers cache it by data generation.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+# A4 landscape in points
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+MARGIN = 36
+CHART_HEIGHT = 190
+ROW_HEIGHT = 14
+MAX_CHART_LABELS = 24
+
+# Series colours as RGB fractions, matching the dashboard charts
+PALETTE = [
+    (0.21, 0.64, 0.92),
+    (1.0, 0.39, 0.52),
+    (0.29, 0.75, 0.75),
+    (1.0, 0.62, 0.25),
+]
+
+
+def chart_layout(chart: dict, width: float, height: float) -> dict:
+    """Return drawing primitives for *chart* in a ``width`` x ``height`` box.
+
+    Coordinates use a top-left origin. Bars are ``(x, y, w, h, series)``
+    tuples, lines are lists of ``(x, y)`` points per series, ticks are
+    ``(y, label)`` pairs for the value axis and labels are ``(x, text)``
+    pairs along the bottom (omitted when there are too many to read).
+    """
+    labels = list(chart.get('labels', []))
+    series = chart.get('series', [])
+    values = [v for s in series for v in s['values'] if v is not None]
+    top = chart.get('max')
+    if top is None:
+        top = max(values, default=0) or 1
+    step = width / max(len(labels), 1)
+    scale = lambda v: height - (min(v, top) / top) * height  # noqa: E731
+
+    layout = {'bars': [], 'lines': [], 'ticks': [], 'labels': []}
+    for i in range(5):
+        value = top * i / 4
+        layout['ticks'].append((scale(value), f'{value:.3g}'))
+    if chart.get('kind') == 'line':
+        for s in series:
+            layout['lines'].append([
+                (step * (i + 0.5), scale(v))
+                for i, v in enumerate(s['values'])
+                if v is not None
+            ])
+    else:
+        group = step * 0.8 / max(len(series), 1)
+        for idx, s in enumerate(series):
+            for i, v in enumerate(s['values']):
+                if not v:
+                    continue
+                x = step * (i + 0.1) + group * idx
+                y = scale(v)
+                layout['bars'].append((x, y, group, height - y, idx))
+    if len(labels) <= MAX_CHART_LABELS:
+        layout['labels'] = [(step * (i + 0.5), str(l)) for i, l in enumerate(labels)]
+    return layout
+
+
+def format_cell(value) -> str:
+    """Format a table value the same way for PDF and HTML output."""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return str(value)
+
+
+def _escape(text: str) -> str:
+    # The fonts use WinAnsiEncoding, i.e. cp1252; anything outside it becomes '?'
+    text = text.encode('cp1252', 'replace').decode('cp1252')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _fit(text: str, width: float, size: float) -> str:
+    """Truncate *text* to roughly fit *width* points of Helvetica."""
+    limit = max(int(width / (size * 0.52)), 1)
+    return text if len(text) <= limit else text[:max(limit - 1, 1)] + '.'
+
+
+class _Canvas:
+    """Accumulates PDF content streams page by page."""
+
+    def __init__(self):
+        self.pages: List[List[str]] = []
+        self.y = 0.0
+        self.new_page()
+
+    def new_page(self):
+        self.pages.append([])
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def ensure(self, height: float):
+        if self.y - height < MARGIN:
+            self.new_page()
+
+    def text(self, x, y, text, size=9, bold=False):
+        font = 'F2' if bold else 'F1'
+        self.pages[-1].append(
+            f'BT /{font} {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET'
+        )
+
+    def rect(self, x, y, w, h, color):
+        r, g, b = color
+        self.pages[-1].append(f'{r:.3f} {g:.3f} {b:.3f} rg {x:.2f} {y:.2f} {w:.2f} {h:.2f} re f')
+
+    def polyline(self, points, color, width=1.0):
+        if not points:
+            return
+        r, g, b = color
+        path = [f'{points[0][0]:.2f} {points[0][1]:.2f} m']
+        path += [f'{x:.2f} {y:.2f} l' for x, y in points[1:]]
+        self.pages[-1].append(f'{r:.3f} {g:.3f} {b:.3f} RG {width} w ' + ' '.join(path) + ' S')
+
+
+def _draw_chart(canvas: _Canvas, chart: dict):
+    canvas.ensure(CHART_HEIGHT + 30)
+    left = MARGIN + 40
+    width = PAGE_WIDTH - left - MARGIN
+    top = canvas.y - 10
+    layout = chart_layout(chart, width, CHART_HEIGHT)
+    to_pdf = lambda x, y: (left + x, top - y)  # noqa: E731
+
+    for y, label in layout['ticks']:
+        canvas.polyline([to_pdf(0, y), to_pdf(width, y)], (0.88, 0.88, 0.88), 0.5)
+        canvas.text(MARGIN, top - y - 3, label, 7)
+    for x, y, w, h, idx in layout['bars']:
+        px, py = to_pdf(x, y + h)
+        canvas.rect(px, py, w, h, PALETTE[idx % len(PALETTE)])
+    for idx, points in enumerate(layout['lines']):
+        canvas.polyline([to_pdf(x, y) for x, y in points], PALETTE[idx % len(PALETTE)], 1.5)
+    canvas.polyline([to_pdf(0, 0), to_pdf(0, CHART_HEIGHT), to_pdf(width, CHART_HEIGHT)], (0, 0, 0), 0.8)
+    step = width / max(len(chart.get('labels', [])), 1)
+    for x, label in layout['labels']:
+        px, py = to_pdf(x, CHART_HEIGHT)
+        text = _fit(label, step, 6)
+        canvas.text(px - len(text) * 1.5, py - 9, text, 6)
+
+    legend_x = left
+    for idx, s in enumerate(chart.get('series', [])):
+        canvas.rect(legend_x, top - CHART_HEIGHT - 24, 8, 8, PALETTE[idx % len(PALETTE)])
+        canvas.text(legend_x + 11, top - CHART_HEIGHT - 23, s['label'], 8)
+        legend_x += 20 + len(s['label']) * 5
+    canvas.y = top - CHART_HEIGHT - 34
+
+
+def _draw_table(canvas: _Canvas, table: dict):
+    columns = table['columns']
+    width = (PAGE_WIDTH - 2 * MARGIN) / max(len(columns), 1)
+
+    def header():
+        for i, col in enumerate(columns):
+            canvas.text(MARGIN + i * width + 2, canvas.y - 10, _fit(col, width - 4, 8), 8, bold=True)
+        canvas.polyline(
+            [(MARGIN, canvas.y - ROW_HEIGHT + 1), (PAGE_WIDTH - MARGIN, canvas.y - ROW_HEIGHT + 1)],
+            (0, 0, 0), 0.5,
+        )
+        canvas.y -= ROW_HEIGHT
+
+    canvas.ensure(ROW_HEIGHT * 2)
+    header()
+    for row in table['rows']:
+        if canvas.y - ROW_HEIGHT < MARGIN:
+            canvas.new_page()
+            header()
+        for i, value in enumerate(row):
+            canvas.text(MARGIN + i * width + 2, canvas.y - 10, _fit(format_cell(value), width - 4, 8), 8)
+        canvas.y -= ROW_HEIGHT
+    canvas.y -= 10
+
+
+def render_pdf(title: str, sections: Sequence[dict], subtitle: Optional[str] = None) -> bytes:
+    """Render *sections* as a PDF document and return its bytes."""
+    canvas = _Canvas()
+    canvas.text(MARGIN, canvas.y - 16, title, 16, bold=True)
+    canvas.y -= 24
+    if subtitle:
+        canvas.text(MARGIN, canvas.y - 10, subtitle, 9)
+        canvas.y -= 18
+    for section in sections:
+        canvas.ensure(40)
+        canvas.text(MARGIN, canvas.y - 12, section['title'], 12, bold=True)
+        canvas.y -= 18
+        if section.get('summary'):
+            canvas.text(MARGIN, canvas.y - 9, section['summary'], 9)
+            canvas.y -= 14
+        if section.get('chart'):
+            _draw_chart(canvas, section['chart'])
+        if section.get('table'):
+            _draw_table(canvas, section['table'])
+    return _serialize(canvas.pages)
+
+
+def _serialize(pages: List[List[str]]) -> bytes:
+    objects: Dict[int, bytes] = {
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        4: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    }
+    kids = []
+    for i, ops in enumerate(pages):
+        page_id, content_id = 5 + 2 * i, 6 + 2 * i
+        stream = '\n'.join(ops).encode('cp1252')
+        objects[content_id] = (
+            f'<< /Length {len(stream)} >>\nstream\n'.encode() + stream + b'\nendstream'
+        )
+        objects[page_id] = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_id} 0 R >>'
+        ).encode()
+        kids.append(f'{page_id} 0 R')
+    objects[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[2] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += f'{num} 0 obj\n'.encode() + objects[num] + b'\nendobj\n'
+    xref = len(out)
+    count = max(objects) + 1
+    out += f'xref\n0 {count}\n0000000000 65535 f \n'.encode()
+    for num in range(1, count):
+        out += f'{offsets[num]:010d} 00000 n \n'.encode()
+    out += f'trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(out)
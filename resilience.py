@@ -0,0 +1,241 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Type
+
+
+class CircuitOpenError(TimeoutError):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures of an external dependency.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls raise :class:`CircuitOpenError` without touching the dependency.
+    Once ``reset_timeout`` seconds have passed a single probe call is let
+    through (half-open); success closes the circuit, failure reopens it.
+    Only exceptions in ``failures`` count; a lookup miss such as ``KeyError``
+    is a healthy answer.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        *,
+        failures: Tuple[Type[BaseException], ...] = (TimeoutError, OSError),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = failures
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.calls = 0
+        self.failed_calls = 0
+        self.rejected_calls = 0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._probing):
+                self.rejected_calls += 1
+                raise CircuitOpenError('Circuit open; dependency marked unavailable')
+            if self.state == self.HALF_OPEN:
+                self._probing = True
+            self.calls += 1
+
+    def _record(self, ok: bool):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.consecutive_failures = 0
+                self.state = self.CLOSED
+                return
+            self.failed_calls += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call *func* through the breaker."""
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except self.failures:
+            self._record(False)
+            raise
+        except Exception:
+            self._record(True)
+            raise
+        self._record(True)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'calls': self.calls,
+                'failed_calls': self.failed_calls,
+                'rejected_calls': self.rejected_calls,
+                'times_opened': self.times_opened,
+            }
+
+
+class SWRCache:
+    """TTL cache that serves stale entries while refreshing them in the background.
+
+    Entries younger than ``ttl`` are fresh. Entries up to ``ttl + stale_ttl``
+    old are returned as-is by :meth:`get` while a background refresh runs;
+    older entries are treated as missing. With ``max_entries`` set, the least
+    recently used entry is evicted once the cache is full.
+    """
+
+    FRESH = 'fresh'
+    STALE = 'stale'
+    MISSING = 'missing'
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        stale_ttl: float = 3600.0,
+        *,
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='swr-refresh')
+
+    def _state(self, key: Hashable) -> Tuple[str, Any]:
+        entry = self._data.get(key)
+        if entry:
+            self._data.move_to_end(key)
+        age = self.clock() - entry[0] if entry else None
+        if age is not None and age < self.ttl:
+            return self.FRESH, entry[1]
+        if age is not None and age < self.ttl + self.stale_ttl:
+            return self.STALE, entry[1]
+        return self.MISSING, None
+
+    def peek(self, key: Hashable) -> Tuple[str, Any]:
+        """Return ``(state, value)`` for *key* without counting a lookup."""
+        with self._lock:
+            return self._state(key)
+
+    def lookup(self, key: Hashable) -> Tuple[str, Any]:
+        """Return ``(state, value)`` for *key* and record the hit or miss."""
+        with self._lock:
+            state, value = self._state(key)
+            if state == self.FRESH:
+                self.hits += 1
+            elif state == self.STALE:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+            return state, value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (self.clock(), value)
+            self._data.move_to_end(key)
+            while self.max_entries and len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the value for *key*, calling *loader* when it is missing.
+
+        A stale value is returned immediately and refreshed in the background;
+        if that refresh fails the stale value stays in place.
+        """
+        state, value = self.lookup(key)
+        if state == self.FRESH:
+            return value
+        if state == self.STALE:
+            self.refresh(key, loader)
+            return value
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def refresh(self, key: Hashable, loader: Callable[[], Any]):
+        """Reload *key* in the background unless a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, loader)
+
+    def refresh_many(self, keys: Iterable[Hashable], loader: Callable[[list], Dict]):
+        """Reload *keys* with one background call to ``loader(keys)``.
+
+        *loader* returns a mapping of key to value; keys it leaves out are
+        stored as ``None``. Keys already being refreshed are skipped.
+        """
+        with self._lock:
+            todo = [k for k in dict.fromkeys(keys) if k not in self._refreshing]
+            self._refreshing.update(todo)
+        if todo:
+            self._executor.submit(self._refresh_many, todo, loader)
+
+    def _refresh_many(self, keys: list, loader: Callable[[list], Dict]):
+        try:
+            values = loader(keys)
+            for key in keys:
+                self.put(key, values.get(key))
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(keys)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        try:
+            self.put(key, loader())
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refresh_errors': self.refresh_errors,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else None,
+            }
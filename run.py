@@ -1,5 +1,6 @@
 from flask import (
     Flask,
+    Response,
     render_template,
     request,
     redirect,
@@ -8,23 +9,38 @@ from flask import (
     send_from_directory,
     session,
     flash,
+    g,
+    has_request_context,
 )
 from flask_wtf import CSRFProtect
+from markupsafe import Markup
 from functools import wraps
 import os
 import sqlite3
+import threading
+import time
+import click
+import csv
+import hashlib
+import hmac
+import io
+import json
+import tempfile
 import pandas as pd
+from openpyxl import Workbook
 from datetime import datetime, timedelta, date
 import re
+import socket
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from sap_client import create_sap_service
-
-try:
-    import requests  # Optional; used for Supabase queries
-except Exception:  # pragma: no cover - fail gracefully if not installed
-    requests = None
-from urllib.parse import quote
+from spc_rules import RULES, SeriesState, evaluate_point
+from supabase_client import create_fi_rate_client
+from resilience import CircuitOpenError
+from report_renderer import PALETTE, chart_layout, format_cell, render_pdf
+from metrics import COUNT_BUCKETS, Registry, TimedConnection
+from assets import MANIFEST_NAME, AssetManifest, build as build_asset_bundles, vendor as vendor_assets
+from synthetic_data import DEFAULT_START, parse_scale, populate as populate_synthetic_data
 
 def parse_aoi_rows(path: str):
     """Return rows from an AOI Excel file without headers."""
@@ -51,6 +67,12 @@ def parse_aoi_rows(path: str):
 app = Flask(__name__)
 csrf = CSRFProtect(app)
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Fingerprinted bundles from `flask build-assets`, falling back to the
+# individual source files when no build exists
+asset_manifest = AssetManifest(app.static_folder, lambda path: url_for('static', filename=path))
+app.add_template_global(asset_manifest.urls, 'asset_urls')
+app.add_template_global(asset_manifest.lazy_urls, 'lazy_asset_urls')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 # Root directory for public PPM reports (shared drive)
 app.config['PUBLIC_PPM_DIR'] = os.environ.get('PUBLIC_PPM_DIR', '')
 # Message populated at startup when attempting to import public reports
@@ -63,18 +85,541 @@ if not secret_key:
 app.secret_key = secret_key
 DATABASE = 'spcapp.db'
 USE_SAP = os.environ.get('USE_SAP', 'false').lower() == 'true'
-sap_service = create_sap_service(use_real=USE_SAP)
+sap_service = create_sap_service(
+    use_real=USE_SAP,
+    base_url=os.environ.get('SAP_BASE_URL', ''),
+    api_key=os.environ.get('SAP_API_KEY'),
+    timeout=float(os.environ.get('SAP_TIMEOUT', 5)),
+    max_concurrency=int(os.environ.get('SAP_MAX_CONCURRENCY', 4)),
+)
+# Supabase FI reject-rate client, rebuilt if the configured URL or key changes
+_fi_rate_client = None
+
+
+def get_fi_rate_client():
+    """Return the shared Supabase FI rate client, or ``None`` if not configured."""
+    global _fi_rate_client
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY') or os.environ.get('SUPABASE_SERVICE_KEY')
+    client = _fi_rate_client
+    if client is None or (client.url, client.key) != ((url or '').rstrip('/'), key):
+        client = _fi_rate_client = create_fi_rate_client(
+            url,
+            key,
+            ttl=float(os.environ.get('SUPABASE_CACHE_TTL', 300)),
+            budget=float(os.environ.get('SUPABASE_TIME_BUDGET', 0.5)),
+        )
+    return client
+
+
+def material_descriptions(material_ids):
+    """Return SAP descriptions for *material_ids*, or ``{}`` if SAP is unavailable."""
+    ids = [str(m).strip() for m in material_ids if m is not None and str(m).strip()]
+    if not ids:
+        return {}
+    try:
+        materials = fetch_materials(ids, live=False)
+    except Exception as e:
+        # Descriptions are decoration; an SAP outage must not break the page
+        app.logger.warning('SAP material descriptions unavailable: %s', e)
+        return {}
+    return {m: material['description'] for m, material in materials.items()}
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Repeated text attributes are stored once in small dimension tables and
+# referenced from the fact tables by integer key. Maps the column exposed by
+# the compatibility views to its (dimension table, fact key column).
+DIMENSION_TABLES = {
+    'shift': ('dim_shift', 'shift_id'),
+    'operator': ('dim_operator', 'operator_id'),
+    'customer': ('dim_customer', 'customer_id'),
+    'assembly': ('dim_assembly', 'assembly_id'),
+    'model_name': ('dim_model', 'model_id'),
+    'line': ('dim_line', 'line_id'),
+}
+
+# Views keep the original table names and column order so existing queries,
+# uploads and the SQL consoles work unchanged. Maps view name to
+# (fact table, [(column, type), ...]).
+FACT_TABLES = {
+    'aoi_reports': ('aoi_facts', [
+        ('report_date', 'TEXT NOT NULL'),
+        ('shift', 'TEXT'),
+        ('operator', 'TEXT'),
+        ('customer', 'TEXT'),
+        ('assembly', 'TEXT'),
+        ('rev', 'TEXT'),
+        ('job_number', 'TEXT'),
+        ('qty_inspected', 'INTEGER'),
+        ('qty_rejected', 'INTEGER'),
+        ('additional_info', 'TEXT'),
+        ('job_key', 'TEXT'),
+    ]),
+    'fi_reports': ('fi_facts', [
+        ('report_date', 'TEXT NOT NULL'),
+        ('shift', 'TEXT'),
+        ('operator', 'TEXT'),
+        ('customer', 'TEXT'),
+        ('assembly', 'TEXT'),
+        ('rev', 'TEXT'),
+        ('job_number', 'TEXT'),
+        ('qty_inspected', 'INTEGER'),
+        ('qty_rejected', 'INTEGER'),
+        ('additional_info', 'TEXT'),
+        ('job_key', 'TEXT'),
+    ]),
+    'moat': ('moat_facts', [
+        ('model_name', 'TEXT'),
+        ('total_boards', 'INTEGER'),
+        ('total_parts_per_board', 'INTEGER'),
+        ('total_parts', 'INTEGER'),
+        ('ng_parts', 'INTEGER'),
+        ('ng_ppm', 'REAL'),
+        ('falsecall_parts', 'INTEGER'),
+        ('falsecall_ppm', 'REAL'),
+        ('upload_time', 'TEXT'),
+        ('filename', 'TEXT'),
+        ('report_date', 'TEXT'),
+        ('line', 'TEXT'),
+    ]),
+}
+
+# Columns computed by the write triggers rather than supplied by callers.
+# Maps derived column to the column it is computed from.
+DERIVED_COLUMNS = {
+    'job_key': 'job_number',
+}
+
+# --- Instrumentation ---
+# Statements at least this slow are logged and counted
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.25))
+# Bearer token for Prometheus; without it /metrics is admin-only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+app_metrics = Registry('spcapp_')
+REQUEST_SECONDS = app_metrics.histogram(
+    'request_duration_seconds', 'Time to build a response, by endpoint.', ('endpoint', 'method'),
+)
+REQUESTS = app_metrics.counter(
+    'requests_total', 'Responses sent, by endpoint and status.', ('endpoint', 'method', 'status'),
+)
+REQUEST_SQL_STATEMENTS = app_metrics.histogram(
+    'request_sql_statements', 'SQL statements executed per request.', ('endpoint',), COUNT_BUCKETS,
+)
+REQUEST_SQL_SECONDS = app_metrics.histogram(
+    'request_sql_seconds', 'Time spent in SQLite per request.', ('endpoint',),
+)
+SLOW_QUERIES = app_metrics.counter('slow_queries_total', 'SQL calls slower than the slow-query threshold.')
+app_metrics.gauge(
+    'slow_query_threshold_seconds', 'Slow-query log threshold.',
+    collect=lambda: [((), SLOW_QUERY_SECONDS)],
+)
+CACHE_LOOKUPS = app_metrics.counter(
+    'cache_lookups_total', 'In-process cache lookups, by cache and hit or miss.', ('cache', 'result'),
+)
+IMPORTS = app_metrics.counter('imports_total', 'Files imported, by source.', ('source',))
+IMPORTED_ROWS = app_metrics.counter('imported_rows_total', 'Rows written by imports, by source.', ('source',))
+DATA_WRITES = app_metrics.counter('data_writes_total', 'Committed write batches, by table.', ('table',))
+
+
+def _external_cache_stats():
+    """Yield SAP and Supabase cache counters for the metrics gauge."""
+    client = get_fi_rate_client()
+    services = {'sap': sap_service.metrics(), 'supabase': client.metrics() if client else None}
+    for service, stats in services.items():
+        cache = (stats or {}).get('cache') or {}
+        for stat in ('size', 'hits', 'stale_hits', 'misses', 'refresh_errors', 'evictions'):
+            if stat in cache:
+                yield (service, stat), cache[stat]
+
+
+app_metrics.gauge(
+    'external_cache', 'SAP and Supabase lookup cache statistics.', ('service', 'stat'),
+    collect=_external_cache_stats,
+)
+
+
+def count_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _observe_query(sql, seconds, statement):
+    """Add a timed SQL call to the current request and log it if slow."""
+    if seconds >= SLOW_QUERY_SECONDS:
+        SLOW_QUERIES.inc()
+        app.logger.warning('Slow query (%.3fs): %s', seconds, ' '.join(sql.split())[:500])
+    if has_request_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats[0] += statement
+            stats[1] += seconds
+
+
+TimedConnection.observer = _observe_query
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.sql_stats = [0, 0.0]
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record latency and SQL totals; streamed bodies count until the first byte."""
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    statements, sql_seconds = g.pop('sql_stats')
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    REQUEST_SQL_STATEMENTS.observe(statements, endpoint=endpoint)
+    REQUEST_SQL_SECONDS.observe(sql_seconds, endpoint=endpoint)
+    response.headers['Server-Timing'] = (
+        f'app;dur={elapsed * 1000:.1f}, sql;dur={sql_seconds * 1000:.1f};desc="{statements} statements"'
+    )
+    return response
+
+
 # --- Database helpers ---
-def get_db():
-    conn = sqlite3.connect(DATABASE)
+def get_db(database=None):
+    conn = sqlite3.connect(database or DATABASE, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def normalize_job_key(value):
+    """Return the canonical job key used to join AOI and FI rows.
+
+    Whitespace is removed, letters are upper-cased and numbers that pandas
+    read as floats (``12345.0``) lose their zero fraction. Mirrors
+    :func:`job_key_sql`, which computes the stored ``job_key`` column.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    key = re.sub(r'[ \t\n\r]', '', str(value)).upper()
+    match = re.fullmatch(r'([0-9]+)\.0+', key)
+    if match:
+        key = match.group(1)
+    return key or None
+
+
+def job_key_sql(expr: str) -> str:
+    """Return a SQL expression computing :func:`normalize_job_key` of *expr*."""
+    key = (
+        f"UPPER(REPLACE(REPLACE(REPLACE(REPLACE({expr}, ' ', ''), "
+        "char(9), ''), char(10), ''), char(13), ''))"
+    )
+    return (
+        f"NULLIF(CASE WHEN {key} GLOB '[0-9]*.0*' AND NOT {key} GLOB '*[^0-9.]*' "
+        f"AND rtrim(substr({key}, instr({key}, '.') + 1), '0') = '' "
+        f"THEN substr({key}, 1, instr({key}, '.') - 1) ELSE {key} END, '')"
+    )
+
+
+def dim_filter(field: str) -> str:
+    """Return a fact-table predicate matching dimension *field* by name."""
+    table, key = DIMENSION_TABLES[field]
+    return f'{key} = (SELECT id FROM {table} WHERE name = ?)'
+
+
+def _create_star_schema(conn, view: str):
+    """Create the fact table, compatibility view and write triggers for *view*."""
+    fact, columns = FACT_TABLES[view]
+    fact_cols = []
+    for name, col_type in columns:
+        if name in DIMENSION_TABLES:
+            table, key = DIMENSION_TABLES[name]
+            fact_cols.append(f'{key} INTEGER REFERENCES {table}(id)')
+        else:
+            fact_cols.append(f'{name} {col_type}')
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS {fact} ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, ' + ', '.join(fact_cols) + ')'
+    )
+
+    select_cols = ['f.id']
+    joins = []
+    for name, _ in columns:
+        if name in DIMENSION_TABLES:
+            table, key = DIMENSION_TABLES[name]
+            select_cols.append(f'{table}.name AS {name}')
+            joins.append(f'LEFT JOIN {table} ON {table}.id = f.{key}')
+        else:
+            select_cols.append(f'f.{name}')
+    conn.execute(
+        f'CREATE VIEW IF NOT EXISTS {view} AS SELECT ' + ', '.join(select_cols)
+        + f' FROM {fact} f ' + ' '.join(joins)
+    )
+
+    # Register any new dimension values before resolving their keys.
+    dim_inserts = ''.join(
+        f'INSERT OR IGNORE INTO {DIMENSION_TABLES[name][0]} (name) '
+        f'SELECT NEW.{name} WHERE NEW.{name} IS NOT NULL; '
+        for name, _ in columns
+        if name in DIMENSION_TABLES
+    )
+    targets = []
+    values = []
+    for name, _ in columns:
+        if name in DIMENSION_TABLES:
+            table, key = DIMENSION_TABLES[name]
+            targets.append(key)
+            values.append(f'(SELECT id FROM {table} WHERE name = NEW.{name})')
+        elif name in DERIVED_COLUMNS:
+            targets.append(name)
+            values.append(job_key_sql(f'NEW.{DERIVED_COLUMNS[name]}'))
+        else:
+            targets.append(name)
+            values.append(f'NEW.{name}')
+    conn.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {view}_insert INSTEAD OF INSERT ON {view} '
+        f'BEGIN {dim_inserts}'
+        f'INSERT INTO {fact} (id, {", ".join(targets)}) '
+        f'VALUES (NEW.id, {", ".join(values)}); END'
+    )
+    assignments = ', '.join(f'{t} = {v}' for t, v in zip(targets, values))
+    conn.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {view}_update INSTEAD OF UPDATE ON {view} '
+        f'BEGIN {dim_inserts}'
+        f'UPDATE {fact} SET {assignments} WHERE id = OLD.id; END'
+    )
+    conn.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {view}_delete INSTEAD OF DELETE ON {view} '
+        f'BEGIN DELETE FROM {fact} WHERE id = OLD.id; END'
+    )
+
+
+def migrate_star_schema(conn):
+    """Move row-per-text tables into dimension-keyed fact tables.
+
+    Older databases store ``aoi_reports``, ``fi_reports`` and ``moat`` as plain
+    tables. Their rows are copied through the new views (preserving ids) and
+    the original tables are dropped. Fresh databases simply get the new schema.
+    Returns ``True`` when legacy rows were migrated.
+    """
+    migrated = False
+    for table, _ in DIMENSION_TABLES.values():
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE)'
+        )
+    for view, (fact, columns) in FACT_TABLES.items():
+        row = conn.execute(
+            'SELECT type FROM sqlite_master WHERE name = ?', (view,)
+        ).fetchone()
+        legacy = row is not None and row['type'] == 'table'
+        if legacy:
+            conn.execute(f'ALTER TABLE {view} RENAME TO {view}_legacy')
+        # Fact tables from earlier versions gain any new columns; the view and
+        # its triggers are rebuilt to expose and maintain them.
+        fact_cols = {r['name'] for r in conn.execute(f'PRAGMA table_info({fact})')}
+        added = [
+            (name, col_type) for name, col_type in columns
+            if fact_cols and name not in DIMENSION_TABLES and name not in fact_cols
+        ]
+        for name, col_type in added:
+            conn.execute(f'ALTER TABLE {fact} ADD COLUMN {name} {col_type}')
+        if added:
+            conn.execute(f'DROP VIEW IF EXISTS {view}')
+            for action in ('insert', 'update', 'delete'):
+                conn.execute(f'DROP TRIGGER IF EXISTS {view}_{action}')
+        _create_star_schema(conn, view)
+        for name, _ in added:
+            if name in DERIVED_COLUMNS:
+                conn.execute(
+                    f'UPDATE {fact} SET {name} = {job_key_sql(DERIVED_COLUMNS[name])}'
+                )
+        if legacy:
+            names = ', '.join(
+                ['id'] + [name for name, _ in columns if name not in DERIVED_COLUMNS]
+            )
+            conn.execute(
+                f'INSERT INTO {view} ({names}) SELECT {names} FROM {view}_legacy ORDER BY id'
+            )
+            conn.execute(f'DROP TABLE {view}_legacy')
+            migrated = True
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_aoi_facts_date ON aoi_facts(report_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fi_facts_date ON fi_facts(report_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_moat_facts_date ON moat_facts(report_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_moat_facts_filename ON moat_facts(filename)')
+    conn.execute('DROP INDEX IF EXISTS idx_aoi_facts_job')
+    conn.execute('DROP INDEX IF EXISTS idx_fi_facts_job')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_aoi_facts_job_key ON aoi_facts(job_key)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fi_facts_job_key ON fi_facts(job_key)')
+    return migrated
+
+
+# strftime() formats for the PPM report periods
+PPM_PERIODS = {
+    'daily': '%Y-%m-%d',
+    'weekly': '%Y-%W',
+    'monthly': '%Y-%m',
+    'yearly': '%Y',
+}
+
+
+def _ppm_rollup_sql(row: str, sign: int) -> str:
+    """Return trigger SQL adding (``sign=1``) or removing a MOAT *row* from the rollups."""
+    freqs = ' UNION ALL '.join(
+        f"SELECT '{freq}' AS freq, strftime('{fmt}', {row}.report_date) AS period"
+        for freq, fmt in PPM_PERIODS.items()
+    )
+    sql = (
+        'INSERT INTO moat_ppm_rollup '
+        '(freq, line, period, n_rows, boards, total_parts, falsecall_parts, ng_parts) '
+        f'SELECT p.freq, s.line, p.period, {sign}, '
+        f'{sign} * COALESCE({row}.total_boards, 0), '
+        f'{sign} * COALESCE({row}.total_parts, 0), '
+        f'{sign} * COALESCE({row}.falsecall_parts, 0), '
+        f'{sign} * COALESCE({row}.ng_parts, 0) '
+        f'FROM ({freqs}) p, '
+        f"(SELECT '' AS line UNION ALL SELECT name FROM dim_line WHERE id = {row}.line_id) s "
+        'WHERE p.period IS NOT NULL '
+        'ON CONFLICT (freq, line, period) DO UPDATE SET '
+        'n_rows = n_rows + excluded.n_rows, '
+        'boards = boards + excluded.boards, '
+        'total_parts = total_parts + excluded.total_parts, '
+        'falsecall_parts = falsecall_parts + excluded.falsecall_parts, '
+        'ng_parts = ng_parts + excluded.ng_parts; '
+    )
+    if sign < 0:
+        sql += (
+            'DELETE FROM moat_ppm_rollup WHERE n_rows <= 0 '
+            f'AND (freq, period) IN (SELECT freq, period FROM ({freqs})); '
+        )
+    return sql
+
+
+def init_ppm_rollups(conn):
+    """Create the PPM period rollups and the triggers that maintain them.
+
+    ``moat_ppm_rollup`` holds board and part sums per period for every
+    frequency in :data:`PPM_PERIODS`, both per line and overall (``line = ''``).
+    Triggers on ``moat_facts`` keep it current for uploads, shared-drive
+    imports and deletions. Existing MOAT rows are rolled up once on creation.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS moat_ppm_rollup (
+            freq TEXT NOT NULL,
+            line TEXT NOT NULL,
+            period TEXT NOT NULL,
+            n_rows INTEGER NOT NULL,
+            boards INTEGER NOT NULL,
+            total_parts INTEGER NOT NULL,
+            falsecall_parts INTEGER NOT NULL,
+            ng_parts INTEGER NOT NULL,
+            PRIMARY KEY (freq, line, period)
+        ) WITHOUT ROWID
+    ''')
+    empty = conn.execute('SELECT 1 FROM moat_ppm_rollup LIMIT 1').fetchone() is None
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS moat_facts_rollup_insert AFTER INSERT ON moat_facts '
+        f"BEGIN {_ppm_rollup_sql('NEW', 1)}END"
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS moat_facts_rollup_delete AFTER DELETE ON moat_facts '
+        f"BEGIN {_ppm_rollup_sql('OLD', -1)}END"
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS moat_facts_rollup_update AFTER UPDATE ON moat_facts '
+        f"BEGIN {_ppm_rollup_sql('OLD', -1)}{_ppm_rollup_sql('NEW', 1)}END"
+    )
+    if empty:
+        for freq, fmt in PPM_PERIODS.items():
+            conn.execute(
+                f"""
+                INSERT INTO moat_ppm_rollup
+                    (freq, line, period, n_rows, boards, total_parts, falsecall_parts, ng_parts)
+                SELECT ?, COALESCE(s.line, ''), strftime('{fmt}', f.report_date) AS period,
+                       COUNT(*), COALESCE(SUM(f.total_boards), 0),
+                       COALESCE(SUM(f.total_parts), 0),
+                       COALESCE(SUM(f.falsecall_parts), 0),
+                       COALESCE(SUM(f.ng_parts), 0)
+                FROM moat_facts f
+                JOIN (
+                    SELECT NULL AS line_id, NULL AS line
+                    UNION ALL SELECT id, name FROM dim_line
+                ) s ON s.line_id IS NULL OR s.line_id = f.line_id
+                WHERE period IS NOT NULL
+                GROUP BY s.line, period
+                """,
+                (freq,),
+            )
+
+
+def period_bounds(freq: str, day: date):
+    """Return the first and last date of the *freq* period containing *day*.
+
+    Periods match the SQLite ``strftime`` keys in :data:`PPM_PERIODS`; weeks
+    start on Monday and are clipped to the calendar year like ``%W``.
+    """
+    if freq == 'daily':
+        return day, day
+    if freq == 'weekly':
+        monday = day - timedelta(days=day.weekday())
+        return (
+            max(monday, date(day.year, 1, 1)),
+            min(monday + timedelta(days=6), date(day.year, 12, 31)),
+        )
+    if freq == 'monthly':
+        first = day.replace(day=1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        return first, next_month - timedelta(days=1)
+    return date(day.year, 1, 1), date(day.year, 12, 31)
+
+
+def read_ppm_rollup(conn, freq: str, start: date, end: date, line: str = ''):
+    """Return ``[(period, boards, total_parts, falsecall_parts, ng_parts)]`` for a range.
+
+    Periods lying entirely inside ``start``..``end`` are read directly from
+    their rollup rows; the partial periods at either edge are summed from the
+    daily rollups so results match grouping the raw rows by period.
+    """
+    fmt = PPM_PERIODS[freq]
+    full = []
+    partial = []
+    day = start
+    while day <= end:
+        first, last = period_bounds(freq, day)
+        if first >= start and last <= end:
+            full.append(day.strftime(fmt))
+        else:
+            partial.append((max(first, start).isoformat(), min(last, end).isoformat()))
+        day = last + timedelta(days=1)
+
+    parts = []
+    params = []
+    if full:
+        # Full periods are contiguous and their keys sort by date, so a range
+        # scan replaces one placeholder per period
+        parts.append(
+            'SELECT period, boards, total_parts, falsecall_parts, ng_parts '
+            'FROM moat_ppm_rollup WHERE freq = ? AND line = ? '
+            'AND period BETWEEN ? AND ?'
+        )
+        params.extend([freq, line, full[0], full[-1]])
+    for first, last in partial:
+        parts.append(
+            f"SELECT strftime('{fmt}', period), SUM(boards), SUM(total_parts), "
+            'SUM(falsecall_parts), SUM(ng_parts) FROM moat_ppm_rollup '
+            "WHERE freq = 'daily' AND line = ? AND period BETWEEN ? AND ? "
+            'GROUP BY 1 HAVING COUNT(*) > 0'
+        )
+        params.extend([line, first, last])
+    if not parts:
+        return []
+    return conn.execute(
+        ' UNION ALL '.join(parts) + ' ORDER BY 1', params
+    ).fetchall()
+
+
 def import_public_ppm_reports():
     """Import PPM reports from the shared drive into the database.
 
@@ -93,7 +638,8 @@ def import_public_ppm_reports():
     conn = get_db()
     try:
         existing = {r['filename'] for r in conn.execute('SELECT filename FROM moat')}
-        imported = 0
+        imported = imported_rows = 0
+        imported_dates, imported_lines = set(), set()
         for line_name in os.listdir(root):
             line_path = os.path.join(root, line_name)
             if not os.path.isdir(line_path):
@@ -132,10 +678,18 @@ def import_public_ppm_reports():
                     df['report_date'] = report_date
                     df['line'] = line_val
                     df.to_sql('moat', conn, if_exists='append', index=False)
+                    imported_rows += len(df)
                     existing.add(fname)
+                    imported_dates.add(report_date)
+                    imported_lines.add(line_val)
                     imported += 1
         if imported == 0:
             return 'No new PPM reports found.'
+        record_data_event(conn, 'moat', imported_dates, imported_lines)
+        evaluate_spc_rules(conn)
+        conn.commit()
+        IMPORTS.inc(imported, source='ppm')
+        IMPORTED_ROWS.inc(imported_rows, source='ppm')
         return f'Imported {imported} PPM report(s).'
     except PermissionError as e:
         return f'Permission error accessing PPM directory: {e}'
@@ -144,164 +698,1636 @@ def import_public_ppm_reports():
     finally:
         conn.close()
 
-def init_db():
-    conn = get_db()
+
+# Control chart series checked by the run-rule engine. Maps series type to
+# (source view, series key column, plotted value expression, columns the
+# value reads).
+SPC_SERIES = {
+    'moat': ('moat', 'model_name', 'falsecall_parts * 1.0 / total_boards', ('total_boards', 'falsecall_parts')),
+    'aoi': ('aoi_reports', 'assembly', 'qty_rejected * 1.0 / qty_inspected', ('qty_inspected', 'qty_rejected')),
+}
+
+
+def init_spc_tables(conn):
+    """Create the run-rule state and violation tables."""
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS moat (
+        CREATE TABLE IF NOT EXISTS spc_series_state (
+            series_type TEXT NOT NULL,
+            series_key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            last_date TEXT,
+            last_id INTEGER,
+            PRIMARY KEY (series_type, series_key)
+        ) WITHOUT ROWID
+    ''')
+    state_cols = {r['name'] for r in conn.execute('PRAGMA table_info(spc_series_state)')}
+    for col, col_type in (('last_date', 'TEXT'), ('last_id', 'INTEGER')):
+        if col not in state_cols:
+            conn.execute(f'ALTER TABLE spc_series_state ADD COLUMN {col} {col_type}')
+    # Series whose evaluated points were edited or deleted; they are
+    # replayed from scratch on the next evaluation
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS spc_dirty (
+            series_type TEXT NOT NULL,
+            series_key TEXT NOT NULL,
+            PRIMARY KEY (series_type, series_key)
+        ) WITHOUT ROWID
+    ''')
+    for series_type, (source, key_col, _, value_cols) in SPC_SERIES.items():
+        fact = FACT_TABLES[source][0]
+        dim, key = DIMENSION_TABLES[key_col]
+
+        def mark(ref):
+            return (
+                'INSERT OR IGNORE INTO spc_dirty (series_type, series_key) '
+                f"SELECT '{series_type}', name FROM {dim} WHERE id = {ref}.{key}; "
+            )
+
+        watched = ', '.join((key, 'report_date') + value_cols)
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fact}_spc_delete AFTER DELETE ON {fact} '
+            f"BEGIN {mark('OLD')}END"
+        )
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fact}_spc_update AFTER UPDATE OF {watched} ON {fact} '
+            f"BEGIN {mark('OLD')}{mark('NEW')}END"
+        )
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS spc_watermarks (
+            series_type TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS spc_violations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            model_name TEXT,
-            total_boards INTEGER,
-            total_parts_per_board INTEGER,
-            total_parts INTEGER,
-            ng_parts INTEGER,
-            ng_ppm REAL,
-            falsecall_parts INTEGER,
-            falsecall_ppm REAL,
-            upload_time TEXT,
-            filename TEXT,
+            series_type TEXT NOT NULL,
+            series_key TEXT NOT NULL,
+            source_id INTEGER NOT NULL,
             report_date TEXT,
-            line TEXT
+            rule TEXT NOT NULL,
+            value REAL,
+            center REAL,
+            sigma REAL,
+            detected_at TEXT
         )
     ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_spc_violations_series '
+        'ON spc_violations(series_type, series_key, report_date)'
+    )
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_spc_violations_date ON spc_violations(report_date)'
+    )
 
-    # Older database versions may lack the `filename` column. Ensure it exists so
-    # uploaded file names can be tracked for later management/deletion without
-    # storing them directly in the MOAT view.
-    existing_cols = [r['name'] for r in conn.execute("PRAGMA table_info(moat)").fetchall()]
-    if 'filename' not in existing_cols:
-        conn.execute('ALTER TABLE moat ADD COLUMN filename TEXT')
-    if 'report_date' not in existing_cols:
-        conn.execute('ALTER TABLE moat ADD COLUMN report_date TEXT')
-    if 'line' not in existing_cols:
-        conn.execute('ALTER TABLE moat ADD COLUMN line TEXT')
 
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS verified_markings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            part_number TEXT,
-            mfg_number1 TEXT,
-            mfg_number2 TEXT,
-            manufacturer TEXT,
-            verified_markings TEXT
+def _spc_points(conn, series_type, where, params):
+    source, key_col, value_expr, _ = SPC_SERIES[series_type]
+    return conn.execute(
+        f'SELECT id, {key_col} AS series_key, report_date, {value_expr} AS value '
+        f"FROM {source} WHERE {where} ORDER BY COALESCE(report_date, ''), id",
+        params,
+    ).fetchall()
+
+
+def evaluate_spc_rules(conn) -> int:
+    """Run the Western Electric/Nelson rules over points added since the last run.
+
+    Each series keeps its running sums, recent window and last evaluated
+    ``(report_date, id)`` in ``spc_series_state``, and each source keeps
+    the last processed id in ``spc_watermarks``, so only new rows are read.
+    Points are evaluated in report date order. A series is replayed from
+    scratch when a new point is dated before its last evaluated one or
+    when its rows were edited or deleted (``spc_dirty``). Returns the
+    number of violations recorded; the caller commits.
+    """
+    detected_at = datetime.utcnow().isoformat()
+    recorded = 0
+    for series_type in SPC_SERIES:
+        row = conn.execute(
+            'SELECT last_id FROM spc_watermarks WHERE series_type = ?', (series_type,)
+        ).fetchone()
+        last_id = row['last_id'] if row else 0
+        points = _spc_points(conn, series_type, 'id > ?', (last_id,))
+        dirty = {
+            r['series_key']
+            for r in conn.execute('SELECT series_key FROM spc_dirty WHERE series_type = ?', (series_type,))
+        }
+        if not points and not dirty:
+            continue
+        states, positions = {}, {}
+        for key in {p['series_key'] for p in points if p['series_key'] is not None} - dirty:
+            state_row = conn.execute(
+                'SELECT state, last_date, last_id FROM spc_series_state '
+                'WHERE series_type = ? AND series_key = ?',
+                (series_type, key),
+            ).fetchone()
+            states[key] = SeriesState.from_json(state_row['state']) if state_row else SeriesState()
+            if state_row and state_row['last_id'] is not None:
+                positions[key] = (state_row['last_date'] or '', state_row['last_id'])
+        for p in points:
+            key = p['series_key']
+            if key in positions and ((p['report_date'] or ''), p['id']) < positions[key]:
+                dirty.add(key)
+        todo = [p for p in points if p['series_key'] not in dirty]
+        dirty = sorted(dirty)
+        for i in range(0, len(dirty), 500):
+            chunk = dirty[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            for table in ('spc_violations', 'spc_series_state'):
+                conn.execute(
+                    f'DELETE FROM {table} WHERE series_type = ? AND series_key IN ({marks})',
+                    [series_type, *chunk],
+                )
+            todo += _spc_points(conn, series_type, f'{SPC_SERIES[series_type][1]} IN ({marks})', chunk)
+        for key in dirty:
+            states[key] = SeriesState()
+            positions.pop(key, None)
+        conn.execute('DELETE FROM spc_dirty WHERE series_type = ?', (series_type,))
+
+        violations = []
+        for p in todo:
+            if p['series_key'] is None or p['value'] is None:
+                continue
+            state = states[p['series_key']]
+            positions[p['series_key']] = ((p['report_date'] or ''), p['id'])
+            center, sigma = state.mean, state.sigma
+            for rule in evaluate_point(state, p['value']):
+                violations.append((
+                    series_type, p['series_key'], p['id'], p['report_date'],
+                    rule, p['value'], center, sigma, detected_at,
+                ))
+        conn.executemany(
+            'INSERT INTO spc_violations (series_type, series_key, source_id, report_date, '
+            'rule, value, center, sigma, detected_at) VALUES (?,?,?,?,?,?,?,?,?)',
+            violations,
+        )
+        conn.executemany(
+            'INSERT OR REPLACE INTO spc_series_state (series_type, series_key, state, last_date, last_id) '
+            'VALUES (?,?,?,?,?)',
+            [(series_type, key, states[key].to_json(), *pos) for key, pos in positions.items()],
+        )
+        if points:
+            conn.execute(
+                'INSERT OR REPLACE INTO spc_watermarks (series_type, last_id) VALUES (?,?)',
+                (series_type, max(p['id'] for p in points)),
+            )
+        recorded += len(violations)
+    return recorded
+
+
+def refresh_spc_rules():
+    """Evaluate run rules for new and changed points in their own transaction."""
+    conn = get_db()
+    try:
+        # Take the write lock before reading the watermarks, so concurrent
+        # refreshes queue up instead of processing the same points twice
+        conn.execute('BEGIN IMMEDIATE')
+        evaluate_spc_rules(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        app.logger.error('Error evaluating SPC rules', exc_info=e)
+    finally:
+        conn.close()
+
+
+def _job_allocation_sql(where: str, table: str = 'job_operator_summary') -> str:
+    """Return SQL re-splitting FI rejects by AOI inspected share for matching jobs.
+
+    *table* is ``job_operator_summary`` or its per-day breakdown
+    ``job_operator_day``; both are split against the job's total inspected.
+    """
+    return (
+        f'UPDATE {table} SET fi_allocated = ('
+        f'SELECT fi.fi_rejected * 1.0 * {table}.aoi_inspected / ('
+        'SELECT SUM(j2.aoi_inspected) FROM job_operator_summary j2 '
+        f'WHERE j2.job_key = {table}.job_key '
+        f'AND j2.assembly_id = {table}.assembly_id) '
+        'FROM job_fi_summary fi '
+        f'WHERE fi.job_key = {table}.job_key '
+        f'AND fi.assembly_id = {table}.assembly_id) '
+        f'WHERE assembly_id != 0 AND {where}; '
+    )
+
+
+def _job_summary_sql(source: str, row: str, sign: int) -> str:
+    """Return trigger SQL applying an AOI or FI fact *row* to the job summaries."""
+    job = f'{row}.job_key'
+    assembly = f'COALESCE({row}.assembly_id, 0)'
+    if source == 'aoi':
+        sql = (
+            'INSERT INTO job_operator_summary '
+            '(job_key, assembly_id, operator_id, n_rows, aoi_inspected, aoi_rejected) '
+            f'SELECT {job}, {assembly}, COALESCE({row}.operator_id, 0), {sign}, '
+            f'{sign} * COALESCE({row}.qty_inspected, 0), {sign} * COALESCE({row}.qty_rejected, 0) '
+            f'WHERE {job} IS NOT NULL '
+            'ON CONFLICT (job_key, assembly_id, operator_id) DO UPDATE SET '
+            'n_rows = n_rows + excluded.n_rows, '
+            'aoi_inspected = aoi_inspected + excluded.aoi_inspected, '
+            'aoi_rejected = aoi_rejected + excluded.aoi_rejected; '
+            'DELETE FROM job_operator_summary WHERE n_rows <= 0 '
+            f'AND job_key = {job} AND assembly_id = {assembly}; '
+            'INSERT INTO job_operator_day '
+            '(job_key, assembly_id, operator_id, report_date, n_rows, aoi_inspected, aoi_rejected) '
+            f"SELECT {job}, {assembly}, COALESCE({row}.operator_id, 0), COALESCE({row}.report_date, ''), "
+            f'{sign}, {sign} * COALESCE({row}.qty_inspected, 0), {sign} * COALESCE({row}.qty_rejected, 0) '
+            f'WHERE {job} IS NOT NULL '
+            'ON CONFLICT (job_key, assembly_id, operator_id, report_date) DO UPDATE SET '
+            'n_rows = n_rows + excluded.n_rows, '
+            'aoi_inspected = aoi_inspected + excluded.aoi_inspected, '
+            'aoi_rejected = aoi_rejected + excluded.aoi_rejected; '
+            'DELETE FROM job_operator_day WHERE n_rows <= 0 '
+            f'AND job_key = {job} AND assembly_id = {assembly}; '
         )
+    else:
+        sql = (
+            'INSERT INTO job_fi_summary '
+            '(job_key, assembly_id, n_rows, fi_inspected, fi_rejected) '
+            f'SELECT {job}, {assembly}, {sign}, '
+            f'{sign} * COALESCE({row}.qty_inspected, 0), {sign} * COALESCE({row}.qty_rejected, 0) '
+            f'WHERE {job} IS NOT NULL '
+            'ON CONFLICT (job_key, assembly_id) DO UPDATE SET '
+            'n_rows = n_rows + excluded.n_rows, '
+            'fi_inspected = fi_inspected + excluded.fi_inspected, '
+            'fi_rejected = fi_rejected + excluded.fi_rejected; '
+            'DELETE FROM job_fi_summary WHERE n_rows <= 0 '
+            f'AND job_key = {job} AND assembly_id = {assembly}; '
+        )
+    where = f'job_key = {job} AND assembly_id = {assembly}'
+    return sql + _job_allocation_sql(where) + _job_allocation_sql(where, 'job_operator_day')
+
+
+def _operator_day_sql(row: str, sign: int) -> str:
+    """Return trigger SQL applying a ``job_operator_day`` *row* to ``operator_day_summary``."""
+    return (
+        'INSERT INTO operator_day_summary '
+        '(report_date, operator_id, n_rows, aoi_inspected, aoi_rejected, fi_rows, fi_allocated) '
+        f'SELECT {row}.report_date, {row}.operator_id, {sign}, '
+        f'{sign} * {row}.aoi_inspected, {sign} * {row}.aoi_rejected, '
+        f'{sign} * ({row}.fi_allocated IS NOT NULL), {sign} * COALESCE({row}.fi_allocated, 0) '
+        f'WHERE {row}.assembly_id != 0 '
+        'ON CONFLICT (report_date, operator_id) DO UPDATE SET '
+        'n_rows = n_rows + excluded.n_rows, '
+        'aoi_inspected = aoi_inspected + excluded.aoi_inspected, '
+        'aoi_rejected = aoi_rejected + excluded.aoi_rejected, '
+        'fi_rows = fi_rows + excluded.fi_rows, '
+        'fi_allocated = fi_allocated + excluded.fi_allocated; '
+        'DELETE FROM operator_day_summary WHERE n_rows <= 0 '
+        f'AND report_date = {row}.report_date AND operator_id = {row}.operator_id; '
+    )
+
+
+def init_job_summaries(conn):
+    """Create the job-level AOI/FI tables used for operator grading.
+
+    ``job_operator_summary`` holds AOI inspected/rejected per (job, assembly,
+    operator) together with the FI rejects allocated to that operator by
+    inspection share. ``job_fi_summary`` holds FI totals per (job, assembly).
+    Triggers on ``aoi_facts`` and ``fi_facts`` keep both current; a missing
+    assembly or operator is stored as key ``0``.
+
+    ``job_operator_day`` splits the operator rows further by report date and
+    feeds ``operator_day_summary``, which holds each operator's AOI rejects,
+    inspected count and allocated FI rejects per day. Grades for a date range
+    are summed from it without touching the raw reports.
+    """
+    # Summaries keyed by the raw job number predate the normalized job key
+    # and are rebuilt from the fact tables.
+    cols = {r['name'] for r in conn.execute('PRAGMA table_info(job_operator_summary)')}
+    if 'job_number' in cols:
+        conn.execute('DROP TABLE job_operator_summary')
+        conn.execute('DROP TABLE IF EXISTS job_fi_summary')
+    # Triggers written before the per-day tables existed are replaced
+    trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'aoi_facts_job_insert'"
+    ).fetchone()
+    if 'job_number' in cols or (trigger and 'job_operator_day' not in trigger['sql']):
+        for fact in ('aoi_facts', 'fi_facts'):
+            for action in ('insert', 'update', 'delete'):
+                conn.execute(f'DROP TRIGGER IF EXISTS {fact}_job_{action}')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_operator_summary (
+            job_key TEXT NOT NULL,
+            assembly_id INTEGER NOT NULL,
+            operator_id INTEGER NOT NULL,
+            n_rows INTEGER NOT NULL,
+            aoi_inspected INTEGER NOT NULL,
+            aoi_rejected INTEGER NOT NULL,
+            fi_allocated REAL,
+            PRIMARY KEY (job_key, assembly_id, operator_id)
+        ) WITHOUT ROWID
     ''')
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS stencils (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            stencil_number TEXT,
-            part_number TEXT,
-            ref TEXT,
-            description TEXT,
-            location_of_stencil TEXT
-        )
+        CREATE TABLE IF NOT EXISTS job_fi_summary (
+            job_key TEXT NOT NULL,
+            assembly_id INTEGER NOT NULL,
+            n_rows INTEGER NOT NULL,
+            fi_inspected INTEGER NOT NULL,
+            fi_rejected INTEGER NOT NULL,
+            PRIMARY KEY (job_key, assembly_id)
+        ) WITHOUT ROWID
     ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_job_operator_summary_operator '
+        'ON job_operator_summary(operator_id)'
+    )
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS aoi_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS job_operator_day (
+            job_key TEXT NOT NULL,
+            assembly_id INTEGER NOT NULL,
+            operator_id INTEGER NOT NULL,
             report_date TEXT NOT NULL,
-            shift TEXT,
-            operator TEXT,
-            customer TEXT,
-            assembly TEXT,
-            rev TEXT,
-            job_number TEXT,
-            qty_inspected INTEGER,
-            qty_rejected INTEGER,
-            additional_info TEXT
-        )
+            n_rows INTEGER NOT NULL,
+            aoi_inspected INTEGER NOT NULL,
+            aoi_rejected INTEGER NOT NULL,
+            fi_allocated REAL,
+            PRIMARY KEY (job_key, assembly_id, operator_id, report_date)
+        ) WITHOUT ROWID
     ''')
-
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS fi_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS operator_day_summary (
             report_date TEXT NOT NULL,
-            shift TEXT,
-            operator TEXT,
-            customer TEXT,
-            assembly TEXT,
-            rev TEXT,
-            job_number TEXT,
-            qty_inspected INTEGER,
-            qty_rejected INTEGER,
-            additional_info TEXT
-        )
+            operator_id INTEGER NOT NULL,
+            n_rows INTEGER NOT NULL,
+            aoi_inspected INTEGER NOT NULL,
+            aoi_rejected INTEGER NOT NULL,
+            fi_rows INTEGER NOT NULL,
+            fi_allocated REAL NOT NULL,
+            PRIMARY KEY (report_date, operator_id)
+        ) WITHOUT ROWID
     ''')
-    # Users with per-feature permissions. The ADMIN account is created by
-    # default along with a basic USER account. Additional users can be managed
-    # from the settings page.
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT,
-            part_markings INTEGER DEFAULT 0,
-            aoi INTEGER DEFAULT 0,
-            analysis INTEGER DEFAULT 0,
-            dashboard INTEGER DEFAULT 0,
-            reports INTEGER DEFAULT 0,
-            c_suite INTEGER DEFAULT 0,
-            is_admin INTEGER DEFAULT 0
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS job_operator_day_insert AFTER INSERT ON job_operator_day '
+        f"BEGIN {_operator_day_sql('NEW', 1)}END"
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS job_operator_day_delete AFTER DELETE ON job_operator_day '
+        f"BEGIN {_operator_day_sql('OLD', -1)}END"
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS job_operator_day_update AFTER UPDATE ON job_operator_day '
+        f"BEGIN {_operator_day_sql('OLD', -1)}{_operator_day_sql('NEW', 1)}END"
+    )
+    days_empty = conn.execute('SELECT 1 FROM job_operator_day LIMIT 1').fetchone() is None
+    empty = (
+        conn.execute('SELECT 1 FROM job_operator_summary LIMIT 1').fetchone() is None
+        and conn.execute('SELECT 1 FROM job_fi_summary LIMIT 1').fetchone() is None
+    )
+    for source, fact in (('aoi', 'aoi_facts'), ('fi', 'fi_facts')):
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fact}_job_insert AFTER INSERT ON {fact} '
+            f"BEGIN {_job_summary_sql(source, 'NEW', 1)}END"
         )
-    ''')
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fact}_job_delete AFTER DELETE ON {fact} '
+            f"BEGIN {_job_summary_sql(source, 'OLD', -1)}END"
+        )
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fact}_job_update AFTER UPDATE ON {fact} '
+            f"BEGIN {_job_summary_sql(source, 'OLD', -1)}{_job_summary_sql(source, 'NEW', 1)}END"
+        )
+    if empty:
+        conn.execute('''
+            INSERT INTO job_operator_summary
+                (job_key, assembly_id, operator_id, n_rows, aoi_inspected, aoi_rejected)
+            SELECT job_key, COALESCE(assembly_id, 0), COALESCE(operator_id, 0), COUNT(*),
+                   COALESCE(SUM(qty_inspected), 0), COALESCE(SUM(qty_rejected), 0)
+            FROM aoi_facts
+            WHERE job_key IS NOT NULL
+            GROUP BY 1, 2, 3
+        ''')
+        conn.execute('''
+            INSERT INTO job_fi_summary
+                (job_key, assembly_id, n_rows, fi_inspected, fi_rejected)
+            SELECT job_key, COALESCE(assembly_id, 0), COUNT(*),
+                   COALESCE(SUM(qty_inspected), 0), COALESCE(SUM(qty_rejected), 0)
+            FROM fi_facts
+            WHERE job_key IS NOT NULL
+            GROUP BY 1, 2
+        ''')
+        conn.execute(_job_allocation_sql('1'))
+    if days_empty:
+        conn.execute('''
+            INSERT INTO job_operator_day
+                (job_key, assembly_id, operator_id, report_date, n_rows, aoi_inspected, aoi_rejected)
+            SELECT job_key, COALESCE(assembly_id, 0), COALESCE(operator_id, 0),
+                   COALESCE(report_date, ''), COUNT(*),
+                   COALESCE(SUM(qty_inspected), 0), COALESCE(SUM(qty_rejected), 0)
+            FROM aoi_facts
+            WHERE job_key IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+        ''')
+        conn.execute(_job_allocation_sql('1', 'job_operator_day'))
+
+
+def init_data_generations(conn):
+    """Create per-table generation counters bumped by every write.
+
+    Cached results are keyed by the generations of the tables they read, so
+    they stay valid until new data arrives.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_generations (
+            table_name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        )
+    ''')
+    for view, (fact, _) in FACT_TABLES.items():
+        conn.execute(
+            'INSERT OR IGNORE INTO data_generations (table_name, generation) VALUES (?, 0)',
+            (view,),
+        )
+        for action in ('insert', 'update', 'delete'):
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {fact}_generation_{action} '
+                f'AFTER {action.upper()} ON {fact} BEGIN '
+                'UPDATE data_generations SET generation = generation + 1 '
+                f"WHERE table_name = '{view}'; END"
+            )
+
+
+def data_generation(conn, *tables):
+    """Return the current generation numbers for *tables* as a tuple."""
+    rows = dict(conn.execute('SELECT table_name, generation FROM data_generations').fetchall())
+    return tuple(rows.get(t, 0) for t in tables)
+
+
+# Dashboard dropdown fields per view
+FILTER_OPTION_FIELDS = {
+    'aoi_reports': ('customer', 'shift', 'operator', 'assembly'),
+    'fi_reports': ('customer', 'shift', 'operator', 'assembly'),
+    'moat': ('model_name',),
+}
+_filter_options_cache = {}
+
+
+def init_filter_options(conn):
+    """Track which dimension values each view's dropdowns should offer.
+
+    Insert/update triggers on the fact tables add unseen values to
+    ``filter_options``; only a genuinely new value bumps the
+    ``filter_options`` generation, so cached option lists survive ordinary
+    uploads. Values whose last row is deleted stay listed.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'filter_options'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS filter_options (
+            view TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value_id INTEGER NOT NULL,
+            PRIMARY KEY (view, field, value_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(
+        "INSERT OR IGNORE INTO data_generations (table_name, generation) VALUES ('filter_options', 0)"
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS filter_options_generation AFTER INSERT ON filter_options '
+        "BEGIN UPDATE data_generations SET generation = generation + 1 "
+        "WHERE table_name = 'filter_options'; END"
+    )
+    for view, fields in FILTER_OPTION_FIELDS.items():
+        fact = FACT_TABLES[view][0]
+        keys = [(field, DIMENSION_TABLES[field][1]) for field in fields]
+        body = ''.join(
+            'INSERT OR IGNORE INTO filter_options (view, field, value_id) '
+            f"SELECT '{view}', '{field}', NEW.{key} WHERE NEW.{key} IS NOT NULL; "
+            for field, key in keys
+        )
+        for action in ('insert', 'update'):
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {fact}_filter_options_{action} '
+                f'AFTER {action.upper()} ON {fact} BEGIN {body}END'
+            )
+        if not exists:
+            for field, key in keys:
+                conn.execute(
+                    'INSERT OR IGNORE INTO filter_options (view, field, value_id) '
+                    f'SELECT DISTINCT ?, ?, {key} FROM {fact} WHERE {key} IS NOT NULL',
+                    (view, field),
+                )
+
+
+def load_filter_options(conn, view):
+    """Return ``{field: [names...]}`` for *view*'s dropdowns, cached per database by generation."""
+    generation = data_generation(conn, 'filter_options')[0]
+    cached = _filter_options_cache.get((DATABASE, view))
+    count_cache_lookup('filter_options', cached and cached[0] == generation)
+    if cached and cached[0] == generation:
+        return cached[1]
+    options = {}
+    for field in FILTER_OPTION_FIELDS[view]:
+        table, _ = DIMENSION_TABLES[field]
+        rows = conn.execute(
+            f'SELECT d.name FROM filter_options o JOIN {table} d ON d.id = o.value_id '
+            'WHERE o.view = ? AND o.field = ? ORDER BY d.name',
+            (view, field),
+        ).fetchall()
+        options[field] = [r[0] for r in rows]
+    _filter_options_cache[(DATABASE, view)] = (generation, options)
+    return options
+
+
+DATA_EVENT_RETENTION = 1000
+DATA_EVENT_POLL_SECONDS = float(os.environ.get('DATA_EVENT_POLL_SECONDS', 1))
+DATA_EVENT_KEEPALIVE_SECONDS = 15
+DATA_EVENT_STREAM_SECONDS = int(os.environ.get('DATA_EVENT_STREAM_SECONDS', 300))
+
+
+def init_data_events(conn):
+    """Create the change feed behind the ``/events`` stream.
+
+    Rows are written in the same transaction as the change they describe,
+    so every worker process sees an event exactly when its data commits.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            generation INTEGER NOT NULL,
+            dates TEXT NOT NULL,
+            lines TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+
+
+def record_data_event(conn, table, dates=(), lines=()):
+    """Queue a change event for *table* inside the current transaction.
+
+    *dates* and *lines* name the report dates and MOAT lines touched so
+    dashboards can re-fetch only the sections that cover them.
+    """
+    dates = sorted({str(d) for d in dates if d})
+    lines = sorted({str(l) for l in lines if l})
+    DATA_WRITES.inc(table=table)
+    cur = conn.execute(
+        'INSERT INTO data_events (table_name, generation, dates, lines, created_at) '
+        'VALUES (?, ?, ?, ?, ?)',
+        (
+            table,
+            data_generation(conn, table)[0],
+            json.dumps(dates),
+            json.dumps(lines),
+            datetime.utcnow().isoformat(timespec='seconds'),
+        ),
+    )
+    conn.execute(
+        'DELETE FROM data_events WHERE id <= ?', (cur.lastrowid - DATA_EVENT_RETENTION,)
+    )
+
+
+def data_events_since(conn, last_id):
+    """Return events newer than *last_id* as dicts, oldest first."""
+    rows = conn.execute(
+        'SELECT id, table_name, generation, dates, lines FROM data_events '
+        'WHERE id > ? ORDER BY id',
+        (last_id,),
+    ).fetchall()
+    return [
+        {
+            'id': r['id'],
+            'table': r['table_name'],
+            'generation': r['generation'],
+            'dates': json.loads(r['dates']),
+            'lines': json.loads(r['lines']),
+        }
+        for r in rows
+    ]
+
+
+def stream_data_events(last_id=None):
+    """Yield ``text/event-stream`` chunks for new data events.
+
+    The feed is polled every ``DATA_EVENT_POLL_SECONDS`` with a comment line
+    as keepalive. After ``DATA_EVENT_STREAM_SECONDS`` the stream ends and the
+    browser reconnects with ``Last-Event-ID``, so no worker is held forever.
+    """
+    conn = get_db()
+    try:
+        if last_id is None:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM data_events').fetchone()[0]
+    finally:
+        conn.close()
+    deadline = time.monotonic() + DATA_EVENT_STREAM_SECONDS
+    idle_since = time.monotonic()
+    yield f'retry: {int(DATA_EVENT_POLL_SECONDS * 1000) + 1000}\n\n'
+    while True:
+        conn = get_db()
+        try:
+            events = data_events_since(conn, last_id)
+        finally:
+            conn.close()
+        for event in events:
+            last_id = event.pop('id')
+            yield f'id: {last_id}\nevent: data-changed\ndata: {json.dumps(event)}\n\n'
+            idle_since = time.monotonic()
+        now = time.monotonic()
+        if now >= deadline:
+            return
+        if now - idle_since >= DATA_EVENT_KEEPALIVE_SECONDS:
+            yield ': keepalive\n\n'
+            idle_since = now
+        time.sleep(DATA_EVENT_POLL_SECONDS)
+
+def compute_grade(aoi_rej, fi_rej):
+    """Return (coverage, letter grade) for AOI vs FI rejects."""
+    total = aoi_rej + fi_rej
+    if total == 0:
+        return None, None
+    coverage = aoi_rej / total
+    if coverage >= 0.8:
+        letter = 'A'
+    elif coverage >= 0.6:
+        letter = 'B'
+    elif coverage >= 0.4:
+        letter = 'C'
+    else:
+        letter = 'D'
+    return coverage, letter
+
+
+def load_operator_grades(conn, start=None, end=None):
+    """Return AOI coverage grades per operator from the per-day summaries.
+
+    *start* and *end* limit the AOI report dates considered; each day carries
+    its share of the FI rejects of the jobs inspected that day.
+    """
+    query = (
+        'SELECT dim_operator.name AS operator, '
+        'SUM(s.aoi_rejected) AS aoi_rejected, '
+        'SUM(s.fi_allocated) AS fi_rejected, '
+        'SUM(s.fi_rows) AS fi_rows '
+        'FROM operator_day_summary s '
+        'LEFT JOIN dim_operator ON dim_operator.id = s.operator_id '
+        'WHERE 1=1'
+    )
+    params = []
+    if start:
+        query += ' AND s.report_date >= ?'
+        params.append(start)
+    if end:
+        query += ' AND s.report_date <= ?'
+        params.append(end)
+    query += ' GROUP BY s.operator_id ORDER BY operator'
+    grades = []
+    for r in conn.execute(query, params).fetchall():
+        a_rej = r['aoi_rejected'] or 0
+        if not r['fi_rows']:
+            coverage = None
+            letter = None
+        else:
+            coverage, letter = compute_grade(a_rej, r['fi_rejected'])
+        grades.append({'operator': r['operator'], 'coverage': coverage, 'grade': letter})
+    return grades
+
+# Operator grade series cached per (database, freq) with the AOI/FI
+# generations they were built from
+_grade_series_cache = {}
+
+
+def load_operator_grade_series(conn, freq: str):
+    """Return coverage and grade per operator per week or month.
+
+    Periods are summed from ``operator_day_summary``, where each job's FI
+    rejects are already spread over its AOI days by inspected share. Results
+    are cached until the AOI or FI tables change.
+    """
+    generation = data_generation(conn, 'aoi_reports', 'fi_reports')
+    cached = _grade_series_cache.get((DATABASE, freq))
+    count_cache_lookup('grade_series', cached and cached[0] == generation)
+    if cached and cached[0] == generation:
+        return cached[1]
+    rows = conn.execute(
+        f"""
+        SELECT dim_operator.name AS operator,
+               strftime('{PPM_PERIODS[freq]}', s.report_date) AS period,
+               SUM(s.aoi_rejected) AS aoi_rejected,
+               SUM(s.fi_allocated) AS fi_rejected,
+               SUM(s.fi_rows) AS fi_rows
+        FROM operator_day_summary s
+        LEFT JOIN dim_operator ON dim_operator.id = s.operator_id
+        GROUP BY s.operator_id, period
+        ORDER BY operator, period
+        """
+    ).fetchall()
+    series = []
+    for r in rows:
+        a_rej = r['aoi_rejected'] or 0
+        f_rej = r['fi_rejected'] if r['fi_rows'] else None
+        if f_rej is None:
+            coverage = letter = None
+        else:
+            coverage, letter = compute_grade(a_rej, f_rej)
+        series.append({
+            'operator': r['operator'],
+            'period': r['period'],
+            'aoi_rejected': a_rej,
+            'fi_rejected': f_rej,
+            'coverage': coverage,
+            'grade': letter,
+        })
+    _grade_series_cache[(DATABASE, freq)] = (generation, series)
+    return series
+
+def init_materials(conn):
+    """Create the local mirror of SAP materials and its sync bookkeeping."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS materials (
+            id TEXT PRIMARY KEY,
+            description TEXT,
+            changed_at TEXT,
+            synced_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS material_sync (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_sync TEXT,
+            last_full_sync TEXT,
+            cursor TEXT,
+            last_mode TEXT,
+            last_fetched INTEGER,
+            last_removed INTEGER,
+            last_error TEXT
+        )
+    ''')
+
+
+# Full material syncs also pick up deletions; run one at least this often
+MATERIAL_FULL_SYNC_AGE = timedelta(days=1)
+
+
+def sync_materials(conn, full: bool = False) -> dict:
+    """Copy materials from SAP into the ``materials`` table.
+
+    Uses a delta sync from the stored ``changed_at`` cursor when the client
+    supports it, and a full sync (which also removes materials SAP no longer
+    has) otherwise or once the last full sync is older than a day.
+    """
+    state = conn.execute('SELECT * FROM material_sync WHERE id = 1').fetchone()
+    now = datetime.now()
+    delta = (
+        not full
+        and sap_service.supports_delta
+        and state is not None
+        and state['cursor']
+        and state['last_full_sync']
+        and datetime.fromisoformat(state['last_full_sync']) > now - MATERIAL_FULL_SYNC_AGE
+    )
+    materials = sap_service.list_materials(state['cursor'] if delta else None)
+    synced_at = now.isoformat()
+    conn.executemany(
+        'INSERT INTO materials (id, description, changed_at, synced_at) VALUES (?,?,?,?) '
+        'ON CONFLICT (id) DO UPDATE SET description = excluded.description, '
+        'changed_at = excluded.changed_at, synced_at = excluded.synced_at',
+        [(m.id, m.description, m.changed_at, synced_at) for m in materials],
+    )
+    removed = 0
+    if not delta:
+        removed = conn.execute('DELETE FROM materials WHERE synced_at < ?', (synced_at,)).rowcount
+    changed = [m.changed_at for m in materials if m.changed_at]
+    cursor = max(changed) if changed else None
+    if delta:
+        cursor = max(cursor or '', state['cursor'])
+    result = {
+        'mode': 'delta' if delta else 'full',
+        'fetched': len(materials),
+        'removed': removed,
+    }
+    conn.execute(
+        'INSERT INTO material_sync (id, last_sync, last_full_sync, cursor, last_mode, last_fetched, last_removed, last_error) '
+        'VALUES (1, ?, ?, ?, ?, ?, ?, NULL) '
+        'ON CONFLICT (id) DO UPDATE SET last_sync = excluded.last_sync, '
+        'last_full_sync = COALESCE(excluded.last_full_sync, last_full_sync), '
+        'cursor = excluded.cursor, last_mode = excluded.last_mode, '
+        'last_fetched = excluded.last_fetched, last_removed = excluded.last_removed, last_error = NULL',
+        (synced_at, None if delta else synced_at, cursor, result['mode'], len(materials), removed),
+    )
+    return result
+
+
+def run_material_sync(full: bool = False) -> dict:
+    """Run :func:`sync_materials` in its own transaction, recording any error."""
+    conn = get_db()
+    try:
+        result = sync_materials(conn, full)
+        conn.commit()
+        return result
+    except Exception as e:
+        conn.rollback()
+        app.logger.error('Error syncing SAP materials', exc_info=e)
+        conn.execute(
+            'INSERT INTO material_sync (id, last_error) VALUES (1, ?) '
+            'ON CONFLICT (id) DO UPDATE SET last_error = excluded.last_error',
+            (str(e) or type(e).__name__,),
+        )
+        conn.commit()
+        return {'error': str(e) or type(e).__name__}
+    finally:
+        conn.close()
+
+
+def fetch_materials(material_ids, live: bool = True) -> dict:
+    """Return ``{id: {'id', 'description'}}`` for the known *material_ids*.
+
+    Reads the local ``materials`` mirror once it has been synced. Before the
+    first sync it asks SAP when *live*, and returns ``{}`` otherwise, so
+    page views never wait on SAP.
+    """
+    ids = list(dict.fromkeys(material_ids))
+    conn = get_db()
+    try:
+        synced = conn.execute('SELECT 1 FROM material_sync WHERE id = 1 AND last_sync IS NOT NULL').fetchone()
+        if synced:
+            found = {}
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                for r in conn.execute(f'SELECT id, description FROM materials WHERE id IN ({marks})', chunk):
+                    found[r['id']] = {'id': r['id'], 'description': r['description']}
+            return found
+    finally:
+        conn.close()
+    if not live:
+        return {}
+    materials = sap_service.get_materials(ids)
+    return {m: {'id': mat.id, 'description': mat.description} for m, mat in materials.items()}
+
+
+def init_background_leases(conn):
+    """Create the table recording which process runs each background job."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS background_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def init_job_locations(conn):
+    """Create the snapshot of work-in-progress quantities per job and location."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_locations (
+            job TEXT NOT NULL,
+            location TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            due_date TEXT,
+            PRIMARY KEY (job, location)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_location_sync (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_attempt TEXT,
+            last_refresh TEXT,
+            last_error TEXT
+        )
+    ''')
+    conn.execute(
+        "INSERT OR IGNORE INTO data_generations (table_name, generation) VALUES ('job_locations', 0)"
+    )
+
+
+def parse_due_date(value):
+    """Return an ISO ``YYYY-MM-DD`` due date from SAP data, or ``None``.
+
+    Accepts plain dates and datetimes (the time is dropped); anything else
+    is treated as undated.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).strip()).date().isoformat()
+    except ValueError:
+        return None
+
+
+def refresh_job_locations(conn) -> int:
+    """Replace the ``job_locations`` snapshot with current data from SAP."""
+    rows = sap_service.list_job_locations()
+    positions = {}
+    params = []
+    for r in rows:
+        positions[r.job] = positions.get(r.job, -1) + 1
+        due_date = parse_due_date(r.due_date)
+        if r.due_date and due_date is None:
+            app.logger.warning('Ignoring invalid due date %r for job %s', r.due_date, r.job)
+        params.append((r.job, r.location, positions[r.job], r.quantity, due_date))
+    conn.execute('DELETE FROM job_locations')
+    conn.executemany(
+        'INSERT OR REPLACE INTO job_locations (job, location, position, quantity, due_date) VALUES (?,?,?,?,?)',
+        params,
+    )
+    conn.execute(
+        "UPDATE data_generations SET generation = generation + 1 WHERE table_name = 'job_locations'"
+    )
+    now = datetime.now().isoformat()
+    conn.execute(
+        'INSERT INTO job_location_sync (id, last_attempt, last_refresh, last_error) VALUES (1, ?, ?, NULL) '
+        'ON CONFLICT (id) DO UPDATE SET last_attempt = excluded.last_attempt, '
+        'last_refresh = excluded.last_refresh, last_error = NULL',
+        (now, now),
+    )
+    return len(params)
+
+
+def build_job_board(conn, today: date) -> list:
+    """Return board entries from the snapshot, earliest due first and undated last."""
+    jobs = {}
+    for r in conn.execute(
+        'SELECT job, due_date, location, quantity FROM job_locations '
+        'ORDER BY due_date IS NULL, due_date, job, position'
+    ):
+        entry = jobs.get(r['job'])
+        if entry is None:
+            due_date = parse_due_date(r['due_date'])
+            days = (date.fromisoformat(due_date) - today).days if due_date else None
+            if days is None:
+                highlight = ''
+            elif days <= 2:
+                highlight = 'danger'
+            elif days <= 6:
+                highlight = 'warning'
+            else:
+                highlight = ''
+            entry = jobs[r['job']] = {
+                'job': r['job'],
+                'due_date': r['due_date'] or '',
+                'due_in': f"{days} days" if days is not None else '',
+                'due_in_days': days,
+                'locations': [],
+                'total': 0,
+                'highlight': highlight,
+            }
+        entry['locations'].append((r['location'], r['quantity']))
+        entry['total'] += r['quantity']
+    return list(jobs.values())
+
+
+def run_job_location_refresh() -> dict:
+    """Run :func:`refresh_job_locations` in its own transaction, recording any error."""
+    conn = get_db()
+    try:
+        count = refresh_job_locations(conn)
+        conn.commit()
+        return {'loaded': count}
+    except Exception as e:
+        conn.rollback()
+        app.logger.error('Error refreshing job locations', exc_info=e)
+        conn.execute(
+            'INSERT INTO job_location_sync (id, last_attempt, last_error) VALUES (1, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET last_attempt = excluded.last_attempt, '
+            'last_error = excluded.last_error',
+            (datetime.now().isoformat(), str(e) or type(e).__name__),
+        )
+        conn.commit()
+        return {'error': str(e) or type(e).__name__}
+    finally:
+        conn.close()
+
+
+# Seconds between background refreshes of the job location snapshot; 0
+# leaves refreshing to `flask refresh-job-locations` (e.g. from cron)
+JOB_LOCATION_REFRESH_SECONDS = int(os.environ.get('JOB_LOCATION_REFRESH_SECONDS', 300))
+# Rendered WIP board keyed by database, with the (snapshot generation,
+# day) it was rendered for
+_job_board_cache = {}
+
+
+def job_board_html(conn):
+    """Return the rendered WIP board from the current snapshot.
+
+    The snapshot is refreshed in the background, never by the request.
+    """
+    today = date.today()
+    key = (data_generation(conn, 'job_locations'), today)
+    cached = _job_board_cache.get(DATABASE)
+    count_cache_lookup('job_board', cached and cached[0] == key)
+    if cached and cached[0] == key:
+        return cached[1]
+    html = Markup(render_template('components/job_board.html', jobs=build_job_board(conn, today)))
+    _job_board_cache[DATABASE] = (key, html)
+    return html
+
+
+JOB_STATUSES = ('Waiting', 'In Progress', 'Blocked', 'Done')
+
+
+def init_jobs(conn):
+    """Create the floor jobs table used by the jobs dashboard.
+
+    Every write stamps the rows it touches with the new ``jobs`` generation,
+    so pollers can ask for rows with ``version`` above the last one they saw.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Waiting',
+            location TEXT NOT NULL DEFAULT '',
+            updated_at TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_version ON jobs(version)')
+    conn.execute(
+        "INSERT OR IGNORE INTO data_generations (table_name, generation) VALUES ('jobs', 0)"
+    )
+
+
+def next_jobs_version(conn) -> int:
+    """Bump and return the ``jobs`` generation inside the current transaction."""
+    conn.execute("UPDATE data_generations SET generation = generation + 1 WHERE table_name = 'jobs'")
+    return data_generation(conn, 'jobs')[0]
+
+
+SNAPSHOT_FREQS = ('daily', 'weekly', 'monthly')
+SNAPSHOT_BACKFILL_DAYS = 31
+# Snapshot report -> (generation counter it depends on, loader)
+SNAPSHOT_REPORTS = {
+    'aoi-operators': (
+        'aoi_reports',
+        lambda conn, freq, start, end: load_aoi_operator_report(conn, start, end),
+    ),
+    'aoi-yield': (
+        'aoi_reports',
+        lambda conn, freq, start, end: load_inspection_report(conn, 'aoi_facts', freq, start, end),
+    ),
+    'fi-yield': (
+        'fi_reports',
+        lambda conn, freq, start, end: load_inspection_report(conn, 'fi_facts', freq, start, end),
+    ),
+    'analysis-ppm': (
+        'moat',
+        lambda conn, freq, start, end: load_ppm_report(conn, freq, '', start, end),
+    ),
+}
+
+
+def init_report_snapshots(conn):
+    """Create the stored report snapshots and the scheduler's bookkeeping.
+
+    Each snapshot is one report's JSON payload for one calendar period,
+    keyed like ``2024-03-05`` (daily), ``2024-10`` (weekly) or ``2024-03``
+    (monthly), the same :data:`PPM_PERIODS` keys the PPM rollup uses.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_snapshots (
+            report TEXT NOT NULL,
+            freq TEXT NOT NULL,
+            period TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            generation INTEGER NOT NULL,
+            generated_at TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (report, freq, period)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_report_snapshots_range '
+        'ON report_snapshots(report, start_date, end_date)'
+    )
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS report_snapshot_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_event_id INTEGER,
+            last_run TEXT,
+            last_written INTEGER
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO report_snapshot_state (id) VALUES (1)')
+    # Weekly snapshots used ISO weeks (2024-W10); drop them and let the next
+    # run backfill with the rollup's weeks
+    if conn.execute(
+        "SELECT 1 FROM report_snapshots WHERE freq = 'weekly' AND period LIKE '%-W%' LIMIT 1"
+    ).fetchone():
+        conn.execute("DELETE FROM report_snapshots WHERE freq = 'weekly' AND period LIKE '%-W%'")
+        conn.execute('UPDATE report_snapshot_state SET last_event_id = NULL')
+
+
+def snapshot_period(freq, day):
+    """Return ``(key, start, end)`` of the calendar period containing *day*.
+
+    Keys and bounds follow :data:`PPM_PERIODS` and :func:`period_bounds`,
+    so weeks start on Monday and are split at the turn of the year.
+    """
+    start, end = period_bounds(freq, day)
+    return day.strftime(PPM_PERIODS[freq]), start, end
+
+
+def generate_report_snapshots(conn, today=None, since=None):
+    """Write snapshots for every period whose data may have changed.
+
+    Periods are found from the ``data_events`` feed since the last run,
+    plus yesterday and today. On the first run, after a gap in the feed, or
+    when *since* is given, every period from *since* (default
+    ``SNAPSHOT_BACKFILL_DAYS`` ago) to *today* is rebuilt. When the feed
+    is complete, the snapshots it shows as unchanged are stamped with the
+    current generation so they can keep being served. Returns the number
+    of snapshots written.
+    """
+    today = today or date.today()
+    state = conn.execute('SELECT last_event_id FROM report_snapshot_state').fetchone()
+    last_event = state['last_event_id']
+    first_event = conn.execute('SELECT MIN(id) FROM data_events').fetchone()[0]
+    complete = last_event is not None and not (first_event and first_event > last_event + 1)
+    if since is None and not complete:
+        since = today - timedelta(days=SNAPSHOT_BACKFILL_DAYS)
+
+    days = {today, today - timedelta(days=1)}
+    if since:
+        days.update(since + timedelta(days=n) for n in range((today - since).days + 1))
+    touched = {counter: set(days) for counter, _ in SNAPSHOT_REPORTS.values()}
+    # Read before the feed, so a write landing in between leaves its
+    # periods stamped with an older generation rather than a newer one
+    generations = {counter: data_generation(conn, counter)[0] for counter in touched}
+    events = data_events_since(conn, last_event or 0)
+    for event in events:
+        if event['table'] not in touched:
+            continue
+        for d in event['dates']:
+            try:
+                touched[event['table']].add(date.fromisoformat(d))
+            except ValueError:
+                app.logger.warning('Skipping unparseable report date %r in data event %s', d, event['id'])
+
+    written = 0
+    generated_at = datetime.utcnow().isoformat(timespec='seconds')
+    for report, (counter, loader) in SNAPSHOT_REPORTS.items():
+        generation = generations[counter]
+        if complete:
+            conn.execute(
+                'UPDATE report_snapshots SET generation = ? WHERE report = ?', (generation, report)
+            )
+        for freq in SNAPSHOT_FREQS:
+            periods = {snapshot_period(freq, d) for d in touched[counter] if d <= today}
+            for key, start, end in sorted(periods):
+                payload = loader(conn, freq, start, end)
+                conn.execute(
+                    'INSERT OR REPLACE INTO report_snapshots '
+                    '(report, freq, period, start_date, end_date, generation, generated_at, payload) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        report, freq, key, start.isoformat(), end.isoformat(),
+                        generation, generated_at, json.dumps(payload),
+                    ),
+                )
+                written += 1
+    latest = events[-1]['id'] if events else last_event
+    if latest is None:
+        latest = conn.execute('SELECT COALESCE(MAX(id), 0) FROM data_events').fetchone()[0]
+    conn.execute(
+        'UPDATE report_snapshot_state SET last_event_id = ?, last_run = ?, last_written = ?',
+        (latest, generated_at, written),
+    )
+    return written
+
+
+def _snapshot_row(row):
+    return {
+        'freq': row['freq'],
+        'period': row['period'],
+        'start': row['start_date'],
+        'end': row['end_date'],
+        'generated_at': row['generated_at'],
+        'data': json.loads(row['payload']),
+    }
+
+
+def load_report_snapshot(conn, report, freq, period='latest'):
+    """Return a stored snapshot (``latest`` = most recent period) or ``None``."""
+    if period == 'latest':
+        row = conn.execute(
+            'SELECT * FROM report_snapshots WHERE report = ? AND freq = ? '
+            'ORDER BY start_date DESC LIMIT 1',
+            (report, freq),
+        ).fetchone()
+    else:
+        row = conn.execute(
+            'SELECT * FROM report_snapshots WHERE report = ? AND freq = ? AND period = ?',
+            (report, freq, period),
+        ).fetchone()
+    return _snapshot_row(row) if row else None
+
+
+def find_report_snapshot(conn, report, start, end):
+    """Return the snapshot of *report* covering exactly *start*..*end*.
+
+    Only a snapshot taken at the report's current data generation is
+    returned; after a write it is ``None`` until the next snapshot run.
+    """
+    counter = SNAPSHOT_REPORTS[report][0]
+    row = conn.execute(
+        'SELECT * FROM report_snapshots WHERE report = ? AND start_date = ? AND end_date = ? '
+        'AND generation = ? LIMIT 1',
+        (report, start.isoformat(), end.isoformat(), data_generation(conn, counter)[0]),
+    ).fetchone()
+    return _snapshot_row(row) if row else None
+
+
+def list_report_snapshots(conn, report, limit=60):
+    """Return ``{freq: [period, ...]}`` of the newest snapshots of *report*."""
+    periods = {}
+    for freq in SNAPSHOT_FREQS:
+        rows = conn.execute(
+            'SELECT period, start_date, end_date FROM report_snapshots '
+            'WHERE report = ? AND freq = ? ORDER BY start_date DESC LIMIT ?',
+            (report, freq, limit),
+        ).fetchall()
+        periods[freq] = [
+            {'period': r['period'], 'start': r['start_date'], 'end': r['end_date']} for r in rows
+        ]
+    return periods
+
+
+def init_db(database=None):
+    conn = get_db(database)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS moat (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_name TEXT,
+            total_boards INTEGER,
+            total_parts_per_board INTEGER,
+            total_parts INTEGER,
+            ng_parts INTEGER,
+            ng_ppm REAL,
+            falsecall_parts INTEGER,
+            falsecall_ppm REAL,
+            upload_time TEXT,
+            filename TEXT,
+            report_date TEXT,
+            line TEXT
+        )
+    ''')
+
+    # Older database versions may lack the `filename` column. Ensure it exists so
+    # uploaded file names can be tracked for later management/deletion without
+    # storing them directly in the MOAT view.
+    existing_cols = [r['name'] for r in conn.execute("PRAGMA table_info(moat)").fetchall()]
+    if 'filename' not in existing_cols:
+        conn.execute('ALTER TABLE moat ADD COLUMN filename TEXT')
+    if 'report_date' not in existing_cols:
+        conn.execute('ALTER TABLE moat ADD COLUMN report_date TEXT')
+    if 'line' not in existing_cols:
+        conn.execute('ALTER TABLE moat ADD COLUMN line TEXT')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS verified_markings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            part_number TEXT,
+            mfg_number1 TEXT,
+            mfg_number2 TEXT,
+            manufacturer TEXT,
+            verified_markings TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stencils (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stencil_number TEXT,
+            part_number TEXT,
+            ref TEXT,
+            description TEXT,
+            location_of_stencil TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS aoi_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_date TEXT NOT NULL,
+            shift TEXT,
+            operator TEXT,
+            customer TEXT,
+            assembly TEXT,
+            rev TEXT,
+            job_number TEXT,
+            qty_inspected INTEGER,
+            qty_rejected INTEGER,
+            additional_info TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fi_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_date TEXT NOT NULL,
+            shift TEXT,
+            operator TEXT,
+            customer TEXT,
+            assembly TEXT,
+            rev TEXT,
+            job_number TEXT,
+            qty_inspected INTEGER,
+            qty_rejected INTEGER,
+            additional_info TEXT
+        )
+    ''')
+    # Users with per-feature permissions. The ADMIN account is created by
+    # default along with a basic USER account. Additional users can be managed
+    # from the settings page.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            part_markings INTEGER DEFAULT 0,
+            aoi INTEGER DEFAULT 0,
+            analysis INTEGER DEFAULT 0,
+            dashboard INTEGER DEFAULT 0,
+            reports INTEGER DEFAULT 0,
+            c_suite INTEGER DEFAULT 0,
+            is_admin INTEGER DEFAULT 0
+        )
+    ''')
+
+    # Older database versions may lack the `c_suite` or `reports` column.
+    # Ensure they exist so privileged users beyond the hard-coded ADMIN account
+    # can be granted the same access rights.
+    existing_cols = [r['name'] for r in conn.execute("PRAGMA table_info(users)").fetchall()]
+    if 'c_suite' not in existing_cols:
+        conn.execute('ALTER TABLE users ADD COLUMN c_suite INTEGER DEFAULT 0')
+    if 'reports' not in existing_cols:
+        conn.execute('ALTER TABLE users ADD COLUMN reports INTEGER DEFAULT 0')
+
+    # Ensure new columns exist for older AOI report tables
+    aoi_cols = [r['name'] for r in conn.execute("PRAGMA table_info(aoi_reports)").fetchall()]
+    if 'rev' not in aoi_cols:
+        conn.execute('ALTER TABLE aoi_reports ADD COLUMN rev TEXT')
+    if 'job_number' not in aoi_cols:
+        conn.execute('ALTER TABLE aoi_reports ADD COLUMN job_number TEXT')
+
+    fi_cols = [r['name'] for r in conn.execute("PRAGMA table_info(fi_reports)").fetchall()]
+    if 'rev' not in fi_cols:
+        conn.execute('ALTER TABLE fi_reports ADD COLUMN rev TEXT')
+    if 'job_number' not in fi_cols:
+        conn.execute('ALTER TABLE fi_reports ADD COLUMN job_number TEXT')
+
+    conn.execute(
+        'INSERT OR IGNORE INTO users (username, password, part_markings, aoi, analysis, dashboard, reports, c_suite, is_admin) VALUES (?,?,?,?,?,?,?,?,?)',
+        (
+            'ADMIN',
+            generate_password_hash('MasterAdmin'),
+            1,
+            1,
+            1,
+            1,
+            1,
+            1,
+            1,
+        ),
+    )
+    conn.execute(
+        'INSERT OR IGNORE INTO users (username, password, part_markings, aoi, analysis, dashboard, reports, c_suite, is_admin) VALUES (?,?,?,?,?,?,?,?,?)',
+        (
+            'USER',
+            generate_password_hash('fuji'),
+            1,
+            0,
+            0,
+            0,
+            0,
+            0,
+            0,
+        ),
+    )
+    # Ensure existing ADMIN row gains C-suite privileges and report access if
+    # they pre-existed the column addition.
+    conn.execute("UPDATE users SET c_suite=1, reports=1 WHERE username='ADMIN'")
+    migrated = migrate_star_schema(conn)
+    init_ppm_rollups(conn)
+    init_spc_tables(conn)
+    init_job_summaries(conn)
+    init_data_generations(conn)
+    init_data_events(conn)
+    init_filter_options(conn)
+    init_materials(conn)
+    init_job_locations(conn)
+    init_jobs(conn)
+    init_report_snapshots(conn)
+    init_background_leases(conn)
+    conn.commit()
+    if migrated:
+        # Reclaim the pages freed by dropping the text-heavy legacy tables.
+        conn.execute('VACUUM')
+    conn.close()
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the schema, migrating an older database in place."""
+    init_db()
+    click.echo(f'Initialized {DATABASE}')
+
+# Identifies this process when it claims a background job lease
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+# Seconds a lease lasts while its job runs (renewed every third of it),
+# and how long before the next run a finished job's lease lapses
+LEASE_GRACE_SECONDS = 60
+
+
+def claim_lease(name, seconds) -> bool:
+    """Claim or renew the lease on background job *name* for *seconds*.
+
+    Returns ``True`` when this process holds the lease. Every worker of a
+    multi-process server starts the same background threads; only the
+    lease holder runs the job, and another takes over once it expires.
+    """
+    now = datetime.now()
+    conn = get_db()
+    try:
+        cur = conn.execute(
+            'INSERT INTO background_leases (name, owner, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+            'WHERE background_leases.owner = excluded.owner OR background_leases.expires_at < ?',
+            (name, WORKER_ID, (now + timedelta(seconds=seconds)).isoformat(), now.isoformat()),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def _renew_lease(name, stop):
+    while not stop.wait(LEASE_GRACE_SECONDS / 3):
+        try:
+            claim_lease(name, LEASE_GRACE_SECONDS)
+        except Exception as e:
+            app.logger.warning('Could not renew lease on %s', name, exc_info=e)
+
+
+def run_background_job(name, job) -> bool:
+    """Run *job* if this process can claim its lease; return whether it ran.
+
+    The lease lasts ``LEASE_GRACE_SECONDS`` and is renewed while the job
+    runs, so if this process dies mid-run another can take over soon after.
+    Errors are logged rather than raised so the calling loop survives.
+    """
+    try:
+        if not claim_lease(name, LEASE_GRACE_SECONDS):
+            return False
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_renew_lease, args=(name, stop), name=f'{name}-lease', daemon=True)
+        heartbeat.start()
+        try:
+            job()
+        finally:
+            stop.set()
+            heartbeat.join()
+        return True
+    except Exception as e:
+        app.logger.error('Background job %s failed', name, exc_info=e)
+        return False
+
+
+def start_background_job(name, job, delay, run_first=False):
+    """Run *job* in a daemon thread, sleeping ``delay()`` seconds between runs.
+
+    After a run the lease is kept until ``LEASE_GRACE_SECONDS`` before the
+    next one: other processes skip this round, but any of them can take
+    the next one if this process has died.
+    """
+    def loop():
+        if not run_first:
+            time.sleep(delay())
+        while True:
+            if run_background_job(name, job):
+                try:
+                    claim_lease(name, delay() - LEASE_GRACE_SECONDS)
+                except Exception as e:
+                    app.logger.warning('Could not hold lease on %s', name, exc_info=e)
+            time.sleep(delay())
+
+    threading.Thread(target=loop, name=name, daemon=True).start()
+
+
+# Seconds between background material syncs; 0 leaves syncing to the
+# `flask sync-materials` command (e.g. from cron).
+MATERIAL_SYNC_INTERVAL = int(os.environ.get('MATERIAL_SYNC_INTERVAL', 0))
+
+if MATERIAL_SYNC_INTERVAL > 0:
+    start_background_job('material-sync', run_material_sync, lambda: MATERIAL_SYNC_INTERVAL, run_first=True)
+
+if JOB_LOCATION_REFRESH_SECONDS > 0:
+    start_background_job('job-locations', run_job_location_refresh, lambda: JOB_LOCATION_REFRESH_SECONDS)
+
+
+# "HH:MM" local time of the nightly PPM import and report snapshot run
+REPORT_SNAPSHOT_AT = os.environ.get('REPORT_SNAPSHOT_AT', '')
+
+
+def run_report_snapshots(since=None, database=None):
+    """Generate report snapshots in their own transaction; return the count."""
+    conn = get_db(database)
+    try:
+        written = generate_report_snapshots(conn, since=since)
+        conn.commit()
+        return written
+    except Exception as e:
+        app.logger.error('Error generating report snapshots', exc_info=e)
+        return 0
+    finally:
+        conn.close()
+
+
+def _seconds_until(at, now=None):
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def run_nightly_reports():
+    """Import the shared-drive PPM reports, then generate report snapshots."""
+    try:
+        app.logger.info(import_public_ppm_reports())
+    except Exception as e:
+        app.logger.error('Error importing public PPM reports', exc_info=e)
+    return run_report_snapshots()
+
 
-    # Older database versions may lack the `c_suite` or `reports` column.
-    # Ensure they exist so privileged users beyond the hard-coded ADMIN account
-    # can be granted the same access rights.
-    existing_cols = [r['name'] for r in conn.execute("PRAGMA table_info(users)").fetchall()]
-    if 'c_suite' not in existing_cols:
-        conn.execute('ALTER TABLE users ADD COLUMN c_suite INTEGER DEFAULT 0')
-    if 'reports' not in existing_cols:
-        conn.execute('ALTER TABLE users ADD COLUMN reports INTEGER DEFAULT 0')
+if REPORT_SNAPSHOT_AT:
+    start_background_job('report-snapshots', run_nightly_reports, lambda: _seconds_until(REPORT_SNAPSHOT_AT))
 
-    # Ensure new columns exist for older AOI report tables
-    aoi_cols = [r['name'] for r in conn.execute("PRAGMA table_info(aoi_reports)").fetchall()]
-    if 'rev' not in aoi_cols:
-        conn.execute('ALTER TABLE aoi_reports ADD COLUMN rev TEXT')
-    if 'job_number' not in aoi_cols:
-        conn.execute('ALTER TABLE aoi_reports ADD COLUMN job_number TEXT')
 
-    fi_cols = [r['name'] for r in conn.execute("PRAGMA table_info(fi_reports)").fetchall()]
-    if 'rev' not in fi_cols:
-        conn.execute('ALTER TABLE fi_reports ADD COLUMN rev TEXT')
-    if 'job_number' not in fi_cols:
-        conn.execute('ALTER TABLE fi_reports ADD COLUMN job_number TEXT')
+@app.cli.command('snapshot-reports')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), help='Rebuild every period from this date.')
+def snapshot_reports_command(since):
+    """Store daily, weekly and monthly report snapshots."""
+    written = run_report_snapshots(since.date() if since else None)
+    click.echo(f'{written} report snapshots written')
 
-    conn.execute(
-        'INSERT OR IGNORE INTO users (username, password, part_markings, aoi, analysis, dashboard, reports, c_suite, is_admin) VALUES (?,?,?,?,?,?,?,?,?)',
-        (
-            'ADMIN',
-            generate_password_hash('MasterAdmin'),
-            1,
-            1,
-            1,
-            1,
-            1,
-            1,
-            1,
-        ),
-    )
-    conn.execute(
-        'INSERT OR IGNORE INTO users (username, password, part_markings, aoi, analysis, dashboard, reports, c_suite, is_admin) VALUES (?,?,?,?,?,?,?,?,?)',
-        (
-            'USER',
-            generate_password_hash('fuji'),
-            1,
-            0,
-            0,
-            0,
-            0,
-            0,
-            0,
-        ),
-    )
-    # Ensure existing ADMIN row gains C-suite privileges and report access if
-    # they pre-existed the column addition.
-    conn.execute("UPDATE users SET c_suite=1, reports=1 WHERE username='ADMIN'")
-    conn.commit()
-    conn.close()
 
-# Initialize database
-init_db()
+@app.cli.command('build-assets')
+@click.option('--skip-vendor', is_flag=True, help='Do not download missing third-party files.')
+def build_assets_command(skip_vendor):
+    """Vendor third-party libraries and write fingerprinted bundles."""
+    if not skip_vendor:
+        for path in vendor_assets(app.static_folder):
+            click.echo(f'downloaded {path}')
+    try:
+        manifest = build_asset_bundles(app.static_folder)
+    except FileNotFoundError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f'{len(manifest)} bundles written to static/dist')
+
+
+@app.cli.command('refresh-job-locations')
+def refresh_job_locations_command():
+    """Reload the home page WIP board snapshot from SAP."""
+    result = run_job_location_refresh()
+    click.echo(result.get('error') or f"{result['loaded']} job locations loaded")
+
+
+@app.cli.command('sync-materials')
+@click.option('--full', is_flag=True, help='Re-read every material instead of changes only.')
+def sync_materials_command(full):
+    """Refresh the local materials mirror from SAP."""
+    result = run_material_sync(full=full)
+    click.echo(result.get('error') or f"{result['mode']} sync: {result['fetched']} fetched, {result['removed']} removed")
+
+
+@app.cli.command('generate-data')
+@click.option('--rows', default='10k', help='Rows to generate: 10k, 100k, 1m, 5m or any count.')
+@click.option('--seed', default=0, type=int, help='Same seed, same data.')
+@click.option('--db', 'database', required=True, type=click.Path(dir_okay=False),
+              help='Database file to fill; it must not hold report data or extra users yet.')
+@click.option('--password', required=True, help='Password for every generated user.')
+def generate_data_command(rows, seed, database, password):
+    """Fill an empty database with deterministic synthetic data for load testing."""
+    try:
+        count = parse_scale(rows)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint='--rows')
+    init_db(database)
+    # Batch inserts are slow by design; a plain connection keeps them out
+    # of the slow query log
+    conn = sqlite3.connect(database)
+    try:
+        filled = [
+            table for table, where in (
+                ('aoi_reports', ''), ('fi_reports', ''), ('moat', ''),
+                ('users', " WHERE username NOT IN ('ADMIN', 'USER')"),
+            )
+            if conn.execute(f'SELECT 1 FROM {table}{where} LIMIT 1').fetchone()
+        ]
+        if filled:
+            raise click.UsageError(
+                f"{database} already has rows in {', '.join(filled)}; generate into an empty database"
+            )
+        counts = populate_synthetic_data(conn, count, seed, password_hash=generate_password_hash(password))
+    finally:
+        conn.close()
+    counts['report_snapshots'] = run_report_snapshots(since=DEFAULT_START, database=database)
+    click.echo(', '.join(f'{n} {table}' for table, n in counts.items()))
 
 
 if hasattr(app, 'before_first_request'):
@@ -322,6 +2348,7 @@ else:
             msg = import_public_ppm_reports()
             app.config['STARTUP_PPM_MSG'] = msg
 
+
 # --- Auth helpers ---
 def login_required(f):
     @wraps(f)
@@ -351,6 +2378,49 @@ def has_permission(feature: str) -> bool:
     return bool(row['allowed'])
 
 
+def conditional_on(*tables, vary=None, permissions=()):
+    """Answer repeat polls with ``304 Not Modified`` until *tables* change.
+
+    The ETag hashes the endpoint, its arguments, the user and the current
+    generations of *tables*, so an unchanged poll costs one lookup in
+    ``data_generations`` and never reaches the view. ``vary`` returns an
+    extra key part for state kept outside the database. Only 200 responses
+    get an ETag, and a view can opt out by sending ``Cache-Control: no-store``.
+    Every feature in *permissions* is checked first, so a user who lost
+    access gets 403 rather than a 304 for what they saw before.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not all(has_permission(p) for p in permissions):
+                return jsonify(error='Forbidden'), 403
+            conn = get_db()
+            generations = data_generation(conn, *tables)
+            conn.close()
+            key = [
+                request.endpoint,
+                request.view_args,
+                sorted(request.args.items(multi=True)),
+                session.get('user'),
+                generations,
+                vary() if vary else None,
+            ]
+            etag = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+            not_modified = request.if_none_match.contains(etag)
+            count_cache_lookup('etag', not_modified)
+            if not_modified:
+                resp = app.response_class(status=304)
+            else:
+                resp = app.make_response(f(*args, **kwargs))
+                if resp.status_code != 200 or resp.cache_control.no_store:
+                    return resp
+            resp.set_etag(etag)
+            resp.headers['Cache-Control'] = 'no-cache'
+            return resp
+        return decorated
+    return decorator
+
+
 def is_admin_user() -> bool:
     user = session.get('user')
     if not user:
@@ -398,6 +2468,15 @@ def inject_globals():
                 }
     return dict(current_user=user, permissions=perms, is_admin=is_admin)
 
+@app.after_request
+def cache_fingerprinted_assets(response):
+    """Let browsers keep hashed bundles forever; their names change with content."""
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        filename = request.view_args.get('filename', '')
+        if filename.startswith('dist/') and filename != f'dist/{MANIFEST_NAME}':
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
 # --- Routes ---
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -487,86 +2566,159 @@ def settings():
 @app.route('/')
 @login_required
 def home():
-    # Example placeholder data; replace with SAP integration later
-    today = datetime.today()
-    example_data = [
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 5,
-            'locations': [('Hand Assembly', 295), ('Rework', 5)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 10,
-            'locations': [('Depanel', 75)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 4,
-            'locations': [('Final Inspect', 1500)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 2,
-            'locations': [('Hand Assembly', 25)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': -2,
-            'locations': [('AOI', 230), ('Rework', 20)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 13,
-            'locations': [('SMT', 1000)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 9,
-            'locations': [('AOI', 100), ('Rework', 75)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 1,
-            'locations': [('ERSA', 450), ('AOI', 478), ('Rework', 72)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': 0,
-            'locations': [('Hand Assembly', 100)],
-        },
-        {
-            'job': '[Assembly #] (DRAFT)',
-            'due_in_days': -1,
-            'locations': [('Hand Assembly', 100)],
-        },
-    ]
+    conn = get_db()
+    board = job_board_html(conn)
+    conn.close()
+    return render_template('home.html', job_board=board)
 
-    # Sort by days until due so earliest jobs appear first
-    example_data.sort(key=lambda x: x['due_in_days'])
 
-    jobs = []
-    for item in example_data:
-        due_date = today + timedelta(days=item['due_in_days'])
+@app.route('/jobs')
+@login_required
+def jobs_page():
+    return render_template('jobs.html')
 
-        days = item['due_in_days']
-        if days <= 2:
-            highlight = 'danger'
-        elif days <= 6:
-            highlight = 'warning'
-        else:
-            highlight = ''
-
-        jobs.append({
-            'job': item['job'],
-            'due_date': due_date.strftime('%Y-%m-%d'),
-            'due_in': f"{days} days",
-            'locations': item['locations'],
-            'total': sum(count for _, count in item['locations']),
-            'highlight': highlight,
-            'due_in_days': days,
-        })
-    return render_template('home.html', sample_jobs=jobs)
+
+@app.route('/api/jobs')
+@login_required
+def api_jobs():
+    """List jobs; ``since`` returns only jobs changed after that cursor.
+
+    The ``X-Jobs-Cursor`` header carries the cursor for the next poll and
+    the ETag lets unchanged polls end in a 304 without touching the table.
+    """
+    since = request.args.get('since', type=int)
+    conn = get_db()
+    generation = data_generation(conn, 'jobs')[0]
+    # The body depends on the cursor, so it is part of the validator
+    etag = f'jobs-{generation}' if since is None else f'jobs-{generation}-since-{since}'
+    if request.if_none_match.contains(etag):
+        conn.close()
+        resp = app.response_class(status=304)
+    else:
+        query = 'SELECT id, name, status, location, updated_at, version FROM jobs'
+        params = []
+        if since is not None:
+            query += ' WHERE version > ?'
+            params.append(since)
+        rows = conn.execute(query + ' ORDER BY id', params).fetchall()
+        conn.close()
+        resp = jsonify([dict(r) for r in rows])
+    resp.set_etag(etag)
+    resp.headers['X-Jobs-Cursor'] = str(generation)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+@app.route('/filters/<any(aoi, fi, moat):source>')
+@login_required
+def filter_options(source):
+    """Return the dropdown option lists for the AOI, FI or MOAT filters."""
+    if not has_permission('analysis' if source == 'moat' else 'aoi'):
+        return jsonify(error='Forbidden'), 403
+    view = {'aoi': 'aoi_reports', 'fi': 'fi_reports', 'moat': 'moat'}[source]
+    conn = get_db()
+    options = load_filter_options(conn, view)
+    conn.close()
+    return jsonify(options)
+
+
+@app.route('/events')
+@login_required
+def data_events_feed():
+    """Server-Sent Events stream announcing committed data changes."""
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_id = int(last_id) if last_id is not None else None
+    except ValueError:
+        return jsonify(error='Invalid event id'), 400
+    return Response(
+        stream_data_events(last_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+def _job_payloads(data, key):
+    """Return the list under *key*, or *data* itself as a single item.
+
+    Returns ``None`` unless the body is an object and every item is one.
+    """
+    if not isinstance(data, dict):
+        return None
+    items = data.get(key)
+    if items is None:
+        return [data]
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return None
+    return items
+
+
+@app.route('/api/add', methods=['POST'])
+@login_required
+def api_add_jobs():
+    """Add one job (``{name}``) or several (``{jobs: [...]}``) in one transaction."""
+    items = _job_payloads(request.get_json(silent=True), 'jobs')
+    if not items:
+        return jsonify(error='No jobs given'), 400
+    rows = []
+    for item in items:
+        name = str(item.get('name') or '').strip()
+        status = item.get('status') or 'Waiting'
+        if not name or status not in JOB_STATUSES:
+            return jsonify(error='Each job needs a name and a valid status'), 400
+        rows.append((name, status, str(item.get('location') or '').strip()))
+    conn = get_db()
+    version = next_jobs_version(conn)
+    now = datetime.now().isoformat(timespec='seconds')
+    ids = []
+    for name, status, location in rows:
+        cur = conn.execute(
+            'INSERT INTO jobs (name, status, location, updated_at, version) VALUES (?,?,?,?,?)',
+            (name, status, location, now, version),
+        )
+        ids.append(cur.lastrowid)
+    conn.commit()
+    conn.close()
+    return jsonify(ids=ids, cursor=version), 201
+
+
+@app.route('/api/update', methods=['POST'])
+@login_required
+def api_update_jobs():
+    """Update status/location of one job or of ``{updates: [...]}`` atomically."""
+    items = _job_payloads(request.get_json(silent=True), 'updates')
+    if not items:
+        return jsonify(error='No updates given'), 400
+    updates = []
+    for item in items:
+        try:
+            job_id = int(item.get('job_id'))
+        except (TypeError, ValueError):
+            return jsonify(error='Invalid job id'), 400
+        status = item.get('status')
+        if status is not None and status not in JOB_STATUSES:
+            return jsonify(error='Invalid status'), 400
+        location = item.get('location')
+        updates.append((status, None if location is None else str(location).strip(), job_id))
+    conn = get_db()
+    version = next_jobs_version(conn)
+    now = datetime.now().isoformat(timespec='seconds')
+    missing = []
+    for status, location, job_id in updates:
+        cur = conn.execute(
+            'UPDATE jobs SET status = COALESCE(?, status), location = COALESCE(?, location), '
+            'updated_at = ?, version = ? WHERE id = ?',
+            (status, location, now, version, job_id),
+        )
+        if not cur.rowcount:
+            missing.append(job_id)
+    if missing:
+        conn.rollback()
+        conn.close()
+        return jsonify(error='Job not found', missing=missing), 404
+    conn.commit()
+    conn.close()
+    return jsonify(updated=len(updates), cursor=version)
 
 
 @app.route('/docs')
@@ -639,7 +2791,11 @@ def part_markings():
         conn.commit()
     rows = conn.execute('SELECT * FROM verified_markings ORDER BY id').fetchall()
     conn.close()
-    return render_template('part_markings.html', markings=rows)
+    return render_template(
+        'part_markings.html',
+        markings=rows,
+        sap_descriptions=material_descriptions(r['part_number'] for r in rows),
+    )
 
 
 @app.route('/part-markings/<int:row_id>', methods=['PUT'])
@@ -704,7 +2860,11 @@ def rework():
         conn.commit()
     rows = conn.execute('SELECT * FROM stencils ORDER BY id').fetchall()
     conn.close()
-    return render_template('rework.html', stencils=rows)
+    return render_template(
+        'rework.html',
+        stencils=rows,
+        sap_descriptions=material_descriptions(r['part_number'] for r in rows),
+    )
 
 
 @app.route('/rework/<int:row_id>', methods=['PUT'])
@@ -742,6 +2902,54 @@ def delete_stencil(row_id):
     conn.close()
     return jsonify(success=True)
 
+def inspection_row_filters(args):
+    """Return ``(where, params)`` for the AOI/FI dashboard filters in *args*."""
+    where = 'WHERE 1=1'
+    params = []
+    if args.get('start'):
+        where += ' AND report_date >= ?'
+        params.append(args['start'])
+    if args.get('end'):
+        where += ' AND report_date <= ?'
+        params.append(args['end'])
+    for field in INSPECTION_FILTERS:
+        if args.get(field):
+            where += f' AND {field} = ?'
+            params.append(args[field])
+    return where, params
+
+
+def moat_row_filters(args):
+    """Return ``(where, params)`` for the MOAT chart filters in *args*."""
+    where = 'WHERE 1=1'
+    params = []
+    if args.get('start'):
+        where += ' AND report_date >= ?'
+        params.append(args['start'])
+    if args.get('end'):
+        where += ' AND report_date <= ?'
+        params.append(args['end'])
+    models = [m.strip() for m in args.get('models', '').split(',') if m.strip()]
+    if models:
+        placeholders = ','.join('?' for _ in models)
+        where += f' AND model_name IN ({placeholders})'
+        params.extend(models)
+    lines = [l for l in args.get('lines', '').split(',') if l]
+    if lines:
+        clause = ' OR '.join('filename LIKE ?' for _ in lines)
+        where += f' AND ({clause})'
+        params.extend([f'%{line}%' for line in lines])
+    model_filter = args.get('model_filter', '').upper()
+    if model_filter in ('SMT', 'TH'):
+        where += ' AND UPPER(model_name) LIKE ?'
+        params.append(f'%{model_filter}%')
+    threshold = args.get('threshold', type=int, default=0)
+    if threshold:
+        where += ' AND total_boards >= ?'
+        params.append(threshold)
+    return where, params
+
+
 @app.route('/aoi', methods=['GET', 'POST'])
 @login_required
 def aoi_report():
@@ -784,8 +2992,12 @@ def aoi_report():
                     'INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)',
                     records,
                 )
+                record_data_event(conn, 'aoi_reports', [report_date])
                 conn.commit()
+                IMPORTS.inc(source='aoi')
+                IMPORTED_ROWS.inc(len(records), source='aoi')
             conn.close()
+            refresh_spc_rules()
             return redirect(url_for('aoi_report'))
 
         # single record submission
@@ -801,8 +3013,10 @@ def aoi_report():
             'INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)',
             (report_date, shift, operator, customer, assembly, rev, job_number, inspected, rejected, additional),
         )
+        record_data_event(conn, 'aoi_reports', [report_date])
         conn.commit()
         conn.close()
+        refresh_spc_rules()
         return redirect(url_for('aoi_report'))
 
     # GET: fetch rows and analytics
@@ -813,26 +3027,7 @@ def aoi_report():
     operator_filter = request.args.get('operator')
     assembly_filter = request.args.get('assembly')
 
-    where = 'WHERE 1=1'
-    params = []
-    if start:
-        where += ' AND report_date >= ?'
-        params.append(start)
-    if end:
-        where += ' AND report_date <= ?'
-        params.append(end)
-    if customer:
-        where += ' AND customer = ?'
-        params.append(customer)
-    if shift_filter:
-        where += ' AND shift = ?'
-        params.append(shift_filter)
-    if operator_filter:
-        where += ' AND operator = ?'
-        params.append(operator_filter)
-    if assembly_filter:
-        where += ' AND assembly = ?'
-        params.append(assembly_filter)
+    where, params = inspection_row_filters(request.args)
 
     rows = conn.execute(
         f'SELECT * FROM aoi_reports {where} ORDER BY report_date DESC, id DESC',
@@ -865,10 +3060,11 @@ def aoi_report():
         f'FROM aoi_reports {where} GROUP BY report_date ORDER BY report_date',
         params,
     ).fetchall()
-    customer_opts = [r['customer'] for r in conn.execute('SELECT DISTINCT customer FROM aoi_reports ORDER BY customer').fetchall()]
-    shift_opts = [r['shift'] for r in conn.execute('SELECT DISTINCT shift FROM aoi_reports ORDER BY shift').fetchall()]
-    operator_opts = [r['operator'] for r in conn.execute('SELECT DISTINCT operator FROM aoi_reports ORDER BY operator').fetchall()]
-    assembly_opts = [r['assembly'] for r in conn.execute('SELECT DISTINCT assembly FROM aoi_reports ORDER BY assembly').fetchall()]
+    options = load_filter_options(conn, 'aoi_reports')
+    customer_opts = options['customer']
+    shift_opts = options['shift']
+    operator_opts = options['operator']
+    assembly_opts = options['assembly']
     conn.close()
 
     operators = []
@@ -943,161 +3139,185 @@ def aoi_report():
     )
 
 
-@app.route('/aoi/report-data')
-@login_required
-def aoi_report_data():
-    if not has_permission('aoi'):
-        return jsonify(error='Forbidden'), 403
-    freq = request.args.get('freq', 'daily').lower()
-    start = request.args.get('start')
-    end = request.args.get('end')
-    group_map = {
-        'daily': '%Y-%m-%d',
-        'weekly': '%Y-%W',
-        'monthly': '%Y-%m',
-        'yearly': '%Y',
-    }
-    days_map = {
-        'daily': 1,
-        'weekly': 7,
-        'monthly': 30,
-        'yearly': 365,
-    }
-    group = group_map.get(freq)
-    if not group:
-        return jsonify(error='Invalid frequency'), 400
-
-    conn = get_db()
+REPORT_GROUP_FORMATS = {
+    'daily': '%Y-%m-%d',
+    'weekly': '%Y-%W',
+    'monthly': '%Y-%m',
+    'yearly': '%Y',
+}
+REPORT_PERIOD_DAYS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+    'yearly': 365,
+}
+INSPECTION_FILTERS = ('customer', 'shift', 'operator', 'assembly')
+EMPTY_INSPECTION_REPORT = {
+    'operators': [],
+    'shift_totals': [],
+    'customer_rates': [],
+    'yield_series': [],
+    'assemblies': [],
+}
+
+
+def inspection_report_range(conn, facts, freq, start=None, end=None):
+    """Return the ``(start, end)`` dates an AOI/FI report covers.
+
+    Explicit *start*/*end* strings are parsed (``ValueError`` when
+    malformed); otherwise the window is the last *freq* period ending at the
+    latest report date. Returns ``None`` when *facts* holds no rows.
+    """
     if start and end:
-        try:
-            start_date = datetime.strptime(start, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end, '%Y-%m-%d').date()
-        except ValueError:
-            conn.close()
-            return jsonify(error='Invalid date format'), 400
-    else:
-        delta = days_map.get(freq)
-        if not delta:
-            conn.close()
-            return jsonify(error='Invalid frequency'), 400
-        end_row = conn.execute('SELECT MAX(report_date) AS max_date FROM aoi_reports').fetchone()
-        if not end_row or not end_row['max_date']:
-            conn.close()
-            return jsonify(operators=[], shift_totals=[], customer_rates=[], yield_series=[], assemblies=[])
-        end_date = datetime.strptime(end_row['max_date'], '%Y-%m-%d').date()
-        start_date = end_date - timedelta(days=delta - 1)
+        return (
+            datetime.strptime(start, '%Y-%m-%d').date(),
+            datetime.strptime(end, '%Y-%m-%d').date(),
+        )
+    end_row = conn.execute(f'SELECT MAX(report_date) AS max_date FROM {facts}').fetchone()
+    if not end_row or not end_row['max_date']:
+        return None
+    end_date = datetime.strptime(end_row['max_date'], '%Y-%m-%d').date()
+    return end_date - timedelta(days=REPORT_PERIOD_DAYS[freq] - 1), end_date
 
+
+def load_inspection_report(conn, facts, freq, start_date, end_date, filters=None):
+    """Aggregate *facts* (``aoi_facts`` or ``fi_facts``) for a report window.
+
+    Returns the operator, shift, customer, yield and assembly sections that
+    ``/aoi/report-data`` and ``/final-inspect/report-data`` serve.
+    """
     where = 'WHERE report_date BETWEEN ? AND ?'
     params = [start_date.isoformat(), end_date.isoformat()]
-    for field in ['customer', 'shift', 'operator', 'assembly']:
-        val = request.args.get(field)
+    for field, val in (filters or {}).items():
         if val:
-            where += f' AND {field} = ?'
+            where += f' AND {dim_filter(field)}'
             params.append(val)
+    group = REPORT_GROUP_FORMATS[freq]
 
     op_rows = conn.execute(
-        f'SELECT operator, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
-        f'FROM aoi_reports {where} '
-        'GROUP BY operator ORDER BY inspected DESC',
+        'SELECT dim_operator.name AS operator, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
+        f'FROM {facts} LEFT JOIN dim_operator ON dim_operator.id = operator_id {where} '
+        'GROUP BY operator_id ORDER BY inspected DESC',
         params,
     ).fetchall()
     asm_rows = conn.execute(
-        f'SELECT assembly, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
-        f'FROM aoi_reports {where} '
-        'GROUP BY assembly ORDER BY inspected DESC',
+        'SELECT dim_assembly.name AS assembly, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
+        f'FROM {facts} LEFT JOIN dim_assembly ON dim_assembly.id = assembly_id {where} '
+        'GROUP BY assembly_id ORDER BY inspected DESC',
         params,
     ).fetchall()
     shift_rows = conn.execute(
-        f'SELECT shift, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
-        f'FROM aoi_reports {where} '
-        'GROUP BY shift ORDER BY shift',
+        'SELECT dim_shift.name AS shift, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
+        f'FROM {facts} LEFT JOIN dim_shift ON dim_shift.id = shift_id {where} '
+        'GROUP BY shift_id ORDER BY shift',
         params,
     ).fetchall()
     cust_rows = conn.execute(
-        f'SELECT customer, SUM(qty_rejected)*1.0/SUM(qty_inspected) AS rate '
-        f'FROM aoi_reports {where} '
-        'GROUP BY customer ORDER BY customer',
+        'SELECT dim_customer.name AS customer, SUM(qty_rejected)*1.0/SUM(qty_inspected) AS rate '
+        f'FROM {facts} LEFT JOIN dim_customer ON dim_customer.id = customer_id {where} '
+        'GROUP BY customer_id ORDER BY customer',
         params,
     ).fetchall()
     yield_rows = conn.execute(
         f"SELECT strftime('{group}', report_date) AS period, "
         "1 - SUM(qty_rejected)*1.0/SUM(qty_inspected) AS yield "
-        f'FROM aoi_reports {where} '
+        f'FROM {facts} {where} '
         "GROUP BY period ORDER BY period",
         params,
     ).fetchall()
-    conn.close()
-    # Fetch Final Inspect reject rate from Supabase combined_reports view
-    fi_rates = {}
-    sb_url = os.environ.get('SUPABASE_URL')
-    sb_key = os.environ.get('SUPABASE_KEY') or os.environ.get('SUPABASE_SERVICE_KEY')
-    if requests and sb_url and sb_key and asm_rows:
-        headers = {'apikey': sb_key, 'Authorization': f'Bearer {sb_key}'}
-        for r in asm_rows:
-            asm = r['assembly']
-            if not asm:
-                continue
-            try:
-                resp = requests.get(
-                    f"{sb_url}/rest/v1/combined_reports?select=fi_reject_rate&assembly=eq.{quote(asm)}",
-                    headers=headers,
-                    timeout=10,
-                )
-                if resp.ok:
-                    data = resp.json()
-                    if isinstance(data, list) and data:
-                        fi_rates[asm] = data[0].get('fi_reject_rate')
-            except Exception:
-                continue
 
-    operators = [
-        {
-            'operator': r['operator'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-        }
-        for r in op_rows
-    ]
-    assemblies = [
-        {
-            'assembly': r['assembly'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-            'yield': 1 - (r['rejected'] * 1.0 / r['inspected']) if r['inspected'] else 0,
-            'fi_reject_rate': fi_rates.get(r['assembly']),
-        }
-        for r in asm_rows
-    ]
-    shift_totals = [
-        {
-            'shift': r['shift'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-        }
-        for r in shift_rows
-    ]
-    customer_rates = [
-        {
-            'customer': r['customer'],
-            'rate': r['rate'] or 0,
-        }
-        for r in cust_rows
-    ]
-    yield_series = [
-        {
-            'period': r['period'],
-            'yield': r['yield'] or 0,
-        }
-        for r in yield_rows
-    ]
+    return {
+        'operators': [
+            {
+                'operator': r['operator'],
+                'inspected': r['inspected'] or 0,
+                'rejected': r['rejected'] or 0,
+            }
+            for r in op_rows
+        ],
+        'shift_totals': [
+            {
+                'shift': r['shift'],
+                'inspected': r['inspected'] or 0,
+                'rejected': r['rejected'] or 0,
+            }
+            for r in shift_rows
+        ],
+        'customer_rates': [
+            {
+                'customer': r['customer'],
+                'rate': r['rate'] or 0,
+            }
+            for r in cust_rows
+        ],
+        'yield_series': [
+            {
+                'period': r['period'],
+                'yield': r['yield'] or 0,
+            }
+            for r in yield_rows
+        ],
+        'assemblies': [
+            {
+                'assembly': r['assembly'],
+                'inspected': r['inspected'] or 0,
+                'rejected': r['rejected'] or 0,
+                'yield': 1 - (r['rejected'] * 1.0 / r['inspected']) if r['inspected'] else 0,
+            }
+            for r in asm_rows
+        ],
+    }
 
-    return jsonify(
-        operators=operators,
-        shift_totals=shift_totals,
-        customer_rates=customer_rates,
-        yield_series=yield_series,
-        assemblies=assemblies,
-    )
+
+def _inspection_report_response(facts):
+    """Shared body of the AOI and FI report-data routes.
+
+    Returns ``(report, None)`` or ``(None, error_response)``.
+    """
+    freq = request.args.get('freq', 'daily').lower()
+    if freq not in REPORT_GROUP_FORMATS:
+        return None, (jsonify(error='Invalid frequency'), 400)
+    conn = get_db()
+    try:
+        bounds = inspection_report_range(
+            conn, facts, freq, request.args.get('start'), request.args.get('end')
+        )
+        if bounds is None:
+            return dict(EMPTY_INSPECTION_REPORT), None
+        filters = {f: request.args.get(f) for f in INSPECTION_FILTERS}
+        return load_inspection_report(conn, facts, freq, *bounds, filters), None
+    except ValueError:
+        return None, (jsonify(error='Invalid date format'), 400)
+    finally:
+        conn.close()
+
+
+def _fi_rate_epoch():
+    """Changes each time cached Supabase FI rates may have been refreshed."""
+    client = get_fi_rate_client()
+    return int(time.time() // client.cache.ttl) if client else None
+
+
+@app.route('/aoi/report-data')
+@login_required
+@conditional_on('aoi_reports', vary=_fi_rate_epoch, permissions=('aoi',))
+def aoi_report_data():
+    report, error = _inspection_report_response('aoi_facts')
+    if error:
+        return error
+    # Fetch Final Inspect reject rate from Supabase combined_reports view
+    fi_rates = {}
+    fi_pending = []
+    fi_client = get_fi_rate_client()
+    if fi_client and report['assemblies']:
+        fi_rates, fi_pending = fi_client.get_rates(r['assembly'] for r in report['assemblies'])
+    for row in report['assemblies']:
+        row['fi_reject_rate'] = fi_rates.get(row['assembly'])
+    resp = jsonify(**report, fi_pending=fi_pending)
+    if fi_pending:
+        # Rates still loading; the next poll must not get a 304
+        resp.headers['Cache-Control'] = 'no-store'
+    return resp
 
 
 @app.route('/aoi/sql', methods=['POST'])
@@ -1138,9 +3358,13 @@ def delete_aoi_record(row_id):
         return jsonify(error='Forbidden'), 403
     try:
         conn = get_db()
+        row = conn.execute('SELECT report_date FROM aoi_reports WHERE id = ?', (row_id,)).fetchone()
         conn.execute('DELETE FROM aoi_reports WHERE id = ?', (row_id,))
+        if row:
+            record_data_event(conn, 'aoi_reports', [row['report_date']])
         conn.commit()
         conn.close()
+        refresh_spc_rules()
         return jsonify(success=True)
     except Exception as e:
         return jsonify(error=str(e)), 500
@@ -1170,9 +3394,14 @@ def update_aoi_record(row_id):
         return jsonify(error='Invalid field'), 400
     try:
         conn = get_db()
+        row = conn.execute('SELECT report_date FROM aoi_reports WHERE id = ?', (row_id,)).fetchone()
         conn.execute(f'UPDATE aoi_reports SET {field} = ? WHERE id = ?', (value, row_id))
+        if row:
+            dates = [row['report_date'], value if field == 'report_date' else None]
+            record_data_event(conn, 'aoi_reports', dates)
         conn.commit()
         conn.close()
+        refresh_spc_rules()
         return jsonify(success=True)
     except Exception as e:
         return jsonify(error=str(e)), 500
@@ -1219,7 +3448,10 @@ def final_inspect_report():
                     'INSERT INTO fi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)',
                     records,
                 )
+                record_data_event(conn, 'fi_reports', [report_date])
                 conn.commit()
+                IMPORTS.inc(source='fi')
+                IMPORTED_ROWS.inc(len(records), source='fi')
             conn.close()
             return redirect(url_for('final_inspect_report'))
 
@@ -1235,6 +3467,7 @@ def final_inspect_report():
             'INSERT INTO fi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)',
             (report_date, shift, operator, customer, assembly, rev, job_number, inspected, rejected, additional),
         )
+        record_data_event(conn, 'fi_reports', [report_date])
         conn.commit()
         conn.close()
         return redirect(url_for('final_inspect_report'))
@@ -1246,26 +3479,7 @@ def final_inspect_report():
     operator_filter = request.args.get('operator')
     assembly_filter = request.args.get('assembly')
 
-    where = 'WHERE 1=1'
-    params = []
-    if start:
-        where += ' AND report_date >= ?'
-        params.append(start)
-    if end:
-        where += ' AND report_date <= ?'
-        params.append(end)
-    if customer:
-        where += ' AND customer = ?'
-        params.append(customer)
-    if shift_filter:
-        where += ' AND shift = ?'
-        params.append(shift_filter)
-    if operator_filter:
-        where += ' AND operator = ?'
-        params.append(operator_filter)
-    if assembly_filter:
-        where += ' AND assembly = ?'
-        params.append(assembly_filter)
+    where, params = inspection_row_filters(request.args)
 
     rows = conn.execute(
         f'SELECT * FROM fi_reports {where} ORDER BY report_date DESC, id DESC',
@@ -1298,10 +3512,11 @@ def final_inspect_report():
         f'FROM fi_reports {where} GROUP BY report_date ORDER BY report_date',
         params,
     ).fetchall()
-    customer_opts = [r['customer'] for r in conn.execute('SELECT DISTINCT customer FROM fi_reports ORDER BY customer').fetchall()]
-    shift_opts = [r['shift'] for r in conn.execute('SELECT DISTINCT shift FROM fi_reports ORDER BY shift').fetchall()]
-    operator_opts = [r['operator'] for r in conn.execute('SELECT DISTINCT operator FROM fi_reports ORDER BY operator').fetchall()]
-    assembly_opts = [r['assembly'] for r in conn.execute('SELECT DISTINCT assembly FROM fi_reports ORDER BY assembly').fetchall()]
+    options = load_filter_options(conn, 'fi_reports')
+    customer_opts = options['customer']
+    shift_opts = options['shift']
+    operator_opts = options['operator']
+    assembly_opts = options['assembly']
     conn.close()
 
     operators = []
@@ -1378,136 +3593,12 @@ def final_inspect_report():
 
 @app.route('/final-inspect/report-data')
 @login_required
+@conditional_on('fi_reports', permissions=('aoi',))
 def final_inspect_report_data():
-    if not has_permission('aoi'):
-        return jsonify(error='Forbidden'), 403
-    freq = request.args.get('freq', 'daily').lower()
-    start = request.args.get('start')
-    end = request.args.get('end')
-    group_map = {
-        'daily': '%Y-%m-%d',
-        'weekly': '%Y-%W',
-        'monthly': '%Y-%m',
-        'yearly': '%Y',
-    }
-    days_map = {
-        'daily': 1,
-        'weekly': 7,
-        'monthly': 30,
-        'yearly': 365,
-    }
-    group = group_map.get(freq)
-    if not group:
-        return jsonify(error='Invalid frequency'), 400
-
-    conn = get_db()
-    if start and end:
-        try:
-            start_date = datetime.strptime(start, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end, '%Y-%m-%d').date()
-        except ValueError:
-            conn.close()
-            return jsonify(error='Invalid date format'), 400
-    else:
-        delta = days_map.get(freq)
-        if not delta:
-            conn.close()
-            return jsonify(error='Invalid frequency'), 400
-        end_row = conn.execute('SELECT MAX(report_date) AS max_date FROM fi_reports').fetchone()
-        if not end_row or not end_row['max_date']:
-            conn.close()
-            return jsonify(operators=[], shift_totals=[], customer_rates=[], yield_series=[], assemblies=[])
-        end_date = datetime.strptime(end_row['max_date'], '%Y-%m-%d').date()
-        start_date = end_date - timedelta(days=delta - 1)
-
-    where = 'WHERE report_date BETWEEN ? AND ?'
-    params = [start_date.isoformat(), end_date.isoformat()]
-    for field in ['customer', 'shift', 'operator', 'assembly']:
-        val = request.args.get(field)
-        if val:
-            where += f' AND {field} = ?'
-            params.append(val)
-
-    op_rows = conn.execute(
-        f'SELECT operator, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
-        f'FROM fi_reports {where} '
-        'GROUP BY operator ORDER BY inspected DESC',
-        params,
-    ).fetchall()
-    asm_rows = conn.execute(
-        f'SELECT assembly, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
-        f'FROM fi_reports {where} '
-        'GROUP BY assembly ORDER BY inspected DESC',
-        params,
-    ).fetchall()
-    shift_rows = conn.execute(
-        f'SELECT shift, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
-        f'FROM fi_reports {where} '
-        'GROUP BY shift ORDER BY shift',
-        params,
-    ).fetchall()
-    cust_rows = conn.execute(
-        f'SELECT customer, SUM(qty_rejected)*1.0/SUM(qty_inspected) AS rate '
-        f'FROM fi_reports {where} '
-        'GROUP BY customer ORDER BY customer',
-        params,
-    ).fetchall()
-    yield_rows = conn.execute(
-        f"SELECT strftime('{group}', report_date) AS period, "
-        "1 - SUM(qty_rejected)*1.0/SUM(qty_inspected) AS yield "
-        f'FROM fi_reports {where} '
-        "GROUP BY period ORDER BY period",
-        params,
-    ).fetchall()
-    conn.close()
-
-    operators = [
-        {
-            'operator': r['operator'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-        }
-        for r in op_rows
-    ]
-    assemblies = [
-        {
-            'assembly': r['assembly'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-            'yield': 1 - (r['rejected'] * 1.0 / r['inspected']) if r['inspected'] else 0,
-        }
-        for r in asm_rows
-    ]
-    shift_totals = [
-        {
-            'shift': r['shift'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-        }
-        for r in shift_rows
-    ]
-    customer_rates = [
-        {
-            'customer': r['customer'],
-            'rate': r['rate'] or 0,
-        }
-        for r in cust_rows
-    ]
-    yield_series = [
-        {
-            'period': r['period'],
-            'yield': r['yield'] or 0,
-        }
-        for r in yield_rows
-    ]
-
-    return jsonify(
-        operators=operators,
-        shift_totals=shift_totals,
-        customer_rates=customer_rates,
-        yield_series=yield_series,
-        assemblies=assemblies,
-    )
+    report, error = _inspection_report_response('fi_facts')
+    if error:
+        return error
+    return jsonify(**report)
 
 
 @app.route('/final-inspect/sql', methods=['POST'])
@@ -1548,7 +3639,10 @@ def delete_final_inspect_record(row_id):
         return jsonify(error='Forbidden'), 403
     try:
         conn = get_db()
+        row = conn.execute('SELECT report_date FROM fi_reports WHERE id = ?', (row_id,)).fetchone()
         conn.execute('DELETE FROM fi_reports WHERE id = ?', (row_id,))
+        if row:
+            record_data_event(conn, 'fi_reports', [row['report_date']])
         conn.commit()
         conn.close()
         return jsonify(success=True)
@@ -1605,7 +3699,12 @@ def analysis():
 
             conn = get_db()
             df.to_sql('moat', conn, if_exists='append', index=False)
+            record_data_event(conn, 'moat', [report_date], [line_val])
+            conn.commit()
+            IMPORTS.inc(source='moat')
+            IMPORTED_ROWS.inc(len(df), source='moat')
             conn.close()
+            refresh_spc_rules()
 
         return redirect(url_for('analysis', view='moat'))
 
@@ -1636,9 +3735,8 @@ def analysis():
         total_rows = 0
         earliest = latest = ''
     conn = get_db()
-    model_rows = conn.execute('SELECT DISTINCT model_name FROM moat ORDER BY model_name').fetchall()
+    model_names = load_filter_options(conn, 'moat')['model_name']
     conn.close()
-    model_names = [r['model_name'] for r in model_rows]
 
     return render_template(
         'analysis.html',
@@ -1662,47 +3760,17 @@ def analysis_refresh():
 
 @app.route('/analysis/chart-data')
 @login_required
+@conditional_on('moat')
 def chart_data():
-    start = request.args.get('start')
-    end = request.args.get('end')
-    threshold = request.args.get('threshold', type=int, default=0)
     metric = request.args.get('metric', 'fc')
-    lines_param = request.args.get('lines', '')
-    models_param = request.args.get('models', '')
-    model_filter = request.args.get('model_filter', '').upper()
     column = 'falsecall_parts' if metric == 'fc' else 'ng_parts'
     conn = get_db()
+    where, params = moat_row_filters(request.args)
     query = (
         f'SELECT model_name, report_date, '
         f'{column}*1.0/total_boards AS rate, total_boards '
-        'FROM moat WHERE 1=1'
+        f'FROM moat {where} ORDER BY report_date, model_name'
     )
-    params = []
-    if start:
-        query += ' AND report_date >= ?'
-        params.append(start)
-    if end:
-        query += ' AND report_date <= ?'
-        params.append(end)
-    if models_param:
-        models = [m.strip() for m in models_param.split(',') if m.strip()]
-        if models:
-            placeholders = ','.join('?' for _ in models)
-            query += f' AND model_name IN ({placeholders})'
-            params.extend(models)
-    if lines_param:
-        lines = [l for l in lines_param.split(',') if l]
-        if lines:
-            clause = ' OR '.join('filename LIKE ?' for _ in lines)
-            query += f' AND ({clause})'
-            params.extend([f'%{line}%' for line in lines])
-    if model_filter in ('SMT', 'TH'):
-        query += ' AND UPPER(model_name) LIKE ?'
-        params.append(f'%{model_filter}%')
-    if threshold:
-        query += ' AND total_boards >= ?'
-        params.append(threshold)
-    query += ' ORDER BY report_date, model_name'
     data = conn.execute(query, params).fetchall()
     conn.close()
     return jsonify([
@@ -1717,6 +3785,7 @@ def chart_data():
 
 @app.route('/analysis/stddev-data')
 @login_required
+@conditional_on('moat')
 def stddev_data():
     start = request.args.get('start')
     end = request.args.get('end')
@@ -1762,75 +3831,321 @@ def stddev_data():
     else:
         mean = stdev = 0
     return jsonify({'mean': mean, 'stdev': stdev, 'rates': [{'model': r['model_name'], 'rate': r['rate']} for r in rows]})
+
+
+@app.route('/analysis/spc-violations')
+@login_required
+@conditional_on('moat', 'aoi_reports', permissions=('analysis',))
+def spc_violations():
+    """Return run-rule violations for MOAT models or AOI assemblies."""
+    series_type = request.args.get('type', 'moat')
+    if series_type not in SPC_SERIES:
+        return jsonify(error='Invalid series type'), 400
+    limit = request.args.get('limit', type=int, default=500)
+
+    conn = get_db()
+    query = (
+        'SELECT series_key, source_id, report_date, rule, value, center, sigma, detected_at '
+        'FROM spc_violations WHERE series_type = ?'
+    )
+    params = [series_type]
+    key = request.args.get('key')
+    if key:
+        query += ' AND series_key = ?'
+        params.append(key)
+    start = request.args.get('start')
+    if start:
+        query += ' AND report_date >= ?'
+        params.append(start)
+    end = request.args.get('end')
+    if end:
+        query += ' AND report_date <= ?'
+        params.append(end)
+    rule = request.args.get('rule')
+    if rule:
+        query += ' AND rule = ?'
+        params.append(rule)
+    query += ' ORDER BY report_date DESC, id DESC LIMIT ?'
+    params.append(limit)
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return jsonify(
+        rules=RULES,
+        violations=[
+            {
+                'key': r['series_key'],
+                'source_id': r['source_id'],
+                'report_date': r['report_date'],
+                'rule': r['rule'],
+                'description': RULES.get(r['rule']),
+                'value': r['value'],
+                'center': r['center'],
+                'sigma': r['sigma'],
+                'detected_at': r['detected_at'],
+            }
+            for r in rows
+        ],
+    )
+
+
+def load_ppm_report(conn, freq, line='', start_date=None, end_date=None):
+    """Return the MOAT PPM report for *freq* periods, or ``None``.
+
+    Without explicit dates the window is the last *freq* period ending at
+    the latest imported report date.
+    """
+    if start_date is None or end_date is None:
+        end_row = conn.execute(
+            "SELECT MAX(period) AS max_date FROM moat_ppm_rollup WHERE freq = 'daily' AND line = ''"
+        ).fetchone()
+        if not end_row or not end_row['max_date']:
+            return None
+        end_date = date.fromisoformat(end_row['max_date'])
+        start_date = end_date - timedelta(days=REPORT_PERIOD_DAYS[freq] - 1)
+    rows = [
+        {
+            'period': period,
+            'boards': boards,
+            'falsecall_ppm': fc_parts * 1000000.0 / total_parts if total_parts else None,
+            'ng_ppm': ng_parts * 1000000.0 / total_parts if total_parts else None,
+        }
+        for period, boards, total_parts, fc_parts, ng_parts
+        in read_ppm_rollup(conn, freq, start_date, end_date, line)
+    ]
+    return {
+        'labels': [r['period'] for r in rows],
+        'falsecall_ppm': [r['falsecall_ppm'] for r in rows],
+        'ng_ppm': [r['ng_ppm'] for r in rows],
+        'table': rows,
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+    }
+
+
 @app.route('/analysis/report-data')
 @login_required
+@conditional_on('moat', permissions=('analysis', 'reports'))
 def analysis_report_data():
-    if not has_permission('analysis') or not has_permission('reports'):
-        return jsonify(error='Forbidden'), 403
     freq = request.args.get('freq', 'daily').lower()
-    group_map = {
-        'daily': '%Y-%m-%d',
-        'weekly': '%Y-%W',
-        'monthly': '%Y-%m',
-        'yearly': '%Y',
-    }
-    days_map = {
-        'daily': 1,
-        'weekly': 7,
-        'monthly': 30,
-        'yearly': 365,
-    }
-    group = group_map.get(freq)
-    delta = days_map.get(freq)
-    if not group or not delta:
+    if freq not in PPM_PERIODS or freq not in REPORT_PERIOD_DAYS:
         return jsonify(error='Invalid frequency'), 400
 
     conn = get_db()
-    end_row = conn.execute('SELECT MAX(report_date) AS max_date FROM moat').fetchone()
-    if not end_row or not end_row['max_date']:
-        conn.close()
+    report = load_ppm_report(conn, freq, request.args.get('line', ''))
+    conn.close()
+    if report is None:
         return jsonify(labels=[], falsecall_ppm=[], ng_ppm=[], table=[])
+    return jsonify({k: report[k] for k in ('labels', 'falsecall_ppm', 'ng_ppm', 'table')})
 
-    end_date = date.fromisoformat(end_row['max_date'])
-    start_date = end_date - timedelta(days=delta - 1)
-    params = [start_date.isoformat(), end_date.isoformat()]
 
-    rows = conn.execute(
-        f"""
-        SELECT strftime('{group}', report_date) AS period,
-               SUM(total_boards) AS boards,
-               SUM(falsecall_parts)*1000000.0/SUM(total_parts) AS fc_ppm,
-               SUM(ng_parts)*1000000.0/SUM(total_parts) AS ng_ppm
-        FROM moat
-        WHERE report_date BETWEEN ? AND ?
-        GROUP BY period
-        ORDER BY period
-        """,
-        params,
-    ).fetchall()
-    conn.close()
-    return jsonify({
-        'labels': [r['period'] for r in rows],
-        'falsecall_ppm': [r['fc_ppm'] for r in rows],
-        'ng_ppm': [r['ng_ppm'] for r in rows],
-        'table': [
-            {
-                'period': r['period'],
-                'boards': r['boards'],
-                'falsecall_ppm': r['fc_ppm'],
-                'ng_ppm': r['ng_ppm'],
-            }
-            for r in rows
-        ]
-    })
+@app.route('/reports')
+@login_required
+def reports():
+    if not has_permission('reports'):
+        return redirect('/')
+    return render_template('reports.html')
+
+
+# Rendered report type -> (title, fact table, generation counter)
+RENDERED_REPORTS = {
+    'aoi': ('AOI Report', 'aoi_facts', 'aoi_reports'),
+    'fi': ('Final Inspect Report', 'fi_facts', 'fi_reports'),
+    'moat': ('MOAT PPM Report', None, 'moat'),
+}
+REPORT_RENDER_CACHE_SIZE = 64
+_report_render_cache = {}
+
+
+def _pct(value):
+    return value * 100 if value is not None else None
+
+
+def _inspection_sections(report, anonymize):
+    operators = report['operators']
+    names = [
+        f'Operator {idx + 1}' if anonymize else o['operator']
+        for idx, o in enumerate(operators)
+    ]
+    inspected = sum(o['inspected'] for o in operators)
+    rejected = sum(o['rejected'] for o in operators)
+    rate = rejected / inspected * 100 if inspected else 0
+    return [
+        {
+            'title': 'Operators',
+            'summary': (
+                f'Total inspected: {inspected}, Total rejected: {rejected}, '
+                f'Avg reject rate: {rate:.2f}%'
+            ),
+            'chart': {
+                'kind': 'bar',
+                'labels': names,
+                'series': [{'label': 'Rejected', 'values': [o['rejected'] for o in operators]}],
+            },
+            'table': {
+                'columns': ['Operator', 'Inspected', 'Rejected', 'Reject %'],
+                'rows': [
+                    [name, o['inspected'], o['rejected'],
+                     o['rejected'] / o['inspected'] * 100 if o['inspected'] else None]
+                    for name, o in zip(names, operators)
+                ],
+            },
+        },
+        {
+            'title': 'Shifts',
+            'chart': {
+                'kind': 'bar',
+                'labels': [s['shift'] for s in report['shift_totals']],
+                'series': [{'label': 'Inspected', 'values': [s['inspected'] for s in report['shift_totals']]}],
+            },
+        },
+        {
+            'title': 'Customer Reject Rate',
+            'chart': {
+                'kind': 'bar',
+                'labels': [c['customer'] for c in report['customer_rates']],
+                'series': [{'label': 'Reject %', 'values': [_pct(c['rate']) for c in report['customer_rates']]}],
+            },
+        },
+        {
+            'title': 'Yield',
+            'chart': {
+                'kind': 'line',
+                'max': 100,
+                'labels': [y['period'] for y in report['yield_series']],
+                'series': [{'label': 'Yield %', 'values': [_pct(y['yield']) for y in report['yield_series']]}],
+            },
+        },
+        {
+            'title': 'Assemblies',
+            'table': {
+                'columns': ['Assembly', 'Inspected', 'Rejected', 'Yield %'],
+                'rows': [
+                    [a['assembly'], a['inspected'], a['rejected'], _pct(a['yield'])]
+                    for a in report['assemblies']
+                ],
+            },
+        },
+    ]
+
+
+def _ppm_sections(report):
+    rows = report['table']
+    fc = [r['falsecall_ppm'] for r in rows if r['falsecall_ppm'] is not None]
+    ng = [r['ng_ppm'] for r in rows if r['ng_ppm'] is not None]
+    return [{
+        'title': 'FalseCall and NG PPM',
+        'summary': (
+            f'Avg FalseCall PPM: {sum(fc) / (len(fc) or 1):.2f}, '
+            f'Avg NG PPM: {sum(ng) / (len(ng) or 1):.2f} '
+            f'across {sum(r["boards"] or 0 for r in rows)} boards.'
+        ),
+        'chart': {
+            'kind': 'line',
+            'labels': report['labels'],
+            'series': [
+                {'label': 'FalseCall PPM', 'values': report['falsecall_ppm']},
+                {'label': 'NG PPM', 'values': report['ng_ppm']},
+            ],
+        },
+        'table': {
+            'columns': ['Period', 'Total Boards', 'FalseCall PPM', 'NG PPM'],
+            'rows': [[r['period'], r['boards'], r['falsecall_ppm'], r['ng_ppm']] for r in rows],
+        },
+    }]
+
+
+def build_report_sections(conn, report_type, freq, start=None, end=None, anonymize=False):
+    """Return ``(subtitle, sections)`` for a rendered report.
+
+    Sections come from the same loaders as the report-data endpoints. A
+    malformed *start*/*end* raises ``ValueError``.
+    """
+    _, facts, _ = RENDERED_REPORTS[report_type]
+    if facts:
+        bounds = inspection_report_range(conn, facts, freq, start, end)
+        if bounds is None:
+            return 'No data', []
+        report = load_inspection_report(conn, facts, freq, *bounds)
+        sections = _inspection_sections(report, anonymize)
+    else:
+        bounds = (None, None)
+        if start and end:
+            bounds = (date.fromisoformat(start), date.fromisoformat(end))
+        report = load_ppm_report(conn, freq, '', *bounds)
+        if report is None:
+            return 'No data', []
+        bounds = (date.fromisoformat(report['start']), date.fromisoformat(report['end']))
+        sections = _ppm_sections(report)
+    subtitle = f'{freq.capitalize()} | {bounds[0].isoformat()} to {bounds[1].isoformat()}'
+    return subtitle, sections
+
+
+@app.route('/reports/render/<any(aoi, fi, moat):report_type>')
+@login_required
+def render_report(report_type):
+    """Render a report as PDF (default) or HTML on the server.
 
+    Output is cached by (report type, period, format, data generation), so
+    repeated downloads between uploads cost one dictionary lookup.
+    """
+    if report_type == 'moat':
+        allowed = has_permission('analysis') and has_permission('reports')
+    else:
+        allowed = has_permission('aoi')
+    if not allowed:
+        return jsonify(error='Forbidden'), 403
+    freq = request.args.get('period', 'daily').lower()
+    fmt = request.args.get('format', 'pdf').lower()
+    if freq not in REPORT_PERIOD_DAYS:
+        return jsonify(error='Invalid period'), 400
+    if fmt not in ('pdf', 'html'):
+        return jsonify(error='Invalid format'), 400
+    start = request.args.get('start') or None
+    end = request.args.get('end') or None
+    anonymize = not is_admin_user()
+    title, _, counter = RENDERED_REPORTS[report_type]
 
-@app.route('/reports')
-@login_required
-def reports():
-    if not has_permission('reports'):
-        return redirect('/')
-    return render_template('reports.html')
+    conn = get_db()
+    try:
+        generation = data_generation(conn, counter)
+        key = (DATABASE, report_type, freq, start, end, fmt, anonymize)
+        cached = _report_render_cache.get(key)
+        count_cache_lookup('report_render', cached and cached[0] == generation)
+        if cached and cached[0] == generation:
+            body = cached[1]
+        else:
+            try:
+                subtitle, sections = build_report_sections(
+                    conn, report_type, freq, start, end, anonymize
+                )
+            except ValueError:
+                return jsonify(error='Invalid date format'), 400
+            if fmt == 'pdf':
+                body = render_pdf(title, sections, subtitle)
+            else:
+                body = render_template(
+                    'report_render.html',
+                    title=title,
+                    subtitle=subtitle,
+                    sections=sections,
+                    chart_layout=chart_layout,
+                    format_cell=format_cell,
+                    palette=PALETTE,
+                ).encode()
+            _report_render_cache.pop(key, None)
+            while len(_report_render_cache) >= REPORT_RENDER_CACHE_SIZE:
+                _report_render_cache.pop(next(iter(_report_render_cache)))
+            _report_render_cache[key] = (generation, body)
+    finally:
+        conn.close()
+
+    if fmt == 'pdf':
+        resp = Response(body, mimetype='application/pdf')
+        resp.headers['Content-Disposition'] = (
+            f'attachment; filename={report_type}-{freq}-report.pdf'
+        )
+        return resp
+    return Response(body, mimetype='text/html')
 
 
 @app.route('/reports/aoi-operators')
@@ -1839,35 +4154,35 @@ def aoi_operator_report_view():
     """Render the AOI operator performance report."""
     if not has_permission('reports'):
         return redirect('/')
-    return render_template('aoi_operator_report.html')
+    conn = get_db()
+    snapshots = list_report_snapshots(conn, 'aoi-operators')
+    conn.close()
+    return render_template('aoi_operator_report.html', snapshots=snapshots)
 
 
-@app.route('/reports/aoi-operators/data')
+@app.route('/reports/snapshots/<report>')
+@app.route('/reports/snapshots/<report>/<any(daily, weekly, monthly):freq>/<period>')
 @login_required
-def aoi_operator_report_data():
-    """Return aggregated AOI operator data for reports."""
+def report_snapshot(report, freq=None, period=None):
+    """List a report's snapshot periods, or return one stored snapshot."""
     if not has_permission('reports'):
         return jsonify(error='Forbidden'), 403
-
-    start = request.args.get('start')
-    end = request.args.get('end')
-
+    if report not in SNAPSHOT_REPORTS:
+        return jsonify(error='Unknown report'), 404
     conn = get_db()
-    if start and end:
-        try:
-            start_date = datetime.strptime(start, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end, '%Y-%m-%d').date()
-        except ValueError:
-            conn.close()
-            return jsonify(error='Invalid date format'), 400
-    else:
-        end_row = conn.execute('SELECT MAX(report_date) AS max_date FROM aoi_reports').fetchone()
-        if not end_row or not end_row['max_date']:
-            conn.close()
-            return jsonify(summary={'inspected': 0, 'rejected': 0, 'yield': 0}, operators=[])
-        end_date = datetime.strptime(end_row['max_date'], '%Y-%m-%d').date()
-        start_date = end_date - timedelta(days=29)
+    try:
+        if freq is None:
+            return jsonify(report=report, periods=list_report_snapshots(conn, report))
+        snapshot = load_report_snapshot(conn, report, freq, period)
+    finally:
+        conn.close()
+    if snapshot is None:
+        return jsonify(error='No snapshot'), 404
+    return jsonify(report=report, **snapshot)
+
 
+def load_aoi_operator_report(conn, start_date, end_date):
+    """Return the AOI operator report summary for a date window."""
     params = [start_date.isoformat(), end_date.isoformat()]
     rows = conn.execute(
         'SELECT operator, SUM(qty_inspected) AS inspected, SUM(qty_rejected) AS rejected '
@@ -1881,36 +4196,71 @@ def aoi_operator_report_data():
         'FROM aoi_reports WHERE report_date BETWEEN ? AND ?',
         params,
     ).fetchone()
-    conn.close()
 
     total_inspected = totals['inspected'] or 0
     total_rejected = totals['rejected'] or 0
     overall_yield = 1 - (total_rejected * 1.0 / total_inspected) if total_inspected else 0
 
-    operators = [
-        {
-            'operator': r['operator'],
-            'inspected': r['inspected'] or 0,
-            'rejected': r['rejected'] or 0,
-            'yield': 1 - (r['rejected'] * 1.0 / r['inspected']) if r['inspected'] else 0,
-        }
-        for r in rows
-    ]
-
-    return jsonify(
-        summary={
+    return {
+        'summary': {
             'inspected': total_inspected,
             'rejected': total_rejected,
             'yield': overall_yield,
         },
-        operators=operators,
-    )
+        'operators': [
+            {
+                'operator': r['operator'],
+                'inspected': r['inspected'] or 0,
+                'rejected': r['rejected'] or 0,
+                'yield': 1 - (r['rejected'] * 1.0 / r['inspected']) if r['inspected'] else 0,
+            }
+            for r in rows
+        ],
+    }
+
+
+@app.route('/reports/aoi-operators/data')
+@login_required
+@conditional_on('aoi_reports', permissions=('reports',))
+def aoi_operator_report_data():
+    """Return aggregated AOI operator data for reports.
+
+    Ranges matching a closed snapshot period are answered from
+    ``report_snapshots`` without touching the raw tables.
+    """
+    start = request.args.get('start')
+    end = request.args.get('end')
+
+    conn = get_db()
+    if start and end:
+        try:
+            start_date = datetime.strptime(start, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end, '%Y-%m-%d').date()
+        except ValueError:
+            conn.close()
+            return jsonify(error='Invalid date format'), 400
+        if end_date < date.today():
+            snapshot = find_report_snapshot(conn, 'aoi-operators', start_date, end_date)
+            if snapshot:
+                conn.close()
+                return jsonify(snapshot['data'])
+    else:
+        end_row = conn.execute('SELECT MAX(report_date) AS max_date FROM aoi_reports').fetchone()
+        if not end_row or not end_row['max_date']:
+            conn.close()
+            return jsonify(summary={'inspected': 0, 'rejected': 0, 'yield': 0}, operators=[])
+        end_date = datetime.strptime(end_row['max_date'], '%Y-%m-%d').date()
+        start_date = end_date - timedelta(days=29)
+
+    report = load_aoi_operator_report(conn, start_date, end_date)
+    conn.close()
+    return jsonify(report)
+
 
 @app.route('/uploads')
 @login_required
+@conditional_on('moat', permissions=('analysis',))
 def list_uploads():
-    if not has_permission('analysis'):
-        return jsonify(files=[])
     try:
         conn = get_db()
         files = conn.execute('SELECT DISTINCT filename FROM moat').fetchall()
@@ -1930,15 +4280,138 @@ def delete_upload():
     if not filename:
         return jsonify(error='Filename required'), 400
     conn = get_db()
+    affected = conn.execute(
+        'SELECT DISTINCT report_date, line FROM moat WHERE filename = ?', (filename,)
+    ).fetchall()
     conn.execute('DELETE FROM moat WHERE filename = ?', (filename,))
+    if affected:
+        record_data_event(
+            conn,
+            'moat',
+            [r['report_date'] for r in affected],
+            [r['line'] for r in affected],
+        )
     conn.commit()
     conn.close()
+    refresh_spc_rules()
     path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     if os.path.exists(path):
         os.remove(path)
     return jsonify(success=True)
 
 
+INSPECTION_EXPORT_COLUMNS = [
+    'id', 'report_date', 'shift', 'operator', 'customer', 'assembly', 'rev',
+    'job_number', 'qty_inspected', 'qty_rejected', 'additional_info',
+]
+# Export source -> (view, columns, row filters)
+EXPORT_SOURCES = {
+    'aoi': ('aoi_reports', INSPECTION_EXPORT_COLUMNS, inspection_row_filters),
+    'fi': ('fi_reports', INSPECTION_EXPORT_COLUMNS, inspection_row_filters),
+    'moat': ('moat', [
+        'id', 'report_date', 'line', 'model_name', 'total_boards',
+        'total_parts_per_board', 'total_parts', 'ng_parts', 'ng_ppm',
+        'falsecall_parts', 'falsecall_ppm', 'filename', 'upload_time',
+    ], moat_row_filters),
+}
+EXPORT_CHUNK_ROWS = 1000
+
+
+def iter_export_chunks(conn, source, args):
+    """Yield filtered rows of *source* in chunks, closing *conn* at the end.
+
+    Rows are pulled from the cursor ``EXPORT_CHUNK_ROWS`` at a time, so
+    memory stays flat however many rows match.
+    """
+    table, columns, row_filters = EXPORT_SOURCES[source]
+    where, params = row_filters(args)
+    try:
+        cur = conn.execute(
+            f'SELECT {", ".join(columns)} FROM {table} {where} ORDER BY report_date, id',
+            params,
+        )
+        while True:
+            chunk = cur.fetchmany(EXPORT_CHUNK_ROWS)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        conn.close()
+
+
+def stream_csv(columns, chunks):
+    """Yield CSV text for a header row plus *chunks* of rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield buf.getvalue()
+    for chunk in chunks:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(chunk)
+        yield buf.getvalue()
+
+
+def write_xlsx(columns, chunks, title):
+    """Write rows into a write-only workbook and return it as a temp file.
+
+    Write-only workbooks spool rows to disk instead of building the sheet
+    in memory; the finished file is streamed back in blocks.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(columns)
+    for chunk in chunks:
+        for row in chunk:
+            ws.append(tuple(row))
+    out = tempfile.TemporaryFile()
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+def iter_file(fh, block_size=64 * 1024):
+    """Yield *fh* in blocks and close it when done."""
+    try:
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                break
+            yield block
+    finally:
+        fh.close()
+
+
+@app.route('/export/<any(aoi, fi, moat):source>')
+@login_required
+def export_rows(source):
+    """Download filtered AOI, FI or MOAT rows as CSV (default) or Excel.
+
+    Takes the same filters as the AOI/FI dashboards and the MOAT chart.
+    AOI and FI rows are also exported from the comparison page, so
+    ``analysis`` users may download them too.
+    """
+    allowed = has_permission('analysis') or (source != 'moat' and has_permission('aoi'))
+    if not allowed:
+        return jsonify(error='Forbidden'), 403
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'xlsx'):
+        return jsonify(error='Invalid format'), 400
+    table, columns, _ = EXPORT_SOURCES[source]
+    chunks = iter_export_chunks(get_db(), source, request.args)
+    if fmt == 'csv':
+        resp = Response(stream_csv(columns, chunks), mimetype='text/csv')
+    else:
+        resp = Response(
+            iter_file(write_xlsx(columns, chunks, table)),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    resp.headers['Content-Disposition'] = (
+        f'attachment; filename={source}-export-{date.today().isoformat()}.{fmt}'
+    )
+    return resp
+
+
 @app.route('/moat/sql', methods=['POST'])
 @login_required
 @csrf.exempt
@@ -2020,158 +4493,169 @@ def compare_aoi_fi():
     aoi_series = build_series(aoi_summary)
     fi_series = build_series(fi_summary)
 
-    raw_params = []
-    aoi_raw_query = (
-        'SELECT report_date, shift, operator, customer, assembly, rev, job_number, '
-        'qty_inspected, qty_rejected, additional_info FROM aoi_reports WHERE 1=1'
-    )
-    if start:
-        aoi_raw_query += ' AND report_date >= ?'
-        raw_params.append(start)
-    if end:
-        aoi_raw_query += ' AND report_date <= ?'
-        raw_params.append(end)
-    aoi_raw_query += ' ORDER BY report_date DESC, id DESC'
-    aoi_rows = conn.execute(aoi_raw_query, raw_params).fetchall()
-    aoi_rows = [dict(r) for r in aoi_rows]
-
-    raw_params = []
-    fi_raw_query = (
-        'SELECT report_date, shift, operator, customer, assembly, rev, job_number, '
-        'qty_inspected, qty_rejected, additional_info FROM fi_reports WHERE 1=1'
-    )
-    if start:
-        fi_raw_query += ' AND report_date >= ?'
-        raw_params.append(start)
-    if end:
-        fi_raw_query += ' AND report_date <= ?'
-        raw_params.append(end)
-    fi_raw_query += ' ORDER BY report_date DESC, id DESC'
-    fi_rows = conn.execute(fi_raw_query, raw_params).fetchall()
-    fi_rows = [dict(r) for r in fi_rows]
-
-    # Compute operator grades similar to the operator_grades view
-    grade_rows = conn.execute(
-        """
-        WITH a AS (
-            SELECT operator, job_number, assembly, SUM(qty_rejected) AS aoi_rejected
-            FROM aoi_reports
-            WHERE job_number IS NOT NULL AND job_number != ''
-            GROUP BY operator, job_number, assembly
-        ),
-        f AS (
-            SELECT job_number, assembly, SUM(qty_rejected) AS fi_rejected
-            FROM fi_reports
-            WHERE job_number IS NOT NULL AND job_number != ''
-            GROUP BY job_number, assembly
-        )
-        SELECT a.operator, SUM(a.aoi_rejected) AS aoi_rejected, SUM(f.fi_rejected) AS fi_rejected
-        FROM a
-        LEFT JOIN f ON a.job_number = f.job_number AND a.assembly = f.assembly
-        GROUP BY a.operator
-        ORDER BY a.operator
-        """
-    ).fetchall()
-
-    def compute_grade(aoi_rej: int, fi_rej: int):
-        total = aoi_rej + fi_rej
-        if total == 0:
-            return None, None
-        coverage = aoi_rej / total
-        if coverage >= 0.8:
-            letter = 'A'
-        elif coverage >= 0.6:
-            letter = 'B'
-        elif coverage >= 0.4:
-            letter = 'C'
-        else:
-            letter = 'D'
-        return coverage, letter
-
-    grades = []
-    for r in grade_rows:
-        a_rej = r['aoi_rejected'] or 0
-        f_rej = r['fi_rejected'] or 0
-        coverage, letter = compute_grade(a_rej, f_rej)
-        grades.append({'operator': r['operator'], 'coverage': coverage, 'grade': letter})
-
+    grades = load_operator_grades(conn)
     conn.close()
 
     return render_template(
         'compare_aoi_fi.html',
         aoi_series=aoi_series,
         fi_series=fi_series,
-        aoi_rows=aoi_rows,
-        fi_rows=fi_rows,
         grades=grades,
         start=start,
         end=end,
     )
 
 
+@app.route('/analysis/compare/<any(aoi, fi):source>/rows')
+@login_required
+@conditional_on('aoi_reports', 'fi_reports', permissions=('analysis',))
+def compare_rows(source):
+    """Return one page of raw AOI or Final Inspect rows for the comparison tables."""
+    start = request.args.get('start')
+    end = request.args.get('end')
+    page = max(request.args.get('page', type=int, default=1), 1)
+    per_page = min(max(request.args.get('per_page', type=int, default=50), 1), 500)
+    table = 'aoi_reports' if source == 'aoi' else 'fi_reports'
+
+    where = 'WHERE 1=1'
+    params = []
+    if start:
+        where += ' AND report_date >= ?'
+        params.append(start)
+    if end:
+        where += ' AND report_date <= ?'
+        params.append(end)
+    conn = get_db()
+    total = conn.execute(f'SELECT COUNT(*) FROM {table} {where}', params).fetchone()[0]
+    rows = conn.execute(
+        'SELECT report_date, shift, operator, customer, assembly, rev, job_number, '
+        f'qty_inspected, qty_rejected, additional_info FROM {table} {where} '
+        'ORDER BY report_date DESC, id DESC LIMIT ? OFFSET ?',
+        params + [per_page, (page - 1) * per_page],
+    ).fetchall()
+    conn.close()
+    return jsonify(
+        rows=[dict(r) for r in rows],
+        page=page,
+        per_page=per_page,
+        total=total,
+    )
+
+
+def _job_details(conn, keys):
+    """Return AOI and Final Inspect details for each normalized job key.
+
+    Totals come from one ``GROUP BY job_key`` query over both sources and the
+    individual rows from a second, so every caller reports the same shape:
+    ``{job_number, aoi, fi}`` where each side is ``None`` or holds
+    ``n_rows``, ``inspected``, ``rejected``, ``yield`` and ``rows``.
+    """
+    keys = list(dict.fromkeys(k for k in keys if k))
+    if not keys:
+        return {}
+    placeholders = ','.join('?' for _ in keys)
+    totals = conn.execute(
+        f"""
+        SELECT 'aoi' AS source, job_key, COUNT(*) AS n_rows,
+               COALESCE(SUM(qty_inspected), 0) AS inspected,
+               COALESCE(SUM(qty_rejected), 0) AS rejected
+        FROM aoi_reports WHERE job_key IN ({placeholders})
+        GROUP BY job_key
+        UNION ALL
+        SELECT 'fi' AS source, job_key, COUNT(*) AS n_rows,
+               COALESCE(SUM(qty_inspected), 0) AS inspected,
+               COALESCE(SUM(qty_rejected), 0) AS rejected
+        FROM fi_reports WHERE job_key IN ({placeholders})
+        GROUP BY job_key
+        """,
+        keys + keys,
+    ).fetchall()
+    rows = conn.execute(
+        f"""
+        SELECT 'aoi' AS source, job_key, job_number, report_date, shift, operator, assembly,
+               qty_inspected, qty_rejected
+        FROM aoi_reports WHERE job_key IN ({placeholders})
+        UNION ALL
+        SELECT 'fi' AS source, job_key, job_number, report_date, shift, operator, assembly,
+               qty_inspected, qty_rejected
+        FROM fi_reports WHERE job_key IN ({placeholders})
+        ORDER BY job_key, source, report_date
+        """,
+        keys + keys,
+    ).fetchall()
+
+    by_key = {}
+    for t in totals:
+        job = by_key.setdefault(t['job_key'], {'job_number': None, 'aoi': None, 'fi': None})
+        inspected, rejected = t['inspected'], t['rejected']
+        job[t['source']] = {
+            'n_rows': t['n_rows'],
+            'inspected': inspected,
+            'rejected': rejected,
+            'yield': 1 - rejected / inspected if inspected else None,
+            'rows': [],
+        }
+    for r in rows:
+        job = by_key[r['job_key']]
+        if job['job_number'] is None:
+            job['job_number'] = r['job_number']
+        job[r['source']]['rows'].append({
+            'report_date': r['report_date'],
+            'job_number': r['job_number'],
+            'shift': r['shift'],
+            'operator': r['operator'],
+            'assembly': r['assembly'],
+            'inspected': r['qty_inspected'],
+            'rejected': r['qty_rejected'],
+        })
+    return by_key
+
+
 @app.route('/analysis/compare/jobs')
 @login_required
+@conditional_on('aoi_reports', 'fi_reports', permissions=('analysis',))
 def compare_job_numbers():
-    """Return joined AOI and Final Inspect data for a given job number."""
-    if not has_permission('analysis'):
-        return jsonify(error='Forbidden'), 403
-    job_number = request.args.get('job_number')
-    if not job_number:
+    """Return AOI and Final Inspect rows plus totals for a single job number."""
+    job_key = normalize_job_key(request.args.get('job_number'))
+    if not job_key:
         return jsonify(error='job_number is required'), 400
     conn = get_db()
-    row = conn.execute(
-        """
-        SELECT
-            COALESCE(a.job_number, f.job_number) AS job_number,
-            a.operator AS aoi_operator,
-            a.qty_inspected AS aoi_inspected,
-            a.qty_rejected AS aoi_rejected,
-            f.operator AS fi_operator,
-            f.qty_inspected AS fi_inspected,
-            f.qty_rejected AS fi_rejected
-        FROM aoi_reports a
-        LEFT JOIN fi_reports f ON a.job_number = f.job_number
-        WHERE a.job_number = ?
-        UNION
-        SELECT
-            COALESCE(a.job_number, f.job_number) AS job_number,
-            a.operator AS aoi_operator,
-            a.qty_inspected AS aoi_inspected,
-            a.qty_rejected AS aoi_rejected,
-            f.operator AS fi_operator,
-            f.qty_inspected AS fi_inspected,
-            f.qty_rejected AS fi_rejected
-        FROM fi_reports f
-        LEFT JOIN aoi_reports a ON a.job_number = f.job_number
-        WHERE f.job_number = ?
-        LIMIT 1
-        """,
-        (job_number, job_number),
-    ).fetchone()
+    details = _job_details(conn, [job_key])
     conn.close()
-    if not row:
+    if job_key not in details:
         return jsonify(error='job not found'), 404
+    return jsonify(details[job_key])
 
-    def build(prefix: str):
-        op = row[f'{prefix}_operator']
-        inspected = row[f'{prefix}_inspected']
-        rejected = row[f'{prefix}_rejected']
-        if op is None and inspected is None and rejected is None:
-            return None
-        inspected = inspected or 0
-        rejected = rejected or 0
-        yield_val = 1 - (rejected / inspected) if inspected else None
-        return {
-            'operator': op,
-            'inspected': inspected,
-            'rejected': rejected,
-            'yield': yield_val,
-        }
 
+@app.route('/analysis/compare/jobs/batch')
+@login_required
+@conditional_on('aoi_reports', 'fi_reports', permissions=('analysis',))
+def compare_job_numbers_batch():
+    """Return AOI and Final Inspect rows plus totals for many job numbers at once.
+
+    ``job_numbers`` is a comma separated list (at most 200), matched on the
+    normalized job key. Every matching AOI and FI row is returned, not just
+    the first pairing.
+    """
+    job_numbers = list(dict.fromkeys(
+        j.strip() for j in request.args.get('job_numbers', '').split(',') if j.strip()
+    ))
+    if not job_numbers:
+        return jsonify(error='job_numbers is required'), 400
+    if len(job_numbers) > 200:
+        return jsonify(error='Too many job numbers'), 400
+
+    requested = {j: normalize_job_key(j) for j in job_numbers}
+    conn = get_db()
+    by_key = _job_details(conn, requested.values())
+    conn.close()
+
+    # Results are keyed by the job numbers as requested so callers can look
+    # up the text they sent; spelling variants share the same details.
+    jobs = {j: by_key[k] for j, k in requested.items() if k in by_key}
     return jsonify(
-        job_number=row['job_number'],
-        aoi=build('aoi'),
-        fi=build('fi'),
+        jobs=jobs,
+        missing=[j for j in job_numbers if j not in jobs],
     )
 
 
@@ -2182,95 +4666,127 @@ def operator_grades():
     if not has_permission('analysis'):
         return redirect(url_for('analysis'))
 
+    start = request.args.get('start')
+    end = request.args.get('end')
     conn = get_db()
-    rows = conn.execute(
-        """
-        WITH a AS (
-            SELECT operator,
-                   job_number,
-                   assembly,
-                   SUM(qty_rejected) AS aoi_rejected,
-                   SUM(qty_inspected) AS aoi_inspected
-            FROM aoi_reports
-            WHERE job_number IS NOT NULL AND job_number != ''
-            GROUP BY operator, job_number, assembly
-        ),
-        job_totals AS (
-            SELECT job_number,
-                   assembly,
-                   SUM(qty_inspected) AS total_inspected
-            FROM aoi_reports
-            WHERE job_number IS NOT NULL AND job_number != ''
-            GROUP BY job_number, assembly
-        ),
-        f AS (
-            SELECT job_number, assembly, SUM(qty_rejected) AS fi_rejected
-            FROM fi_reports
-            WHERE job_number IS NOT NULL AND job_number != ''
-            GROUP BY job_number, assembly
-        )
-        SELECT a.operator,
-               SUM(a.aoi_rejected) AS aoi_rejected,
-               SUM(f.fi_rejected * a.aoi_inspected / job_totals.total_inspected) AS fi_rejected
-        FROM a
-        JOIN job_totals ON a.job_number = job_totals.job_number AND a.assembly = job_totals.assembly
-        LEFT JOIN f ON a.job_number = f.job_number AND a.assembly = f.assembly
-        GROUP BY a.operator
-        ORDER BY a.operator
-        """
-    ).fetchall()
+    grades = load_operator_grades(conn, start, end)
     conn.close()
 
-    def compute_grade(aoi_rej: int, fi_rej: int):
-        total = aoi_rej + fi_rej
-        if total == 0:
-            return None, None
-        coverage = aoi_rej / total
-        if coverage >= 0.8:
-            letter = 'A'
-        elif coverage >= 0.6:
-            letter = 'B'
-        elif coverage >= 0.4:
-            letter = 'C'
-        else:
-            letter = 'D'
-        return coverage, letter
+    if request.args.get('format') == 'json':
+        return jsonify(grades=grades, start=start, end=end)
 
-    grades = []
-    for r in rows:
-        a_rej = r['aoi_rejected'] or 0
-        f_rej = r['fi_rejected']
-        if f_rej is None:
-            coverage = None
-            letter = None
-        else:
-            f_rej = f_rej or 0
-            coverage, letter = compute_grade(a_rej, f_rej)
-        grades.append({'operator': r['operator'], 'coverage': coverage, 'grade': letter})
+    return render_template('operator_grades.html', grades=grades, start=start, end=end)
 
-    if request.args.get('format') == 'json':
-        return jsonify(grades=grades)
 
-    return render_template('operator_grades.html', grades=grades)
+@app.route('/analysis/operator-grades/series')
+@login_required
+@conditional_on('aoi_reports', 'fi_reports', permissions=('analysis',))
+def operator_grade_series():
+    """Return AOI operator grades per week or month."""
+    freq = request.args.get('freq', 'weekly').lower()
+    if freq not in ('weekly', 'monthly'):
+        return jsonify(error='Invalid frequency'), 400
+    conn = get_db()
+    series = load_operator_grade_series(conn, freq)
+    conn.close()
+    return jsonify(freq=freq, series=series)
 
 
 @app.route('/sap/material/<material_id>')
 @login_required
 def sap_material(material_id):
     try:
-        material = sap_service.get_material(material_id)
-        return jsonify({'id': material.id, 'description': material.description})
-    except KeyError:
-        return jsonify(error='Not found'), 404
+        material = fetch_materials([material_id]).get(material_id)
+        if material is None:
+            return jsonify(error='Not found'), 404
+        return jsonify(material)
+    except CircuitOpenError:
+        return jsonify(error='SAP unavailable'), 503
     except TimeoutError:
         return jsonify(error='SAP timeout'), 504
 
 
+@app.route('/sap/materials')
+@login_required
+def sap_materials():
+    """Return several materials in one call; ``ids`` is comma separated."""
+    ids = list(dict.fromkeys(
+        m.strip() for m in request.args.get('ids', '').split(',') if m.strip()
+    ))
+    if not ids:
+        return jsonify(error='No material ids given'), 400
+    if len(ids) > 500:
+        return jsonify(error='Too many material ids (max 500)'), 400
+    try:
+        materials = fetch_materials(ids)
+    except CircuitOpenError:
+        return jsonify(error='SAP unavailable'), 503
+    except TimeoutError:
+        return jsonify(error='SAP timeout'), 504
+    return jsonify(
+        materials=materials,
+        missing=[m for m in ids if m not in materials],
+    )
+
+
+@app.route('/admin/materials')
+@login_required
+def material_sync_status():
+    """Return the state of the local SAP materials mirror."""
+    if not is_admin_user():
+        return jsonify(error='Forbidden'), 403
+    conn = get_db()
+    state = conn.execute('SELECT * FROM material_sync WHERE id = 1').fetchone()
+    rows = conn.execute('SELECT COUNT(*) FROM materials').fetchone()[0]
+    conn.close()
+    state = dict(state) if state else {}
+    state.pop('id', None)
+    return jsonify(rows=rows, delta_supported=sap_service.supports_delta, **state)
+
+
+@app.route('/admin/materials/sync', methods=['POST'])
+@login_required
+def material_sync_now():
+    """Run a material sync immediately; ``full=1`` forces a full sync."""
+    if not is_admin_user():
+        return jsonify(error='Forbidden'), 403
+    result = run_material_sync(full=request.args.get('full') == '1')
+    return jsonify(result), 502 if 'error' in result else 200
+
+
+@app.route('/admin/integrations')
+@login_required
+def integration_status():
+    """Return cache and circuit breaker metrics for external lookups."""
+    if not is_admin_user():
+        return jsonify(error='Forbidden'), 403
+    fi_client = get_fi_rate_client()
+    return jsonify(
+        sap=sap_service.metrics(),
+        supabase=fi_client.metrics() if fi_client else None,
+    )
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose request, SQL, cache and import metrics in Prometheus text format.
+
+    Scrapers authenticate with ``Authorization: Bearer $METRICS_TOKEN``;
+    admins can also open it from a browser session.
+    """
+    token = request.headers.get('Authorization', '')
+    scraper = bool(METRICS_TOKEN) and hmac.compare_digest(token, f'Bearer {METRICS_TOKEN}')
+    if not scraper and not is_admin_user():
+        return jsonify(error='Forbidden'), 403
+    return Response(app_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/aoi/html/<path:filename>')
 @login_required
 def aoi_html(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 if __name__ == '__main__':
+    init_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
 
@@ -1,6 +1,21 @@
+import logging
+import threading
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Optional
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+from resilience import CircuitBreaker, SWRCache
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:  # pragma: no cover - fail gracefully if not installed
+    requests = None
+
+log = logging.getLogger(__name__)
 
 
 @dataclass
@@ -8,31 +23,229 @@ class Material:
     """Simple data transfer object for material information."""
     id: str
     description: str
+    changed_at: Optional[str] = None
+
+
+@dataclass
+class JobLocation:
+    """Quantity of a work order sitting at one shop-floor location."""
+    job: str
+    location: str
+    quantity: int
+    due_date: Optional[str] = None
 
 
 class SAPClient(ABC):
     """Interface for low level SAP communication."""
 
+    # Whether list_material_data can filter on a changed_since cursor
+    supports_delta = False
+
     @abstractmethod
     def get_material_data(self, material_id: str) -> Dict:
         """Return raw material data for *material_id*."""
 
+    def get_material_data_batch(self, material_ids: List[str]) -> Dict[str, Dict]:
+        """Return raw material data keyed by id; unknown ids are left out.
+
+        The default falls back to one call per id. Clients whose backend
+        supports bulk reads should override it with a single request.
+        """
+        result = {}
+        for material_id in material_ids:
+            try:
+                result[material_id] = self.get_material_data(material_id)
+            except KeyError:
+                continue
+        return result
+
+    def list_material_data(self, changed_since: Optional[str] = None) -> List[Dict]:
+        """Return raw data for all materials, for bulk mirroring.
+
+        Clients with ``supports_delta`` only return materials whose
+        ``changed_at`` is later than *changed_since* when it is given.
+        """
+        raise NotImplementedError("Bulk material listing not supported by this client")
+
+    def list_job_locations(self) -> List[Dict]:
+        """Return open jobs as ``{"job", "due_date", "locations": [{"location", "quantity"}]}``."""
+        raise NotImplementedError("Job locations not supported by this client")
+
+
+@dataclass
+class HTTPResponse:
+    """Status code and decoded JSON body returned by an HTTPTransport."""
+    status: int
+    data: Any
+
+
+class HTTPTransport(ABC):
+    """Interface for sending HTTP requests to SAP."""
+
+    @abstractmethod
+    def get(self, url: str, *, params: Optional[Dict] = None, timeout: float) -> HTTPResponse:
+        """GET *url* and return the response.
+
+        Implementations raise ``TimeoutError`` when *timeout* seconds pass
+        and ``ConnectionError`` when the server cannot be reached.
+        """
+
+
+class RequestsTransport(HTTPTransport):
+    """Transport on a ``requests.Session`` reusing keep-alive connections."""
+
+    def __init__(self, *, pool_size: int = 4, headers: Optional[Dict[str, str]] = None):
+        if requests is None:
+            raise RuntimeError("The requests package is required for RequestsTransport")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+
+    def get(self, url: str, *, params: Optional[Dict] = None, timeout: float) -> HTTPResponse:
+        try:
+            resp = self.session.get(url, params=params, timeout=timeout)
+        except requests.Timeout as e:
+            raise TimeoutError(str(e)) from e
+        except requests.ConnectionError as e:
+            raise ConnectionError(str(e)) from e
+        try:
+            data = resp.json()
+        except ValueError:
+            data = None
+        return HTTPResponse(resp.status_code, data)
+
 
 class RealSAPClient(SAPClient):
-    """Placeholder for a real SAP client implementation."""
+    """Client for an SAP material gateway speaking JSON over HTTP.
+
+    ``GET {base_url}/materials/{id}`` returns one material,
+    ``GET {base_url}/materials?ids=a,b`` returns ``{"materials": [...]}`` and
+    ``GET {base_url}/materials/export?changed_since=...`` lists every
+    material changed after the cursor (all of them without one) and
+    ``GET {base_url}/jobs/locations`` returns ``{"jobs": [...]}``.
+    At most ``max_concurrency`` calls are in flight at once; a caller that
+    cannot get a slot within ``timeout`` seconds gets a ``TimeoutError``
+    instead of queueing behind a slow SAP. Timeouts, connection errors and
+    5xx responses are retried up to ``retries`` times with exponential
+    backoff; the slot is given back while waiting to retry.
+    """
+
+    # Materials per bulk request
+    BATCH_SIZE = 100
+    supports_delta = True
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        transport: Optional[HTTPTransport] = None,
+        api_key: Optional[str] = None,
+        timeout: float = 5.0,
+        max_concurrency: int = 4,
+        retries: int = 2,
+        backoff: float = 0.2,
+        sleep=time.sleep,
+    ):
+        if not base_url:
+            raise ValueError("SAP base URL is required for the real SAP client")
+        self.base_url = base_url.rstrip("/")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else None
+        self.transport = transport or RequestsTransport(pool_size=max_concurrency, headers=headers)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _attempt(self, path: str, params: Optional[Dict]) -> HTTPResponse:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("SAP concurrency limit reached")
+        try:
+            return self.transport.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def _get(self, path: str, params: Optional[Dict] = None) -> HTTPResponse:
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self._attempt(path, params)
+            except (TimeoutError, ConnectionError):
+                if attempt == self.retries:
+                    raise
+            else:
+                if resp.status < 500:
+                    return resp
+                if attempt == self.retries:
+                    raise ConnectionError(f"SAP returned HTTP {resp.status}")
+            self.sleep(self.backoff * 2 ** attempt)
 
     def get_material_data(self, material_id: str) -> Dict:
-        raise NotImplementedError("Real SAP integration not implemented")
+        resp = self._get(f"/materials/{quote(material_id, safe='')}")
+        if resp.status == 404:
+            raise KeyError(material_id)
+        if resp.status != 200 or not isinstance(resp.data, dict):
+            raise ConnectionError(f"Unexpected SAP response: HTTP {resp.status}")
+        return resp.data
+
+    def get_material_data_batch(self, material_ids: List[str]) -> Dict[str, Dict]:
+        result = {}
+        for i in range(0, len(material_ids), self.BATCH_SIZE):
+            chunk = material_ids[i:i + self.BATCH_SIZE]
+            resp = self._get("/materials", {"ids": ",".join(chunk)})
+            if resp.status != 200 or not isinstance(resp.data, dict):
+                raise ConnectionError(f"Unexpected SAP response: HTTP {resp.status}")
+            for item in resp.data.get("materials", []):
+                if item.get("id") in chunk:
+                    result[item["id"]] = item
+        return result
+
+    def list_material_data(self, changed_since: Optional[str] = None) -> List[Dict]:
+        params = {"changed_since": changed_since} if changed_since else None
+        resp = self._get("/materials/export", params)
+        if resp.status != 200 or not isinstance(resp.data, dict):
+            raise ConnectionError(f"Unexpected SAP response: HTTP {resp.status}")
+        return list(resp.data.get("materials", []))
+
+    def list_job_locations(self) -> List[Dict]:
+        resp = self._get("/jobs/locations")
+        if resp.status != 200 or not isinstance(resp.data, dict):
+            raise ConnectionError(f"Unexpected SAP response: HTTP {resp.status}")
+        return list(resp.data.get("jobs", []))
 
 
 class MockSAPClient(SAPClient):
     """In-memory mock client returning static data or simulating errors."""
 
-    def __init__(self, data: Optional[Dict[str, Dict]] = None, *, should_timeout: bool = False):
+    supports_delta = True
+
+    # (job, days until due, [(location, quantity)]) for the sample WIP board
+    SAMPLE_JOBS = [
+        ("DRAFT-1001", 5, [("Hand Assembly", 295), ("Rework", 5)]),
+        ("DRAFT-1002", 10, [("Depanel", 75)]),
+        ("DRAFT-1003", 4, [("Final Inspect", 1500)]),
+        ("DRAFT-1004", 2, [("Hand Assembly", 25)]),
+        ("DRAFT-1005", -2, [("AOI", 230), ("Rework", 20)]),
+        ("DRAFT-1006", 13, [("SMT", 1000)]),
+        ("DRAFT-1007", 9, [("AOI", 100), ("Rework", 75)]),
+        ("DRAFT-1008", 1, [("ERSA", 450), ("AOI", 478), ("Rework", 72)]),
+        ("DRAFT-1009", 0, [("Hand Assembly", 100)]),
+        ("DRAFT-1010", -1, [("Hand Assembly", 100)]),
+    ]
+
+    def __init__(
+        self,
+        data: Optional[Dict[str, Dict]] = None,
+        *,
+        jobs: Optional[List[Dict]] = None,
+        should_timeout: bool = False,
+    ):
         self.data = data or {
             "MAT1": {"id": "MAT1", "description": "Sample material 1"},
             "MAT2": {"id": "MAT2", "description": "Sample material 2"},
         }
+        self.jobs = jobs
         self.should_timeout = should_timeout
 
     def get_material_data(self, material_id: str) -> Dict:
@@ -40,19 +253,186 @@ class MockSAPClient(SAPClient):
             raise TimeoutError("SAP request timed out")
         return self.data[material_id]
 
+    def get_material_data_batch(self, material_ids: List[str]) -> Dict[str, Dict]:
+        if self.should_timeout:
+            raise TimeoutError("SAP request timed out")
+        return {m: self.data[m] for m in material_ids if m in self.data}
+
+    def list_material_data(self, changed_since: Optional[str] = None) -> List[Dict]:
+        if self.should_timeout:
+            raise TimeoutError("SAP request timed out")
+        return [
+            d for d in self.data.values()
+            if not changed_since or (d.get("changed_at") or "") > changed_since
+        ]
+
+    def list_job_locations(self) -> List[Dict]:
+        if self.should_timeout:
+            raise TimeoutError("SAP request timed out")
+        if self.jobs is not None:
+            return self.jobs
+        today = date.today()
+        return [
+            {
+                "job": job,
+                "due_date": (today + timedelta(days=days)).isoformat(),
+                "locations": [{"location": loc, "quantity": qty} for loc, qty in locations],
+            }
+            for job, days, locations in self.SAMPLE_JOBS
+        ]
+
+
+class UnavailableSAPClient(SAPClient):
+    """Stand-in for a real client that could not be built.
+
+    Every call raises ``ConnectionError``, so pages degrade and syncs
+    record the error instead of writing mock data over the real mirror.
+    """
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    def _fail(self):
+        raise ConnectionError(f"SAP client not configured: {self.reason}")
+
+    def get_material_data(self, material_id: str) -> Dict:
+        self._fail()
+
+    def get_material_data_batch(self, material_ids: List[str]) -> Dict[str, Dict]:
+        self._fail()
+
+    def list_material_data(self, changed_since: Optional[str] = None) -> List[Dict]:
+        self._fail()
+
+    def list_job_locations(self) -> List[Dict]:
+        self._fail()
+
 
 class SAPService:
-    """High level service using a SAPClient for business logic."""
+    """High level service using a SAPClient for business logic.
 
-    def __init__(self, client: SAPClient):
+    When given a *cache* and/or *breaker*, client calls go through the
+    circuit breaker and material data is served stale while it refreshes.
+    Ids SAP does not know are cached as ``None`` by :meth:`get_materials`
+    so repeated page views do not ask again.
+    """
+
+    def __init__(
+        self,
+        client: SAPClient,
+        *,
+        cache: Optional[SWRCache] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
         self.client = client
+        self.cache = cache
+        self.breaker = breaker
+
+    def _load(self, material_id: str) -> Dict:
+        if self.breaker:
+            return self.breaker.call(self.client.get_material_data, material_id)
+        return self.client.get_material_data(material_id)
+
+    def _load_batch(self, material_ids: List[str]) -> Dict[str, Dict]:
+        if self.breaker:
+            return self.breaker.call(self.client.get_material_data_batch, material_ids)
+        return self.client.get_material_data_batch(material_ids)
 
     def get_material(self, material_id: str) -> Material:
-        data = self.client.get_material_data(material_id)
+        if self.cache:
+            data = self.cache.get(material_id, lambda: self._load(material_id))
+        else:
+            data = self._load(material_id)
+        if data is None:
+            raise KeyError(material_id)
         return Material(id=data["id"], description=data["description"])
 
+    def get_materials(self, material_ids: Iterable[str]) -> Dict[str, Material]:
+        """Return materials for *material_ids* with at most one client call.
+
+        Unknown ids are left out of the result. Cached entries are used
+        where possible; stale ones are refreshed together in the background.
+        """
+        wanted = list(dict.fromkeys(m for m in material_ids if m))
+        found: Dict[str, Optional[Dict]] = {}
+        missing = []
+        stale = []
+        for material_id in wanted:
+            state = SWRCache.MISSING
+            if self.cache:
+                state, data = self.cache.lookup(material_id)
+            if state == SWRCache.MISSING:
+                missing.append(material_id)
+                continue
+            found[material_id] = data
+            if state == SWRCache.STALE:
+                stale.append(material_id)
+        if stale:
+            self.cache.refresh_many(stale, self._load_batch)
+        if missing:
+            loaded = self._load_batch(missing)
+            for material_id in missing:
+                found[material_id] = loaded.get(material_id)
+                if self.cache:
+                    self.cache.put(material_id, found[material_id])
+        return {
+            m: Material(id=d["id"], description=d["description"])
+            for m, d in found.items()
+            if d is not None
+        }
+
+    @property
+    def supports_delta(self) -> bool:
+        return self.client.supports_delta
+
+    def list_materials(self, changed_since: Optional[str] = None) -> List[Material]:
+        """Return every material, or those changed after *changed_since*."""
+        if self.breaker:
+            rows = self.breaker.call(self.client.list_material_data, changed_since)
+        else:
+            rows = self.client.list_material_data(changed_since)
+        return [
+            Material(id=d["id"], description=d["description"], changed_at=d.get("changed_at"))
+            for d in rows
+        ]
+
+    def list_job_locations(self) -> List[JobLocation]:
+        """Return one row per job and location with work in progress."""
+        if self.breaker:
+            jobs = self.breaker.call(self.client.list_job_locations)
+        else:
+            jobs = self.client.list_job_locations()
+        return [
+            JobLocation(
+                job=j["job"],
+                location=loc["location"],
+                quantity=int(loc.get("quantity") or 0),
+                due_date=j.get("due_date"),
+            )
+            for j in jobs
+            for loc in j.get("locations", [])
+        ]
+
+    def metrics(self) -> Dict[str, Optional[Dict]]:
+        return {
+            "cache": self.cache.metrics() if self.cache else None,
+            "breaker": self.breaker.metrics() if self.breaker else None,
+        }
+
+
+def create_sap_service(use_real: bool = False, **client_options) -> SAPService:
+    """Factory that returns a service wired to either a real or mock client.
 
-def create_sap_service(use_real: bool = False) -> SAPService:
-    """Factory that returns a service wired to either a real or mock client."""
-    client: SAPClient = RealSAPClient() if use_real else MockSAPClient()
-    return SAPService(client)
+    *client_options* are passed to :class:`RealSAPClient` and ignored for the mock.
+    A real client that cannot be built (no base URL, ``requests`` missing)
+    is logged and replaced by :class:`UnavailableSAPClient`, so the app
+    still starts but never serves mock data in its place.
+    """
+    client: SAPClient = MockSAPClient()
+    if use_real:
+        try:
+            client = RealSAPClient(**client_options)
+        except (ValueError, RuntimeError) as e:
+            log.error("SAP client not configured, SAP data unavailable: %s", e)
+            client = UnavailableSAPClient(str(e))
+    return SAPService(client, cache=SWRCache(max_entries=10000), breaker=CircuitBreaker())
@@ -0,0 +1,89 @@
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+# Number of points needed before control limits are trusted
+MIN_POINTS = 5
+# Longest run any rule looks back over
+WINDOW = 8
+
+RULES = {
+    'WE1': 'One point beyond 3 sigma',
+    'WE2': '2 of 3 points beyond 2 sigma on the same side',
+    'WE3': '4 of 5 points beyond 1 sigma on the same side',
+    'WE4': '8 points in a row on the same side of the center line',
+    'NELSON3': '6 points in a row steadily increasing or decreasing',
+}
+
+
+@dataclass
+class SeriesState:
+    """Running statistics and recent points for one control chart series.
+
+    ``window`` holds ``(value, z)`` pairs for the latest points, where ``z``
+    is the point's distance from the center line in sigmas at the time it
+    was evaluated (``None`` while the baseline is too small).
+    """
+    n: int = 0
+    total: float = 0.0
+    total_sq: float = 0.0
+    window: List[Tuple[float, Optional[float]]] = field(default_factory=list)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    @property
+    def sigma(self) -> float:
+        if not self.n:
+            return 0.0
+        variance = self.total_sq / self.n - self.mean ** 2
+        return max(variance, 0.0) ** 0.5
+
+    def to_json(self) -> str:
+        return json.dumps([self.n, self.total, self.total_sq, self.window])
+
+    @classmethod
+    def from_json(cls, text: str) -> 'SeriesState':
+        n, total, total_sq, window = json.loads(text)
+        return cls(n, total, total_sq, [tuple(p) for p in window])
+
+
+def _beyond(zs: List[Optional[float]], limit: float, side: int) -> int:
+    return sum(1 for z in zs if z is not None and z * side > limit)
+
+
+def evaluate_point(state: SeriesState, value: float) -> List[str]:
+    """Add *value* to *state* and return the ids of the rules it triggers.
+
+    Limits come from the points seen before *value*. Zone rules only fire on
+    the point that completes the pattern, so a long excursion is reported
+    once per qualifying point rather than once per window.
+    """
+    sigma = state.sigma
+    z = (value - state.mean) / sigma if state.n >= MIN_POINTS and sigma > 0 else None
+    state.n += 1
+    state.total += value
+    state.total_sq += value * value
+    state.window = (state.window + [(value, z)])[-WINDOW:]
+
+    hits = []
+    zs = [p[1] for p in state.window]
+    values = [p[0] for p in state.window]
+    if z is not None:
+        side = 1 if z > 0 else -1
+        if abs(z) > 3:
+            hits.append('WE1')
+        if abs(z) > 2 and _beyond(zs[-3:], 2, side) >= 2:
+            hits.append('WE2')
+        if abs(z) > 1 and _beyond(zs[-5:], 1, side) >= 4:
+            hits.append('WE3')
+        if len(zs) >= 8 and _beyond(zs[-8:], 0, side) == 8:
+            hits.append('WE4')
+    if len(values) >= 6:
+        run = values[-6:]
+        steps = [b - a for a, b in zip(run, run[1:])]
+        if all(s > 0 for s in steps) or all(s < 0 for s in steps):
+            hits.append('NELSON3')
+    return hits
@@ -242,6 +242,19 @@ window.addEventListener('DOMContentLoaded', () => {
     }
   };
 
+  // Export the MOAT rows matching the FC chart filters
+  document.getElementById('export-moat-btn')?.addEventListener('click', () => {
+    const start = document.getElementById('start-date').value;
+    const end = document.getElementById('end-date').value;
+    const threshold = parseInt(document.getElementById('min-boards').value) || 0;
+    const models = getSelectedModels('model-name');
+    const modelQuery = models.length ? `&models=${encodeURIComponent(models.join(','))}` : '';
+    const filter = modelFilter ? modelFilter.value : 'all';
+    const filterQuery = filter !== 'all' ? `&model_filter=${filter}` : '';
+    const { query: lineQuery } = getSelectedLines('line');
+    window.location.href = `/export/moat?format=xlsx&start=${start}&end=${end}&threshold=${threshold}${lineQuery}${modelQuery}${filterQuery}`;
+  });
+
   // FC Chart modal logic
   const runBtn = document.getElementById('run-chart-btn');
   const chartModalEl = document.getElementById('chart-modal');
@@ -651,7 +664,7 @@ window.addEventListener('DOMContentLoaded', () => {
         .then(res => res.json())
         .then(data => {
           uploadsList.innerHTML = '';
-          const files = data.files || data;
+          const files = data.files || [];
           if (!files.length) uploadsList.innerHTML = '<li>No uploads found</li>';
           files.forEach(fn => {
             const li = document.createElement('li');
@@ -681,6 +694,7 @@ window.addEventListener('DOMContentLoaded', () => {
   // Report sections (Daily, Weekly, Monthly, Yearly)
   const reportFreqs = ['daily', 'weekly', 'monthly', 'yearly'];
   const reportCharts = {};
+  const reportLoaders = {};
   reportFreqs.forEach(freq => {
     const canvas = document.getElementById(`${freq}-report-canvas`);
     const table = document.getElementById(`${freq}-report-table`);
@@ -688,7 +702,7 @@ window.addEventListener('DOMContentLoaded', () => {
     const xlsxBtn = document.getElementById(`download-${freq}-xlsx`);
     const summaryEl = document.getElementById(`${freq}-report-summary`);
     if (!canvas) return;
-    fetch(`/analysis/report-data?freq=${freq}`)
+    const loadReport = () => fetch(`/analysis/report-data?freq=${freq}`)
       .then(res => res.json())
       .then(data => {
         if (reportCharts[freq]) {
@@ -728,6 +742,8 @@ window.addEventListener('DOMContentLoaded', () => {
           }
         }
       });
+    reportLoaders[freq] = loadReport;
+    loadReport();
     if (pdfBtn) {
       pdfBtn.addEventListener('click', () => {
         const chart = reportCharts[freq];
@@ -750,4 +766,10 @@ window.addEventListener('DOMContentLoaded', () => {
       });
     }
   });
+
+  // MOAT report windows end at the latest report date, so any PPM upload,
+  // import or deletion can shift every period.
+  if (window.DataEvents && Object.keys(reportLoaders).length) {
+    DataEvents.subscribe(['moat'], () => Object.values(reportLoaders).forEach(load => load()));
+  }
 });
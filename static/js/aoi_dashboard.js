@@ -231,6 +231,8 @@ window.addEventListener('DOMContentLoaded', () => {
     return config;
   }
 
+  let fiRetries = 0;
+
   async function renderAssembly() {
     const table = document.getElementById('assemblyTable');
     if (!table) return;
@@ -244,6 +246,11 @@ window.addEventListener('DOMContentLoaded', () => {
         const resp = await fetch(`/${basePath}/report-data?${params.toString()}`);
         const data = await resp.json();
         assemblies = data.assemblies || [];
+        // FI rates still loading from Supabase; ask again shortly
+        if ((data.fi_pending || []).length && fiRetries < 3) {
+          fiRetries += 1;
+          setTimeout(() => { assemblies = []; renderAssembly(); }, 1500);
+        }
       } catch (err) {
         console.error(err);
       }
@@ -547,14 +554,24 @@ window.addEventListener('DOMContentLoaded', () => {
   });
 
   const reportCharts = {};
-  ['daily','weekly','monthly','yearly'].forEach(freq => {
+  const reportDays = { daily: 1, weekly: 7, monthly: 30, yearly: 365 };
+
+  function loadReport(freq) {
     fetch(`/${basePath}/report-data?freq=${freq}`)
       .then(res => res.json())
       .then(data => renderReport(freq, data));
-  });
+  }
+
+  Object.keys(reportDays).forEach(loadReport);
 
   function renderReport(freq, data) {
     const isAdmin = document.body.dataset.admin === 'true';
+    Object.keys(reportCharts)
+      .filter(key => key.startsWith(`${freq}-`))
+      .forEach(key => {
+        reportCharts[key].destroy();
+        delete reportCharts[key];
+      });
     const ops = data.operators || [];
     if (ops.length) {
       const ctx = document.getElementById(`${freq}-operators`);
@@ -641,75 +658,51 @@ window.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  // Add dropdown values introduced by new uploads without reloading the page
+  async function refreshFilterOptions() {
+    if (!filterForm) return;
+    const res = await fetch(`/filters/${basePath === 'aoi' ? 'aoi' : 'fi'}`);
+    if (!res.ok) return;
+    const options = await res.json();
+    Object.entries(options).forEach(([field, values]) => {
+      const select = filterForm.elements[field];
+      if (!select) return;
+      const known = new Set(Array.from(select.options).map(o => o.value));
+      values.filter(v => !known.has(v)).forEach(v => select.add(new Option(v, v)));
+    });
+  }
+
+  // Live updates: re-fetch the filtered widgets when the change touches the
+  // selected range, and every report period. The server ends report windows
+  // at the latest report date, so any upload can move them; unchanged
+  // periods come back as 304s.
+  if (window.DataEvents) {
+    const table = basePath === 'aoi' ? 'aoi_reports' : 'fi_reports';
+    DataEvents.subscribe([table], event => {
+      const start = filterForm?.elements.start?.value;
+      const end = filterForm?.elements.end?.value;
+      if (filterForm && DataEvents.touchesRange(event, start, end)) refreshData();
+      refreshFilterOptions();
+      Object.keys(reportDays).forEach(loadReport);
+    });
+  }
+
+  // Row exports stream from the server with the current filters
+  document.querySelectorAll('.export-rows').forEach(btn => {
+    btn.addEventListener('click', () => {
+      const params = new URLSearchParams(new FormData(filterForm));
+      params.delete('csrf_token');
+      params.set('format', btn.dataset.format);
+      const type = basePath === 'aoi' ? 'aoi' : 'fi';
+      window.location.href = `/export/${type}?${params.toString()}`;
+    });
+  });
+
+  // Period summaries are rendered as PDF on the server
   document.querySelectorAll('.download-report').forEach(btn => {
     btn.addEventListener('click', () => {
-      const period = btn.dataset.period;
-      const { jsPDF } = window.jspdf;
-      const pdf = new jsPDF({ orientation: 'landscape' });
-      pdf.text(`${period.charAt(0).toUpperCase()+period.slice(1)} AOI Summary`, 10, 10);
-      let y = 20;
-      ['operators','shift','reject','yield'].forEach(name => {
-        const chart = reportCharts[`${period}-${name}`];
-        if (chart) {
-          let img;
-          try {
-            img = chart.toBase64Image();
-          } catch (err) {
-            if (err instanceof DOMException && err.name === 'SecurityError') {
-              // fall back to canvas rendering
-            } else {
-              console.error(err);
-            }
-          }
-          const validMime = d => typeof d === 'string' && /^data:image\/(png|jpe?g|webp);/i.test(d);
-          if (!img || !validMime(img)) {
-            const canvas = chart.canvas;
-            if (canvas && canvas.toDataURL) {
-              try {
-                img = canvas.toDataURL('image/png');
-              } catch (err) {
-                if (err instanceof DOMException && err.name === 'SecurityError') {
-                  try {
-                    const tmp = document.createElement('canvas');
-                    tmp.width = canvas.width;
-                    tmp.height = canvas.height;
-                    tmp.getContext('2d').drawImage(canvas, 0, 0);
-                    img = tmp.toDataURL('image/png');
-                  } catch (err2) {
-                    console.error('Canvas is tainted and cannot be exported', err2);
-                    alert('Unable to add chart: the canvas has been tainted by cross-origin data.');
-                    return;
-                  }
-                } else {
-                  console.error(err);
-                  return;
-                }
-              }
-            }
-            if (!img || !validMime(img)) {
-              console.error('Unsupported image format for PDF export');
-              alert('Unable to add chart: unsupported image format.');
-              return;
-            }
-          }
-          const props = pdf.getImageProperties(img);
-          const pageWidth = pdf.internal.pageSize.getWidth();
-          const pageHeight = pdf.internal.pageSize.getHeight();
-          const margin = 10;
-          const maxWidth = pageWidth - margin * 2;
-          const maxHeight = pageHeight - margin * 2;
-          const scale = Math.min(maxWidth / props.width, maxHeight / props.height);
-          const imgWidth = props.width * scale;
-          const imgHeight = props.height * scale;
-          if (y + imgHeight > pageHeight - margin) { pdf.addPage(); y = margin; }
-          pdf.addImage(img, 'PNG', margin, y, imgWidth, imgHeight);
-          y += imgHeight + 10;
-        }
-      });
-      pdf.addPage('portrait');
-      pdf.autoTable({ html: `#${period}-table`, startY: 10 });
-      pdf.save(`${period}-aoi-summary.pdf`);
+      const type = basePath === 'aoi' ? 'aoi' : 'fi';
+      window.location.href = `/reports/render/${type}?period=${btn.dataset.period}&format=pdf`;
     });
   });
 });
-
@@ -147,19 +147,66 @@
       });
     });
 
-    // Initialize DataTables if the plugin is available
-    if (window.jQuery && $.fn && $.fn.DataTable) {
-      const aoiTableEl = document.getElementById('compare-aoi-table');
-      const fiTableEl = document.getElementById('compare-fi-table');
-      if (aoiTableEl) $(aoiTableEl).DataTable({ paging: false });
-      if (fiTableEl) $(fiTableEl).DataTable({ paging: false });
+    // Raw tables are fetched page by page when their panel is first opened
+    const panels = document.querySelector('.comparison-panels');
+    const PER_PAGE = 50;
+    const COLUMNS = ['report_date', 'shift', 'operator', 'customer', 'assembly', 'rev',
+      'job_number', 'qty_inspected', 'qty_rejected', 'additional_info'];
+    const jobDetails = new Map();
+
+    // Fetch details for every job on a page in one request
+    function prefetchJobs(rows) {
+      const jobs = Array.from(new Set(rows.map(r => r.job_number).filter(j => j && !jobDetails.has(String(j)))));
+      if (!jobs.length) return;
+      fetch(`/analysis/compare/jobs/batch?job_numbers=${encodeURIComponent(jobs.join(','))}`)
+        .then(r => r.json())
+        .then(data => {
+          Object.entries(data.jobs || {}).forEach(([job, details]) => jobDetails.set(job, details));
+        })
+        .catch(err => console.error('Failed to prefetch job details', err));
     }
 
-    // Expose row data for future filtering
-    window.AOICompare = Object.assign(window.AOICompare || {}, {
-      aoiRows: getJSON('aoi-data'),
-      fiRows: getJSON('fi-data')
-    });
+    function loadPage(details, page) {
+      const params = new URLSearchParams({ page, per_page: PER_PAGE });
+      if (panels.dataset.start) params.set('start', panels.dataset.start);
+      if (panels.dataset.end) params.set('end', panels.dataset.end);
+      return fetch(`/analysis/compare/${details.dataset.source}/rows?${params}`)
+        .then(r => r.json())
+        .then(data => {
+          const tbody = details.querySelector('tbody');
+          tbody.innerHTML = '';
+          (data.rows || []).forEach(row => {
+            const tr = document.createElement('tr');
+            COLUMNS.forEach(key => {
+              const td = document.createElement('td');
+              td.textContent = row[key] ?? '';
+              tr.appendChild(td);
+            });
+            tbody.appendChild(tr);
+          });
+          prefetchJobs(data.rows || []);
+          const pages = Math.max(Math.ceil((data.total || 0) / PER_PAGE), 1);
+          details.dataset.page = data.page;
+          details.querySelector('.pager-status').textContent = `Page ${data.page} of ${pages} (${data.total} rows)`;
+          details.querySelector('.pager-prev').disabled = data.page <= 1;
+          details.querySelector('.pager-next').disabled = data.page >= pages;
+        })
+        .catch(err => console.error('Failed to load rows', err));
+    }
+
+    if (panels) {
+      panels.querySelectorAll('details[data-source]').forEach(details => {
+        details.addEventListener('toggle', () => {
+          if (details.open && !details.dataset.page) loadPage(details, 1);
+        });
+        details.querySelector('.pager-prev').addEventListener('click', () => {
+          loadPage(details, Number(details.dataset.page) - 1);
+        });
+        details.querySelector('.pager-next').addEventListener('click', () => {
+          loadPage(details, Number(details.dataset.page) + 1);
+        });
+      });
+    }
 
     // Attach click handlers for job-number lookup
     document.querySelectorAll('.comparison-panels table tbody').forEach(tbody => {
@@ -170,6 +217,10 @@
         if (!jobCell || e.target !== jobCell) return;
         const job = jobCell.textContent.trim();
         if (!job) return;
+        if (jobDetails.has(job)) {
+          console.log('Job details:', jobDetails.get(job));
+          return;
+        }
         fetch(`/analysis/compare/jobs?job_number=${encodeURIComponent(job)}`)
           .then(r => r.json())
           .then(data => {
@@ -1,6 +1,7 @@
 document.getElementById('load-report').addEventListener('click', loadReport);
 
-document.getElementById('export-pdf').addEventListener('click', () => {
+document.getElementById('export-pdf').addEventListener('click', async () => {
+  await window.loadAssets('pdf');
   const { jsPDF } = window.jspdf;
   const pdf = new jsPDF();
   pdf.html(document.getElementById('report'), {
@@ -9,11 +10,39 @@ document.getElementById('export-pdf').addEventListener('click', () => {
   });
 });
 
+const snapshotSelect = document.getElementById('snapshot-period');
+
+// Picking a stored snapshot fills in its dates; editing the dates switches
+// back to a live query.
+snapshotSelect?.addEventListener('change', () => {
+  const opt = snapshotSelect.selectedOptions[0];
+  if (opt && opt.value) {
+    document.getElementById('start-date').value = opt.dataset.start;
+    document.getElementById('end-date').value = opt.dataset.end;
+  }
+  loadReport();
+});
+['start-date', 'end-date'].forEach(id => {
+  document.getElementById(id).addEventListener('change', () => {
+    if (snapshotSelect) snapshotSelect.value = '';
+  });
+});
+
 async function loadReport() {
-  const start = document.getElementById('start-date').value;
-  const end = document.getElementById('end-date').value;
-  const res = await fetch(`/reports/aoi-operators/data?start=${start}&end=${end}`);
-  const data = await res.json();
+  const snapshot = snapshotSelect?.value;
+  let data;
+  if (snapshot) {
+    const opt = snapshotSelect.selectedOptions[0];
+    document.getElementById('start-date').value = opt.dataset.start;
+    document.getElementById('end-date').value = opt.dataset.end;
+    const res = await fetch(`/reports/snapshots/aoi-operators/${snapshot}`);
+    data = (await res.json()).data;
+  } else {
+    const start = document.getElementById('start-date').value;
+    const end = document.getElementById('end-date').value;
+    const res = await fetch(`/reports/aoi-operators/data?start=${start}&end=${end}`);
+    data = await res.json();
+  }
 
   document.getElementById('total-boards').textContent = data.summary.inspected || 0;
   document.getElementById('total-rejected').textContent = data.summary.rejected || 0;
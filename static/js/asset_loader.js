@@ -0,0 +1,34 @@
+// Loads report-only libraries (jsPDF, html2canvas, the report builder) the
+// first time a page needs them. URLs come from window.ASSET_URLS, which the
+// server fills in from the asset manifest.
+(function () {
+  const loaded = {};
+
+  function loadScript(url) {
+    return new Promise((resolve, reject) => {
+      const el = document.createElement('script');
+      el.src = url;
+      el.onload = resolve;
+      el.onerror = () => reject(new Error(`Failed to load ${url}`));
+      document.head.appendChild(el);
+    });
+  }
+
+  function loadBundle(name) {
+    if (!loaded[name]) {
+      const urls = (window.ASSET_URLS || {})[name] || [];
+      // Scripts within a bundle depend on each other, so load them in order
+      loaded[name] = urls
+        .reduce((prev, url) => prev.then(() => loadScript(url)), Promise.resolve())
+        .catch(err => {
+          delete loaded[name];
+          throw err;
+        });
+    }
+    return loaded[name];
+  }
+
+  window.loadAssets = function (...names) {
+    return Promise.all(names.map(loadBundle));
+  };
+})();
@@ -0,0 +1,31 @@
+// Shared Server-Sent Events connection announcing committed data changes.
+// Pages subscribe to the tables they show and re-fetch only what changed.
+window.DataEvents = (() => {
+  const handlers = [];
+  let source = null;
+
+  function connect() {
+    if (source || !window.EventSource) return;
+    source = new EventSource('/events');
+    source.addEventListener('data-changed', e => {
+      const event = JSON.parse(e.data);
+      handlers
+        .filter(h => h.tables.includes(event.table))
+        .forEach(h => h.handler(event));
+    });
+  }
+
+  function subscribe(tables, handler) {
+    handlers.push({ tables, handler });
+    connect();
+  }
+
+  // Whether any of *dates* (ISO strings) falls within [start, end];
+  // events without dates, or open ranges, always match.
+  function touchesRange(event, start, end) {
+    if (!event.dates.length) return true;
+    return event.dates.some(d => (!start || d >= start) && (!end || d <= end));
+  }
+
+  return { subscribe, touchesRange };
+})();
@@ -1,19 +1,43 @@
 const REFRESH_INTERVAL = 5000;
 
-async function fetchJobs() {
-  const res = await fetch('/api/jobs');
-  const jobs = await res.json();
+// Jobs seen so far by id, plus the cursor/ETag of the last poll
+const jobs = new Map();
+let cursor = null;
+let etag = null;
+
+function csrfHeaders() {
+  const tokenEl = document.querySelector('input[name="csrf_token"]');
+  const headers = {'Content-Type': 'application/json'};
+  if (tokenEl) headers['X-CSRFToken'] = tokenEl.value;
+  return headers;
+}
+
+function renderJobs() {
   const tbody = document.querySelector('#jobs-table tbody');
   tbody.innerHTML = '';
-  jobs.forEach(job => {
-    const tr = document.createElement('tr');
-    ['id','name','status','location','updated_at'].forEach(key => {
-      const td = document.createElement('td');
-      td.textContent = job[key];
-      tr.appendChild(td);
+  Array.from(jobs.values())
+    .sort((a, b) => a.id - b.id)
+    .forEach(job => {
+      const tr = document.createElement('tr');
+      ['id','name','status','location','updated_at'].forEach(key => {
+        const td = document.createElement('td');
+        td.textContent = job[key];
+        tr.appendChild(td);
+      });
+      tbody.appendChild(tr);
     });
-    tbody.appendChild(tr);
-  });
+}
+
+async function fetchJobs() {
+  const url = cursor === null ? '/api/jobs' : `/api/jobs?since=${cursor}`;
+  const headers = etag ? {'If-None-Match': etag} : {};
+  const res = await fetch(url, {headers});
+  if (res.status === 304 || !res.ok) return;
+  const changed = await res.json();
+  changed.forEach(job => jobs.set(job.id, job));
+  cursor = res.headers.get('X-Jobs-Cursor');
+  etag = res.headers.get('ETag');
+  if (changed.length) renderJobs();
 }
 
 document.getElementById('add-form').addEventListener('submit', async e => {
@@ -21,7 +45,7 @@ document.getElementById('add-form').addEventListener('submit', async e => {
   const name = document.getElementById('name').value;
   await fetch('/api/add', {
     method: 'POST',
-    headers: {'Content-Type':'application/json'},
+    headers: csrfHeaders(),
     body: JSON.stringify({name})
   });
   document.getElementById('name').value = '';
@@ -35,7 +59,7 @@ document.getElementById('update-form').addEventListener('submit', async e => {
   const location = document.getElementById('location').value;
   await fetch('/api/update', {
     method: 'POST',
-    headers: {'Content-Type':'application/json'},
+    headers: csrfHeaders(),
     body: JSON.stringify({job_id, status, location})
   });
   document.getElementById('job_id').value = '';
@@ -55,5 +55,41 @@
         }
       });
     }
+
+    // Coverage per operator over time
+    const trendCtx = document.getElementById('operatorTrendChart');
+    const freqSelect = document.getElementById('grade-trend-freq');
+    let trendChart = null;
+    function loadTrend() {
+      fetch(`/analysis/operator-grades/series?freq=${freqSelect.value}`)
+        .then(r => r.json())
+        .then(data => {
+          const series = data.series || [];
+          const periods = Array.from(new Set(series.map(s => s.period))).sort();
+          const byOperator = {};
+          series.forEach(s => {
+            const name = s.operator || '';
+            byOperator[name] = byOperator[name] || {};
+            byOperator[name][s.period] = s.coverage == null ? null : Math.round(s.coverage * 10000) / 100;
+          });
+          const datasets = Object.entries(byOperator).map(([name, values]) => ({
+            label: name,
+            data: periods.map(p => values[p] ?? null),
+            spanGaps: true,
+            fill: false
+          }));
+          if (trendChart) trendChart.destroy();
+          trendChart = new Chart(trendCtx, {
+            type: 'line',
+            data: { labels: periods, datasets },
+            options: { scales: { y: { beginAtZero: true, max: 100 } } }
+          });
+        })
+        .catch(err => console.error('Failed to load grade trend', err));
+    }
+    if (trendCtx && freqSelect) {
+      freqSelect.addEventListener('change', loadTrend);
+      loadTrend();
+    }
   });
 })();
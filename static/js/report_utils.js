@@ -1,4 +1,4 @@
-window.exportChartWithTable = function (
+window.exportChartWithTable = async function (
   canvas,
   tableSelector,
   title,
@@ -6,6 +6,7 @@ window.exportChartWithTable = function (
   orientation = 'landscape',
   marginInches = 0.5
 ) {
+  await window.loadAssets('pdf');
   const { jsPDF } = window.jspdf;
   const pdf = new jsPDF({ orientation });
   const margin = marginInches * 25.4;
@@ -42,10 +42,17 @@
     });
   });
 
-  document.addEventListener('DOMContentLoaded', () => {
+  function start() {
     initDraggables();
     observer.observe(document.body, { childList: true, subtree: true });
-  });
+  }
+
+  // Loaded on demand, usually after the page has finished parsing
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', start);
+  } else {
+    start();
+  }
 
   window.openReportWindow = function() {
     if (document.getElementById('report-window')) return;
@@ -289,7 +296,7 @@
     });
 
     header.querySelector('#report-print').addEventListener('click', async () => {
-      if (!window.jspdf || !window.html2canvas) return;
+      await window.loadAssets('pdf');
       const reportItems = body.querySelectorAll('.report-item');
       reportItems.forEach(item => item.classList.add('no-border'));
       const { jsPDF } = window.jspdf;
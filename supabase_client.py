@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from resilience import CircuitBreaker, SWRCache
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:  # pragma: no cover - fail gracefully if not installed
+    requests = None
+
+# Assemblies per PostgREST request; keeps the query string well under URL limits
+BATCH_SIZE = 100
+
+
+def _in_filter(values: Iterable[str]) -> str:
+    """Return a PostgREST ``in.(...)`` filter with every value double-quoted."""
+    quoted = []
+    for value in values:
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+        quoted.append(f'"{escaped}"')
+    return f"in.({','.join(quoted)})"
+
+
+class FIRateClient:
+    """Look up Final Inspect reject rates from the Supabase ``combined_reports`` view.
+
+    Rates are fetched in batched ``assembly=in.(...)`` queries over a pooled
+    session and kept for ``ttl`` seconds. Callers wait at most ``budget``
+    seconds; lookups still in flight after that are reported as pending and
+    fill the cache when they finish. Expired rates are served for another
+    ``stale_ttl`` seconds while they are refreshed, and a circuit breaker
+    stops querying Supabase after repeated failures.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        *,
+        ttl: float = 300.0,
+        stale_ttl: float = 3600.0,
+        budget: float = 0.5,
+        timeout: float = 10.0,
+        session=None,
+        cache: Optional[SWRCache] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.budget = budget
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        session.headers.update({'apikey': key, 'Authorization': f'Bearer {key}'})
+        self.session = session
+        self.cache = cache or SWRCache(ttl, stale_ttl)
+        self.breaker = breaker or CircuitBreaker()
+        self._inflight: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fi-rates')
+
+    def _query(self, assemblies: List[str]) -> Dict[str, Optional[float]]:
+        resp = self.session.get(
+            f'{self.url}/rest/v1/combined_reports',
+            params={'select': 'assembly,fi_reject_rate', 'assembly': _in_filter(assemblies)},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        found = {}
+        for row in data if isinstance(data, list) else []:
+            found.setdefault(row.get('assembly'), row.get('fi_reject_rate'))
+        return found
+
+    def _fetch(self, assemblies: List[str]) -> Dict[str, Optional[float]]:
+        """Query ``combined_reports`` for *assemblies* and cache the results."""
+        rates: Dict[str, Optional[float]] = {}
+        try:
+            for i in range(0, len(assemblies), BATCH_SIZE):
+                chunk = assemblies[i:i + BATCH_SIZE]
+                found = self.breaker.call(self._query, chunk)
+                for asm in chunk:
+                    rates[asm] = found.get(asm)
+                    self.cache.put(asm, rates[asm])
+        finally:
+            with self._lock:
+                for asm in assemblies:
+                    self._inflight.pop(asm, None)
+        return rates
+
+    def get_rates(self, assemblies: Iterable[str]) -> Tuple[Dict[str, Optional[float]], List[str]]:
+        """Return ``(rates, pending)`` for *assemblies*.
+
+        ``rates`` maps each resolved assembly to its reject rate (``None`` when
+        Supabase has no row for it). ``pending`` lists assemblies whose lookup
+        did not finish within the time budget or failed.
+        """
+        wanted = sorted({a for a in assemblies if a})
+        rates: Dict[str, Optional[float]] = {}
+        fetch = []
+        waits = []
+        started = time.monotonic()
+        with self._lock:
+            for asm in wanted:
+                state, value = self.cache.lookup(asm)
+                if state != SWRCache.MISSING:
+                    rates[asm] = value
+                if state == SWRCache.FRESH:
+                    continue
+                if asm in self._inflight:
+                    if state == SWRCache.MISSING:
+                        waits.append(self._inflight[asm])
+                    continue
+                fetch.append(asm)
+            if fetch:
+                # Stale rates ride along in the same batch but are not waited on
+                future = self._executor.submit(self._fetch, fetch)
+                for asm in fetch:
+                    self._inflight[asm] = future
+                if any(asm not in rates for asm in fetch):
+                    waits.append(future)
+        deadline = started + self.budget
+        for future in dict.fromkeys(waits):
+            try:
+                future.result(timeout=max(deadline - time.monotonic(), 0))
+            except Exception:
+                # Timed out or failed; those assemblies are reported as pending
+                pass
+        for asm in wanted:
+            if asm not in rates:
+                state, value = self.cache.peek(asm)
+                if state != SWRCache.MISSING:
+                    rates[asm] = value
+        pending = [a for a in wanted if a not in rates]
+        return rates, pending
+
+    def metrics(self) -> Dict[str, object]:
+        return {'cache': self.cache.metrics(), 'breaker': self.breaker.metrics()}
+
+
+def create_fi_rate_client(url: Optional[str], key: Optional[str], **kwargs) -> Optional[FIRateClient]:
+    """Return a client for *url*/*key*, or ``None`` when Supabase is not configured."""
+    if requests is None or not url or not key:
+        return None
+    return FIRateClient(url, key, **kwargs)
@@ -0,0 +1,255 @@
+"""Deterministic synthetic production data for load testing.
+
+:func:`populate` fills an initialised database with AOI, Final Inspect,
+MOAT and user rows at a chosen scale. Rows are inserted through the
+``aoi_reports``/``fi_reports``/``moat`` views, so the dimension tables,
+generation counters and filter options are maintained by the same triggers
+as real uploads. The same ``seed`` always produces the same rows.
+
+The data is shaped like the plant's: jobs are inspected at AOI and then at
+Final Inspect a few days later, reject rates vary by assembly, and every
+MOAT report covers one line on one day. :func:`aoi_workbook` and
+:func:`moat_workbook` build upload files in the formats the import paths
+expect.
+"""
+
+import io
+import itertools
+import math
+import random
+import re
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from openpyxl import Workbook
+
+# Named scales for --rows; any count such as 250k or 1.5m also works
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '5m': 5_000_000}
+
+# Share of the requested rows written to each table
+TABLE_SHARES = {'aoi_reports': 0.45, 'fi_reports': 0.35, 'moat': 0.20}
+
+DEFAULT_START = date(2024, 1, 1)
+DEFAULT_DAYS = 365
+BATCH_ROWS = 5000
+LINES = ('L0', 'L1', 'L2', 'LOffline')
+SHIFTS = ('1', '2', '3')
+
+AOI_COLUMNS = (
+    'report_date', 'shift', 'operator', 'customer', 'assembly', 'rev',
+    'job_number', 'qty_inspected', 'qty_rejected', 'additional_info',
+)
+MOAT_COLUMNS = (
+    'model_name', 'total_boards', 'total_parts_per_board', 'total_parts',
+    'ng_parts', 'ng_ppm', 'falsecall_parts', 'falsecall_ppm',
+    'upload_time', 'filename', 'report_date', 'line',
+)
+MOAT_SHEET_COLUMNS = MOAT_COLUMNS[:8]
+USER_PERMISSIONS = ('part_markings', 'aoi', 'analysis', 'dashboard', 'reports')
+
+
+def parse_scale(value) -> int:
+    """Return a row count from ``10k``, ``1.5m``, ``5M`` or a plain integer."""
+    text = str(value).strip().lower().replace('_', '')
+    if text in SCALES:
+        return SCALES[text]
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([km]?)', text)
+    if not match:
+        raise ValueError(f'Invalid scale: {value!r}')
+    number, unit = match.groups()
+    return int(float(number) * {'': 1, 'k': 1_000, 'm': 1_000_000}[unit])
+
+
+class SyntheticData:
+    """Row generators for one seed and scale.
+
+    Pools of operators, customers, assemblies and MOAT models grow with the
+    square root of the row count, like a plant that takes on more products
+    as volume grows.
+    """
+
+    def __init__(self, rows: int, seed: int = 0, start: date = DEFAULT_START, days: int = DEFAULT_DAYS):
+        self.rows = rows
+        self.seed = seed
+        self.start = start
+        self.days = days
+        rng = random.Random(seed)
+        scale = math.sqrt(max(rows, 1) / 10_000)
+        self.operators = [f'OP{i:04d}' for i in range(min(max(int(20 * scale), 5), 400))]
+        self.customers = [f'CUST{i:03d}' for i in range(min(max(int(8 * scale), 3), 80))]
+        self.assemblies = [
+            (
+                f'ASM-{i:05d}',
+                rng.choice(self.customers),
+                rng.choice('ABCDE'),
+                # Baseline reject rate; most assemblies are clean, a few are not
+                min(rng.lognormvariate(-4.0, 0.9), 0.4),
+            )
+            for i in range(min(max(int(60 * scale), 10), 5000))
+        ]
+        self.models = [
+            (f"{rng.choice(('SMT', 'TH'))}-MDL{i:04d}", rng.randint(40, 1200), rng.lognormvariate(3.0, 1.0))
+            for i in range(min(max(int(40 * scale), 10), 3000))
+        ]
+
+    def count(self, table: str) -> int:
+        return int(self.rows * TABLE_SHARES[table])
+
+    def _day(self, offset: int) -> str:
+        return (self.start + timedelta(days=min(max(offset, 0), self.days - 1))).isoformat()
+
+    def inspections(self, table: str) -> Iterator[Tuple]:
+        """Yield AOI or FI rows in :data:`AOI_COLUMNS` order.
+
+        Both tables draw from the same job stream, so every job seen at
+        Final Inspect was inspected at AOI one to three days earlier.
+        """
+        total = self.count(table)
+        rng = random.Random(f'{self.seed}-{table}')
+        jobs = random.Random(f'{self.seed}-jobs')
+        # Jobs start at an even pace over the period and each spans a few
+        # rows (shifts, operators); AOI and FI walk the same job list
+        job_count = max(self.count('aoi_reports') // 3, 1)
+        job_index = -1
+        for i in range(total):
+            index = i * job_count // total
+            while job_index < index:
+                assembly, customer, rev, base_rate = jobs.choice(self.assemblies)
+                job_index += 1
+            day = job_index * self.days // job_count
+            job_number = f'J{100000 + job_index}'
+            offset = day + (rng.randint(1, 3) if table == 'fi_reports' else rng.randint(0, 1))
+            inspected = rng.randint(5, 400)
+            rate = base_rate * (0.5 if table == 'fi_reports' else 1.0) * rng.uniform(0.3, 1.7)
+            rejected = min(inspected, int(rng.betavariate(1, 1) * 2 * rate * inspected))
+            yield (
+                self._day(offset),
+                rng.choice(SHIFTS),
+                rng.choice(self.operators),
+                customer,
+                assembly,
+                rev,
+                job_number,
+                inspected,
+                rejected,
+                'rework' if rejected and rng.random() < 0.05 else '',
+            )
+
+    def moat(self) -> Iterator[Tuple]:
+        """Yield MOAT rows in :data:`MOAT_COLUMNS` order, one file per line per day."""
+        total = self.count('moat')
+        rng = random.Random(f'{self.seed}-moat')
+        per_file = max(min(len(self.models), total // max(self.days * len(LINES), 1)), 1)
+        written = 0
+        for offset in range(self.days):
+            day = self._day(offset)
+            for line in LINES:
+                if written >= total:
+                    return
+                filename = f'{day}_{line}.xlsx'
+                for model, parts, ppm in rng.sample(self.models, min(per_file, total - written)):
+                    yield (*self.moat_row(rng, model, parts, ppm), f'{day}T06:00:00', filename, day, line)
+                    written += 1
+
+    @staticmethod
+    def moat_row(rng: random.Random, model: str, parts: int, ppm: float) -> Tuple:
+        boards = rng.randint(1, 300)
+        total_parts = boards * parts
+        falsecall = int(total_parts * ppm * rng.uniform(0.2, 2.0) / 1e6)
+        ng = int(falsecall * rng.uniform(0.0, 0.3))
+        return (
+            model,
+            boards,
+            parts,
+            total_parts,
+            ng,
+            round(ng * 1e6 / total_parts, 2),
+            falsecall,
+            round(falsecall * 1e6 / total_parts, 2),
+        )
+
+    def users(self) -> Iterator[Tuple]:
+        """Yield ``(username, *permissions)`` rows; about one user per 20k rows."""
+        rng = random.Random(f'{self.seed}-users')
+        for i in range(min(max(self.rows // 20_000, 5), 500)):
+            yield (f'user{i:04d}',) + tuple(int(rng.random() < 0.6) for _ in USER_PERMISSIONS)
+
+
+def _insert(conn, table: str, columns, rows: Iterator[Tuple], batch: int) -> int:
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    written = 0
+    chunk: List[Tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch:
+            conn.executemany(sql, chunk)
+            conn.commit()
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(sql, chunk)
+        conn.commit()
+        written += len(chunk)
+    return written
+
+
+def populate(conn, rows: int, seed: int = 0, start: date = DEFAULT_START,
+             days: int = DEFAULT_DAYS, password_hash: str = '', batch: int = BATCH_ROWS) -> Dict[str, int]:
+    """Insert about *rows* synthetic rows into an initialised database.
+
+    Returns the number of rows written per table. Users share
+    *password_hash* so generating them stays cheap.
+    """
+    data = SyntheticData(rows, seed, start, days)
+    counts = {
+        'aoi_reports': _insert(conn, 'aoi_reports', AOI_COLUMNS, data.inspections('aoi_reports'), batch),
+        'fi_reports': _insert(conn, 'fi_reports', AOI_COLUMNS, data.inspections('fi_reports'), batch),
+        'moat': _insert(conn, 'moat', MOAT_COLUMNS, data.moat(), batch),
+    }
+    counts['users'] = _insert(
+        conn,
+        'users',
+        ('username', 'password') + USER_PERMISSIONS,
+        ((u[0], password_hash) + u[1:] for u in data.users()),
+        batch,
+    )
+    return counts
+
+
+def _workbook_bytes(wb: Workbook) -> bytes:
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def aoi_workbook(rows: int, seed: int = 0) -> bytes:
+    """Return an AOI/FI upload workbook (columns A:H, no header) with *rows* rows."""
+    data = SyntheticData(math.ceil(rows / TABLE_SHARES['aoi_reports']), seed)
+    wb = Workbook()
+    ws = wb.active
+    for row in itertools.islice(data.inspections('aoi_reports'), rows):
+        # operator, customer, assembly, rev, job, inspected, rejected, info;
+        # an all-blank info column would be trimmed, so blanks read "OK"
+        ws.append([row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9] or 'OK'])
+    return _workbook_bytes(wb)
+
+
+def moat_workbook(models: int, seed: int = 0) -> bytes:
+    """Return a MOAT PPM workbook in the machine export layout.
+
+    Five preamble rows, a header on row 6, data in columns B:I and a
+    closing ``Total`` row, as read with ``header=5, usecols='B:I'``.
+    """
+    # The model pool grows as 40 * sqrt(rows / 10k); size it to fit *models*
+    data = SyntheticData(math.ceil(10_000 * (models / 40) ** 2) + 1, seed)
+    rng = random.Random(f'{seed}-sheet')
+    wb = Workbook()
+    ws = wb.active
+    for i in range(5):
+        ws.append([f'PPM report line {i + 1}'])
+    ws.append([None, *MOAT_SHEET_COLUMNS])
+    rows = [data.moat_row(rng, *m) for m in rng.sample(data.models, min(models, len(data.models)))]
+    for row in rows:
+        ws.append([None, *row])
+    ws.append([None, 'Total', sum(r[1] for r in rows)])
+    return _workbook_bytes(wb)
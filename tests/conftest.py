@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import run
+
+
+@pytest.fixture(autouse=True)
+def _tmp_database(tmp_path, monkeypatch):
+    """Point the app at a per-test database so tests never touch spcapp.db."""
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'spcapp.db'))
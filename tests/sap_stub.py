@@ -0,0 +1,113 @@
+"""Local stand-in for the SAP material gateway used by RealSAPClient tests.
+
+Run ``python tests/sap_stub.py`` to serve the sample materials on port 8765
+for manual testing with ``USE_SAP=true SAP_BASE_URL=http://127.0.0.1:8765``.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+SAMPLE_MATERIALS = {
+    'MAT1': {'id': 'MAT1', 'description': 'Sample material 1'},
+    'MAT2': {'id': 'MAT2', 'description': 'Sample material 2'},
+}
+
+
+class SAPStubHandler(BaseHTTPRequestHandler):
+    """Serves ``/materials/<id>``, ``/materials?ids=...``, ``/materials/export``
+    and ``/jobs/locations``.
+
+    Materials come from ``server.materials`` and jobs from ``server.jobs``.
+
+    ``server.delay`` slows every response and ``server.failures`` makes that
+    many upcoming requests answer 503, to exercise timeouts and retries.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak_active = max(server.peak_active, server.active)
+            server.connections.add(self.client_address)
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+        try:
+            time.sleep(server.delay)
+            url = urlparse(self.path)
+            if fail:
+                self._send(503, {'error': 'unavailable'})
+            elif url.path == '/jobs/locations':
+                self._send(200, {'jobs': server.jobs})
+            elif url.path == '/materials/export':
+                since = parse_qs(url.query).get('changed_since', [''])[0]
+                found = [
+                    m for m in server.materials.values()
+                    if (m.get('changed_at') or '') > since or not since
+                ]
+                self._send(200, {'materials': found})
+            elif url.path == '/materials':
+                ids = parse_qs(url.query).get('ids', [''])[0].split(',')
+                found = [server.materials[i] for i in ids if i in server.materials]
+                self._send(200, {'materials': found})
+            elif url.path.startswith('/materials/'):
+                material = server.materials.get(unquote(url.path[len('/materials/'):]))
+                if material:
+                    self._send(200, material)
+                else:
+                    self._send(404, {'error': 'not found'})
+            else:
+                self._send(404, {'error': 'not found'})
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def sap_stub_server(materials=None, *, port=0):
+    """Run the stub in a background thread and yield the server.
+
+    The base URL is available as ``server.base_url``.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), SAPStubHandler)
+    server.daemon_threads = True
+    server.materials = dict(SAMPLE_MATERIALS if materials is None else materials)
+    server.jobs = []
+    server.delay = 0.0
+    server.failures = 0
+    server.requests = 0
+    server.active = 0
+    server.peak_active = 0
+    server.connections = set()
+    server.lock = threading.Lock()
+    server.base_url = f'http://127.0.0.1:{server.server_port}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    with sap_stub_server(port=8765) as server:
+        print(f'SAP stub listening on {server.base_url}')
+        threading.Event().wait()
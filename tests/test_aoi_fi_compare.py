@@ -70,3 +70,49 @@ def test_compare_jobs_json(client):
     data = resp.get_json()
     assert data['job_number'] == 'J100'
     assert 'aoi' in data and 'fi' in data
+
+
+def test_compare_rows_are_paginated(client):
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        [(f'2024-01-{d:02d}', '1st', 'Alice', 'Cust1', 'Asm1', 'R1', f'J{d}', 10, 1, '') for d in range(1, 6)],
+    )
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user'] = 'analyst'
+
+    resp = client.get('/analysis/compare')
+    assert b'J3' not in resp.data
+
+    resp = client.get('/analysis/compare/aoi/rows?per_page=2&page=2&start=2024-01-02')
+    data = resp.get_json()
+    assert data['total'] == 4
+    assert [r['job_number'] for r in data['rows']] == ['J3', 'J2']
+
+    resp = client.get('/analysis/compare/fi/rows')
+    assert resp.get_json()['rows'] == []
+
+
+def test_compare_exports_the_full_filtered_set(client):
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        [(f'2024-01-{d:02d}', '1st', 'Alice', 'Cust1', 'Asm1', 'R1', f'J{d}', 10, 1, '') for d in range(1, 6)],
+    )
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user'] = 'analyst'
+
+    page = client.get('/analysis/compare?start=2024-01-02&end=2024-01-04').get_data(as_text=True)
+    assert '"/export/aoi?start=2024-01-02\\u0026end=2024-01-04"' in page
+    assert '"/export/fi?start=2024-01-02\\u0026end=2024-01-04"' in page
+
+    # Every matching row, not just the visible table page
+    resp = client.get('/export/aoi?start=2024-01-02&end=2024-01-04')
+    assert resp.status_code == 200
+    lines = resp.get_data(as_text=True).splitlines()
+    assert len(lines) == 4
+    assert [l.split(',')[7] for l in lines[1:]] == ['J2', 'J3', 'J4']
@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import assets
+from run import app, init_db, asset_manifest
+
+
+@pytest.fixture()
+def static_dir(tmp_path):
+    files = {
+        'js/a.js': "// helper\nfunction add(a, b) {\n    return a + b; // sum\n}\nconst s = '// kept';\n",
+        'js/b.js': 'const re = /\\/+$/;\nconst t = `x  ${add(1, 2)}  y`;\n',
+        'css/site.css': '/* theme */\nbody {\n  color: red;\n}\n',
+    }
+    for path, text in files.items():
+        target = tmp_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(text)
+    return tmp_path
+
+
+BUNDLES = {
+    'page.js': ['vendor/lib.min.js', 'js/a.js', 'js/b.js'],
+    'site.css': ['css/site.css'],
+}
+VENDOR = {'vendor/lib.min.js': 'https://cdn.example/lib.min.js'}
+
+
+def test_vendor_downloads_missing_files_once(static_dir):
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return b'var lib=1;\n//# sourceMappingURL=lib.min.js.map\n'
+
+    assert assets.vendor(str(static_dir), VENDOR, fetch) == ['vendor/lib.min.js']
+    assert assets.vendor(str(static_dir), VENDOR, fetch) == []
+    assert fetched == ['https://cdn.example/lib.min.js']
+
+
+def test_build_writes_fingerprinted_bundles(static_dir):
+    assets.vendor(str(static_dir), VENDOR, lambda url: b'var lib=1;\n//# sourceMappingURL=lib.min.js.map\n')
+    (static_dir / 'dist').mkdir()
+    (static_dir / 'dist' / 'page.0123456789ab.js').write_text('stale')
+
+    manifest = assets.build(str(static_dir), BUNDLES)
+    assert set(manifest) == {'page.js', 'site.css'}
+    assert manifest['page.js'].startswith('dist/page.') and manifest['page.js'].endswith('.js')
+    assert json.loads((static_dir / 'dist' / 'manifest.json').read_text()) == manifest
+    assert sorted(os.listdir(static_dir / 'dist')) == sorted(
+        ['manifest.json'] + [os.path.basename(p) for p in manifest.values()]
+    )
+
+    # Sources are concatenated unchanged, minus source map comments
+    js = (static_dir / manifest['page.js']).read_text()
+    sources = [(static_dir / p).read_text() for p in ('js/a.js', 'js/b.js')]
+    assert js == '\n;'.join(['var lib=1;\n'] + sources)
+    assert (static_dir / manifest['site.css']).read_text() == (static_dir / 'css/site.css').read_text()
+
+    # Same content, same name
+    assert assets.build(str(static_dir), BUNDLES) == manifest
+
+
+def test_build_reports_missing_sources(static_dir):
+    with pytest.raises(FileNotFoundError, match='vendor/lib.min.js'):
+        assets.build(str(static_dir), BUNDLES)
+
+
+def test_manifest_falls_back_to_sources_and_cdn(static_dir):
+    manifest = assets.AssetManifest(str(static_dir), lambda p: f'/static/{p}', BUNDLES, VENDOR)
+    assert manifest.urls('page.js') == [
+        'https://cdn.example/lib.min.js', '/static/js/a.js', '/static/js/b.js',
+    ]
+    assets.vendor(str(static_dir), VENDOR, lambda url: b'var lib=1;')
+    built = assets.build(str(static_dir), BUNDLES)
+    assert manifest.urls('page.js') == [f"/static/{built['page.js']}"]
+
+
+@pytest.fixture()
+def client(tmp_path, static_dir, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    init_db()
+    (static_dir / 'vendor').mkdir(exist_ok=True)
+    for path in assets.VENDOR_ASSETS:
+        (static_dir / path).write_text('/* vendored */')
+    for files in assets.BUNDLES.values():
+        for path in files:
+            target = static_dir / path
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_text('void 0;\n')
+    monkeypatch.setattr(app, 'static_folder', str(static_dir))
+    monkeypatch.setattr(asset_manifest, 'static_dir', str(static_dir))
+    built = assets.build(str(static_dir))
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client, built
+
+
+def test_pages_use_bundles_and_defer_report_libraries(client):
+    client, built = client
+    html = client.get('/aoi').get_data(as_text=True)
+    assert f"/static/{built['base.js']}" in html
+    assert f"/static/{built['aoi.js']}" in html
+    assert 'cdn.' not in html
+    # jsPDF and the report builder are only listed for on-demand loading
+    assert f'<script src="/static/{built["pdf.js"]}"' not in html
+    assert f'"/static/{built["pdf.js"]}"' in html
+    assert f'<script src="/static/{built["report_window.js"]}"' not in html
+
+
+def test_fingerprinted_files_are_immutable(client):
+    client, built = client
+    resp = client.get(f"/static/{built['base.js']}")
+    assert resp.status_code == 200
+    assert resp.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    resp.close()
+    resp = client.get('/static/dist/manifest.json')
+    assert 'immutable' not in resp.headers.get('Cache-Control', '')
+    resp.close()
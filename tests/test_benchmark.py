@@ -0,0 +1,140 @@
+import io
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import benchmark
+import run
+from run import app, init_db, get_db
+from synthetic_data import SyntheticData, aoi_workbook, moat_workbook, parse_scale, populate
+
+
+@pytest.fixture()
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    init_db()
+    conn = get_db()
+    yield conn
+    conn.close()
+
+
+def test_parse_scale():
+    assert parse_scale('10k') == 10_000
+    assert parse_scale('5M') == 5_000_000
+    assert parse_scale('1.5m') == 1_500_000
+    assert parse_scale(2500) == 2500
+    with pytest.raises(ValueError):
+        parse_scale('lots')
+
+
+def test_same_seed_same_rows():
+    first = SyntheticData(3000, seed=7)
+    again = SyntheticData(3000, seed=7)
+    other = SyntheticData(3000, seed=8)
+    assert list(first.inspections('aoi_reports')) == list(again.inspections('aoi_reports'))
+    assert list(first.moat()) == list(again.moat())
+    assert list(first.inspections('aoi_reports')) != list(other.inspections('aoi_reports'))
+
+
+def test_populate_goes_through_the_views(db):
+    counts = populate(db, 3000, seed=1, days=30)
+    assert counts == {'aoi_reports': 1350, 'fi_reports': 1050, 'moat': 600, 'users': 5}
+    assert db.execute('SELECT COUNT(*) FROM aoi_reports').fetchone()[0] == 1350
+    assert db.execute('SELECT COUNT(*) FROM moat').fetchone()[0] == 600
+
+    # Every FI job was seen at AOI first
+    late = db.execute(
+        'SELECT COUNT(*) FROM fi_reports f WHERE NOT EXISTS ('
+        ' SELECT 1 FROM aoi_reports a WHERE a.job_number = f.job_number AND a.report_date <= f.report_date)'
+    ).fetchone()[0]
+    assert late == 0
+    rate = db.execute('SELECT 1.0 * SUM(qty_rejected) / SUM(qty_inspected) FROM aoi_reports').fetchone()[0]
+    assert 0 < rate < 0.2
+
+
+def test_generate_data_needs_an_empty_target(db, tmp_path):
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['generate-data', '--rows', '3000', '--password', 'pw']).exit_code != 0
+    assert runner.invoke(args=['generate-data', '--rows', '3000', '--db', 'x.db']).exit_code != 0
+
+    target = str(tmp_path / 'synthetic.db')
+    threshold = run.SLOW_QUERY_SECONDS
+    args = ['generate-data', '--rows', '3000', '--db', target, '--password', 'pw']
+    result = runner.invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert '1350 aoi_reports' in result.output
+    assert run.SLOW_QUERY_SECONDS == threshold
+    # The configured database is left alone
+    assert db.execute('SELECT COUNT(*) FROM aoi_reports').fetchone()[0] == 0
+    conn = get_db(target)
+    assert conn.execute('SELECT COUNT(*) FROM aoi_reports').fetchone()[0] == 1350
+    conn.close()
+
+    again = runner.invoke(args=args)
+    assert again.exit_code != 0
+    assert 'already has rows in aoi_reports, fi_reports, moat, users' in again.output
+
+
+def test_workbooks_match_the_import_layouts():
+    aoi = pd.read_excel(io.BytesIO(aoi_workbook(20)), header=None, usecols='A:H')
+    assert len(aoi) == 20
+    moat = pd.read_excel(io.BytesIO(moat_workbook(15)), header=5, usecols='B:I')
+    assert list(moat.columns)[:2] == ['model_name', 'total_boards']
+    assert moat.iloc[-1]['model_name'] == 'Total'
+    assert len(moat) == 16
+
+
+def test_every_get_route_is_benchmarked():
+    assert benchmark.uncovered_endpoints(app) == []
+
+
+def test_compare_flags_slowdowns_and_failures():
+    baseline = {'results': {
+        'fast': {'median_ms': 1.0, 'status': 200},
+        'slow': {'median_ms': 100.0, 'status': 200},
+        'same': {'median_ms': 50.0, 'status': 200},
+        'broken': {'median_ms': 10.0, 'status': 200},
+    }}
+    current = {'results': {
+        'fast': {'median_ms': 2.0, 'status': 200},
+        'slow': {'median_ms': 140.0, 'status': 200},
+        'same': {'median_ms': 55.0, 'status': 200},
+        'broken': {'median_ms': 5.0, 'status': 500},
+        'new': {'median_ms': 5.0, 'status': 200},
+    }}
+    rows = {r['name']: r for r in benchmark.compare(baseline, current, threshold=0.25, min_delta_ms=2.0)}
+    assert set(rows) == {'fast', 'slow', 'same', 'broken'}
+    # 'fast' doubled but by less than min_delta_ms
+    assert [n for n, r in rows.items() if r['regression']] == ['slow', 'broken']
+
+
+def test_small_run_end_to_end(tmp_path, monkeypatch):
+    # run_suite repoints the app; let monkeypatch restore it afterwards
+    monkeypatch.setattr('run.DATABASE', 'unused.db')
+    monkeypatch.setattr('run.SLOW_QUERY_SECONDS', 0.25)
+    monkeypatch.setattr('run.get_fi_rate_client', lambda: None)
+    monkeypatch.setattr('benchmark.UPLOAD_ROWS', 20)
+    monkeypatch.setattr('benchmark.MOAT_UPLOAD_MODELS', 20)
+    for key in ('WTF_CSRF_ENABLED', 'UPLOAD_FOLDER', 'PUBLIC_PPM_DIR'):
+        monkeypatch.setitem(app.config, key, app.config.get(key))
+    saved = tmp_path / 'saved.db'
+    results = benchmark.run_suite(500, repeat=1, warmup=0, db=str(saved), workdir=str(tmp_path / 'work'))
+
+    assert saved.exists()
+    conn = get_db()
+    # Initial rows, one upload per ingestion case and the single-row entry
+    assert conn.execute('SELECT COUNT(*) FROM aoi_reports').fetchone()[0] == 225 + 20 + 1
+    assert conn.execute('SELECT COUNT(*) FROM fi_reports').fetchone()[0] == 175 + 20
+    # Uploaded and imported from the shared drive
+    assert conn.execute('SELECT COUNT(*) FROM moat').fetchone()[0] == 100 + 20 + 20
+    conn.close()
+    assert results['meta']['counts']['aoi_reports'] == 225
+    names = {name for name, _ in benchmark.ROUTES} | {n for n in results['results'] if n.startswith('ingest_')}
+    assert set(results['results']) == names
+    failures = {n: r['status'] for n, r in results['results'].items() if r['status'] >= 400}
+    assert failures == {}
+    assert results['results']['aoi_report_data_daily']['sql_statements'] > 0
+    unchanged = benchmark.compare(results, results)
+    assert unchanged and not any(r['regression'] for r in unchanged)
@@ -37,7 +37,59 @@ def test_compare_jobs_endpoint(client):
     assert resp.status_code == 200
     data = resp.get_json()
     assert data['job_number'] == 'J100'
-    assert data['aoi']['operator'] == 'Alice'
-    assert data['fi']['operator'] == 'Bob'
+    assert data['aoi']['rows'][0]['operator'] == 'Alice'
+    assert data['fi']['rows'][0]['operator'] == 'Bob'
+    assert data['aoi']['n_rows'] == 1
     assert data['aoi']['yield'] == pytest.approx(0.9)
     assert data['fi']['yield'] == pytest.approx(0.9)
+
+
+def test_compare_jobs_batch(client):
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        ('2024-01-02', '2nd', 'Carol', 'Cust1', 'Asm1', 'R1', 'J100', 30, 0, ''),
+    )
+    conn.execute(
+        "INSERT INTO fi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        ('2024-01-03', '1st', 'Dan', 'Cust2', 'Asm2', 'R1', 'J200', 5, 1, ''),
+    )
+    conn.commit()
+    conn.close()
+    resp = client.get('/analysis/compare/jobs/batch?job_numbers=J100,J200,J999')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['missing'] == ['J999']
+    j100 = data['jobs']['J100']
+    assert [r['operator'] for r in j100['aoi']['rows']] == ['Alice', 'Carol']
+    assert j100['aoi']['inspected'] == 40
+    assert j100['aoi']['yield'] == pytest.approx(39 / 40)
+    assert j100['fi']['rows'][0]['operator'] == 'Bob'
+    assert data['jobs']['J200']['aoi'] is None
+    assert data['jobs']['J200']['fi']['yield'] == pytest.approx(0.8)
+
+
+def test_compare_jobs_single_matches_batch(client):
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        ('2024-01-02', '2nd', 'Carol', 'Cust1', 'Asm1', 'R1', 'J100', 30, 3, ''),
+    )
+    conn.commit()
+    conn.close()
+    single = client.get('/analysis/compare/jobs?job_number=J100').get_json()
+    batch = client.get('/analysis/compare/jobs/batch?job_numbers=J100').get_json()
+    assert single == batch['jobs']['J100']
+    assert single['aoi']['n_rows'] == 2
+    assert single['aoi']['inspected'] == 40
+    assert single['aoi']['rejected'] == 4
+
+
+def test_compare_jobs_unknown_job(client):
+    resp = client.get('/analysis/compare/jobs?job_number=J999')
+    assert resp.status_code == 404
+
+
+def test_compare_jobs_batch_requires_jobs(client):
+    resp = client.get('/analysis/compare/jobs/batch')
+    assert resp.status_code == 400
@@ -0,0 +1,129 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run.get_fi_rate_client', lambda: None)
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    init_db()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def _add_aoi(client, report_date):
+    client.post('/aoi', data={
+        'report_date': report_date, 'shift': '1', 'operator': 'Op', 'customer': 'C',
+        'assembly': 'A1', 'qty_inspected': '10', 'qty_rejected': '1',
+    })
+
+
+def test_unchanged_poll_returns_304_without_running_the_view(client, monkeypatch):
+    _add_aoi(client, '2024-03-01')
+    first = client.get('/aoi/report-data?freq=daily')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    def fail(*args, **kwargs):
+        raise AssertionError('report query ran')
+
+    monkeypatch.setattr('run._inspection_report_response', fail)
+    again = client.get('/aoi/report-data?freq=daily', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert again.get_data() == b''
+
+
+def test_writes_and_arguments_change_the_etag(client):
+    _add_aoi(client, '2024-03-01')
+    etag = client.get('/aoi/report-data?freq=daily').headers['ETag']
+    assert client.get('/aoi/report-data?freq=weekly').headers['ETag'] != etag
+
+    # Writes to other tables leave the ETag alone
+    client.post('/final-inspect', data={
+        'report_date': '2024-03-01', 'shift': '1', 'operator': 'Op', 'customer': 'C',
+        'assembly': 'A1', 'qty_inspected': '10', 'qty_rejected': '1',
+    })
+    conn = get_db()
+    assert conn.execute('SELECT COUNT(*) FROM fi_reports').fetchone()[0] == 1
+    conn.close()
+    assert client.get('/aoi/report-data?freq=daily', headers={'If-None-Match': etag}).status_code == 304
+
+    _add_aoi(client, '2024-03-02')
+    changed = client.get('/aoi/report-data?freq=daily', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_uploads_etag_follows_moat_generation(client):
+    etag = client.get('/uploads').headers['ETag']
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO moat (model_name, total_boards, falsecall_parts, ng_parts, report_date, line, filename) "
+        "VALUES ('M1', 100, 2, 1, '2024-03-01', 'L1', 'L1_20240301.xlsx')"
+    )
+    conn.commit()
+    conn.close()
+    resp = client.get('/uploads', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.get_json()['files'] == ['L1_20240301.xlsx']
+
+
+def test_uploads_forbidden_until_permission_granted(client):
+    conn = get_db()
+    conn.execute("INSERT INTO users (username, password) VALUES ('viewer', 'pw')")
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user'] = 'viewer'
+    forbidden = client.get('/uploads')
+    assert forbidden.status_code == 403
+    assert 'ETag' not in forbidden.headers
+
+    conn = get_db()
+    conn.execute("UPDATE users SET analysis = 1 WHERE username = 'viewer'")
+    conn.commit()
+    conn.close()
+    resp = client.get('/uploads')
+    assert resp.status_code == 200
+    assert resp.get_json()['files'] == []
+
+    # Revoked: the old ETag no longer earns a 304
+    conn = get_db()
+    conn.execute("UPDATE users SET analysis = 0 WHERE username = 'viewer'")
+    conn.commit()
+    conn.close()
+    revoked = client.get('/uploads', headers={'If-None-Match': resp.headers['ETag']})
+    assert revoked.status_code == 403
+
+
+def test_errors_and_pending_rates_are_not_cached(client, monkeypatch):
+    with client.session_transaction() as sess:
+        sess['user'] = 'nobody'
+    forbidden = client.get('/final-inspect/report-data')
+    assert forbidden.status_code == 403
+    assert 'ETag' not in forbidden.headers
+
+    class PendingRates:
+        class cache:
+            ttl = 300
+
+        def get_rates(self, assemblies):
+            return {}, list(assemblies)
+
+    with client.session_transaction() as sess:
+        sess['user'] = 'ADMIN'
+    monkeypatch.setattr('run.get_fi_rate_client', lambda: PendingRates())
+    _add_aoi(client, '2024-03-01')
+    resp = client.get('/aoi/report-data?freq=daily')
+    assert resp.get_json()['fi_pending'] == ['A1']
+    assert resp.headers['Cache-Control'] == 'no-store'
+    assert 'ETag' not in resp.headers
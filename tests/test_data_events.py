@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run.DATA_EVENT_STREAM_SECONDS', 0)
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    init_db()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def _events(resp):
+    assert resp.mimetype == 'text/event-stream'
+    events = []
+    for block in resp.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if fields.get('event') == 'data-changed':
+            events.append((int(fields['id']), json.loads(fields['data'])))
+    return events
+
+
+def _add_aoi(client, report_date):
+    client.post('/aoi', data={
+        'report_date': report_date, 'shift': '1', 'operator': 'Op', 'customer': 'C',
+        'assembly': 'A1', 'qty_inspected': '10', 'qty_rejected': '1',
+    })
+
+
+def test_writes_publish_events_with_dates_and_generation(client):
+    _add_aoi(client, '2024-03-01')
+    _add_aoi(client, '2024-03-02')
+    conn = get_db()
+    row_id = conn.execute("SELECT id FROM aoi_reports WHERE report_date = '2024-03-01'").fetchone()[0]
+    conn.close()
+    client.patch(f'/aoi/{row_id}', json={'field': 'report_date', 'value': '2024-03-05'})
+    client.delete(f'/aoi/{row_id}')
+
+    events = _events(client.get('/events?since=0'))
+    assert [(e['table'], e['dates']) for _, e in events] == [
+        ('aoi_reports', ['2024-03-01']),
+        ('aoi_reports', ['2024-03-02']),
+        ('aoi_reports', ['2024-03-01', '2024-03-05']),
+        ('aoi_reports', ['2024-03-05']),
+    ]
+    generations = [e['generation'] for _, e in events]
+    assert generations == sorted(generations) and len(set(generations)) == 4
+
+
+def test_reconnect_resumes_after_last_event_id(client):
+    _add_aoi(client, '2024-03-01')
+    # A fresh connection only streams events committed after it opened
+    assert _events(client.get('/events')) == []
+    first = _events(client.get('/events?since=0'))
+    _add_aoi(client, '2024-03-02')
+    resumed = _events(client.get('/events', headers={'Last-Event-ID': str(first[-1][0])}))
+    assert [e['dates'] for _, e in resumed] == [['2024-03-02']]
+    assert client.get('/events?since=abc').status_code == 400
+
+
+def test_moat_upload_delete_reports_lines(client):
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO moat (model_name, total_boards, ng_parts, falsecall_parts, filename, report_date, line) "
+        "VALUES ('M1', 10, 1, 1, 'ppm.xlsx', '2024-03-01', 'L1')"
+    )
+    conn.commit()
+    conn.close()
+    client.post('/uploads/delete', json={'filename': 'ppm.xlsx'})
+    [(_, event)] = _events(client.get('/events?since=0'))
+    assert event['table'] == 'moat'
+    assert (event['dates'], event['lines']) == (['2024-03-01'], ['L1'])
@@ -0,0 +1,99 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db
+
+
+@pytest.fixture()
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / 'test.db'
+    monkeypatch.setattr('run.DATABASE', str(path))
+    return path
+
+
+def test_views_write_through_to_fact_tables(db_path):
+    init_db()
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        [
+            ('2024-01-01', '1st', 'Alice', 'Cust1', 'Asm1', 'R1', 'J100', 10, 1, ''),
+            ('2024-01-02', '1st', 'Alice', 'Cust1', 'Asm2', 'R1', 'J101', 20, 2, ''),
+        ],
+    )
+    conn.commit()
+    assert conn.execute('SELECT COUNT(*) FROM dim_operator').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM dim_assembly').fetchone()[0] == 2
+    fact = conn.execute('SELECT * FROM aoi_facts WHERE id = 1').fetchone()
+    assert isinstance(fact['operator_id'], int)
+
+    conn.execute("UPDATE aoi_reports SET operator = ? WHERE id = ?", ('Bob', 2))
+    conn.execute('DELETE FROM aoi_reports WHERE id = ?', (1,))
+    conn.commit()
+    rows = [dict(r) for r in conn.execute('SELECT * FROM aoi_reports').fetchall()]
+    conn.close()
+    assert rows == [{
+        'id': 2,
+        'report_date': '2024-01-02',
+        'shift': '1st',
+        'operator': 'Bob',
+        'customer': 'Cust1',
+        'assembly': 'Asm2',
+        'rev': 'R1',
+        'job_number': 'J101',
+        'qty_inspected': 20,
+        'qty_rejected': 2,
+        'additional_info': '',
+        'job_key': 'J101',
+    }]
+
+
+def test_legacy_tables_are_migrated(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        'CREATE TABLE moat (id INTEGER PRIMARY KEY AUTOINCREMENT, model_name TEXT, '
+        'total_boards INTEGER, total_parts_per_board INTEGER, total_parts INTEGER, '
+        'ng_parts INTEGER, ng_ppm REAL, falsecall_parts INTEGER, falsecall_ppm REAL, '
+        'upload_time TEXT, filename TEXT, report_date TEXT, line TEXT)'
+    )
+    conn.execute(
+        "INSERT INTO moat (id, model_name, total_boards, total_parts, report_date, line, filename) VALUES (7, 'M1', 5, 50, '2024-01-01', 'L1', 'a.xls')"
+    )
+    conn.commit()
+    conn.close()
+
+    init_db()
+    conn = get_db()
+    kind = conn.execute("SELECT type FROM sqlite_master WHERE name = 'moat'").fetchone()[0]
+    row = conn.execute('SELECT id, model_name, line, filename FROM moat').fetchone()
+    conn.close()
+    assert kind == 'view'
+    assert tuple(row) == (7, 'M1', 'L1', 'a.xls')
+
+
+def test_report_data_filters_by_dimension(db_path):
+    init_db()
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO users (username, password, aoi) VALUES (?,?,1)",
+        ('tester', 'pw'),
+    )
+    conn.executemany(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        [
+            ('2024-01-01', '1st', 'Alice', 'Cust1', 'Asm1', 'R1', 'J100', 10, 1, ''),
+            ('2024-01-01', '2nd', 'Bob', 'Cust2', 'Asm2', 'R2', 'J200', 20, 2, ''),
+        ],
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        resp = client.get('/aoi/report-data?freq=daily&customer=Cust2')
+    data = resp.get_json()
+    assert [o['operator'] for o in data['operators']] == ['Bob']
+    assert data['customer_rates'] == [{'customer': 'Cust2', 'rate': 0.1}]
@@ -0,0 +1,70 @@
+import csv
+import io
+import os
+import sys
+import pytest
+from openpyxl import load_workbook
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run.EXPORT_CHUNK_ROWS', 7)
+    init_db()
+    conn = get_db()
+    conn.executemany(
+        'INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, qty_inspected, qty_rejected) '
+        'VALUES (?,?,?,?,?,?,?)',
+        [
+            (f'2024-03-{day:02d}', '1', 'Alice', 'Acme' if day % 2 else 'Globex', 'ASM-1', 10, day % 3)
+            for day in range(1, 29)
+        ],
+    )
+    conn.executemany(
+        'INSERT INTO moat (model_name, total_boards, ng_parts, falsecall_parts, filename, report_date, line) '
+        'VALUES (?,?,?,?,?,?,?)',
+        [
+            ('BOARD SMT', 20, 1, 2, '2024-03-01 L1.xlsx', '2024-03-01', 'L1'),
+            ('BOARD TH', 5, 0, 1, '2024-03-01 L2.xlsx', '2024-03-01', 'L2'),
+        ],
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def test_csv_export_streams_filtered_rows(client):
+    resp = client.get('/export/aoi?customer=Acme&start=2024-03-05&end=2024-03-25')
+    assert resp.mimetype == 'text/csv'
+    assert resp.is_streamed
+    assert 'attachment; filename=aoi-export-' in resp.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[0][:3] == ['id', 'report_date', 'shift']
+    dates = [r[1] for r in rows[1:]]
+    assert dates == [f'2024-03-{d:02d}' for d in range(5, 26) if d % 2]
+
+
+def test_xlsx_export_matches_chart_filters(client):
+    resp = client.get('/export/moat?format=xlsx&model_filter=smt&threshold=10')
+    assert resp.status_code == 200
+    ws = load_workbook(io.BytesIO(resp.data), read_only=True).active
+    rows = list(ws.values)
+    assert rows[0][:4] == ('id', 'report_date', 'line', 'model_name')
+    assert [r[3] for r in rows[1:]] == ['BOARD SMT']
+
+
+def test_export_rejects_bad_format_and_unauthorized_users(client):
+    assert client.get('/export/fi?format=pdf').status_code == 400
+    conn = get_db()
+    conn.execute("INSERT INTO users (username, password) VALUES ('viewer', 'pw')")
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user'] = 'viewer'
+    assert client.get('/export/moat').status_code == 403
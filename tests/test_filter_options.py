@@ -0,0 +1,82 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db, data_generation
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run._filter_options_cache', {})
+    init_db()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def _insert(table, *rows):
+    conn = get_db()
+    conn.executemany(
+        f'INSERT INTO {table} (report_date, shift, operator, customer, assembly, qty_inspected, qty_rejected) '
+        'VALUES (?,?,?,?,?,?,?)',
+        rows,
+    )
+    conn.commit()
+    generation = data_generation(conn, 'filter_options')[0]
+    conn.close()
+    return generation
+
+
+def test_options_follow_new_values_only(client):
+    first = _insert('aoi_reports', ('2024-03-01', '1', 'Bob', 'Acme', 'ASM-1', 10, 0))
+    # Same values again: the option lists are unchanged
+    assert _insert('aoi_reports', ('2024-03-02', '1', 'Bob', 'Acme', 'ASM-1', 5, 1)) == first
+    # An operator seen only in FI is not offered on the AOI dashboard
+    _insert('fi_reports', ('2024-03-02', '2', 'Zed', 'Acme', 'ASM-1', 5, 0))
+    assert client.get('/filters/aoi').get_json() == {
+        'customer': ['Acme'], 'shift': ['1'], 'operator': ['Bob'], 'assembly': ['ASM-1'],
+    }
+    assert client.get('/filters/fi').get_json()['operator'] == ['Zed']
+
+    assert _insert('aoi_reports', ('2024-03-03', '2', 'Alice', 'Acme', 'ASM-1', 5, 0)) > first
+    assert client.get('/filters/aoi').get_json()['operator'] == ['Alice', 'Bob']
+    assert 'value="Alice"' in client.get('/aoi').get_data(as_text=True)
+
+
+def test_cached_lists_skip_queries(client, monkeypatch):
+    _insert('aoi_reports', ('2024-03-01', '1', 'Bob', 'Acme', 'ASM-1', 10, 0))
+    client.get('/filters/aoi')
+    statements = []
+    original = get_db
+
+    def tracing_db():
+        conn = original()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr('run.get_db', tracing_db)
+    assert client.get('/filters/aoi').get_json()['customer'] == ['Acme']
+    assert not any('filter_options o' in s for s in statements)
+
+
+def test_cache_is_per_database(client, tmp_path, monkeypatch):
+    first = _insert('aoi_reports', ('2024-03-01', '1', 'Bob', 'Acme', 'ASM-1', 10, 0))
+    assert client.get('/filters/aoi').get_json()['operator'] == ['Bob']
+    # Another database at the same generation gets its own lists
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'other.db'))
+    init_db()
+    assert _insert('aoi_reports', ('2024-03-01', '2', 'Eve', 'Beta', 'ASM-9', 10, 0)) == first
+    assert client.get('/filters/aoi').get_json()['operator'] == ['Eve']
+
+
+def test_existing_rows_are_backfilled(client):
+    _insert('aoi_reports', ('2024-03-01', '1', 'Bob', 'Acme', 'ASM-1', 10, 0))
+    conn = get_db()
+    conn.execute('DROP TABLE filter_options')
+    conn.commit()
+    conn.close()
+    init_db()
+    assert client.get('/filters/aoi').get_json()['operator'] == ['Bob']
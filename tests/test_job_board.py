@@ -0,0 +1,114 @@
+import os
+import sys
+from datetime import date, timedelta
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from sap_client import MockSAPClient, SAPService
+from run import app, init_db, get_db, build_job_board, run_job_location_refresh
+
+
+class CountingClient(MockSAPClient):
+    def __init__(self, jobs):
+        super().__init__(jobs=jobs)
+        self.calls = 0
+
+    def list_job_locations(self):
+        self.calls += 1
+        return super().list_job_locations()
+
+
+def _due(days):
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+@pytest.fixture()
+def sap(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run._job_board_cache', {})
+    client = CountingClient([
+        {'job': 'J-LATE', 'due_date': _due(-1), 'locations': [
+            {'location': 'AOI', 'quantity': 230}, {'location': 'Rework', 'quantity': 20},
+        ]},
+        {'job': 'J-SOON', 'due_date': _due(4), 'locations': [{'location': 'SMT', 'quantity': 50}]},
+        {'job': 'J-LATER', 'due_date': _due(10), 'locations': [{'location': 'Depanel', 'quantity': 5}]},
+    ])
+    monkeypatch.setattr('run.sap_service', SAPService(client))
+    init_db()
+    run_job_location_refresh()
+    return client
+
+
+def _get_home():
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        return client.get('/').get_data(as_text=True)
+
+
+def test_board_computed_from_snapshot(sap):
+    html = _get_home()
+    assert html.index('J-LATE') < html.index('J-SOON') < html.index('J-LATER')
+    assert 'AOI....230' in html
+    assert 'Total: 250' in html
+    conn = get_db()
+    board = build_job_board(conn, date.today())
+    conn.close()
+    assert [(j['job'], j['highlight'], j['due_in_days']) for j in board] == [
+        ('J-LATE', 'danger', -1),
+        ('J-SOON', 'warning', 4),
+        ('J-LATER', '', 10),
+    ]
+
+
+def test_board_is_cached_until_next_snapshot(sap, monkeypatch):
+    rendered = []
+
+    def counting_build(conn, today):
+        rendered.append(today)
+        return build_job_board(conn, today)
+
+    monkeypatch.setattr('run.build_job_board', counting_build)
+    _get_home()
+    _get_home()
+    # Page views never go to SAP
+    assert sap.calls == 1
+    assert len(rendered) == 1
+
+    # A new snapshot re-renders the board
+    sap.jobs = [{'job': 'J-NEW', 'due_date': _due(1), 'locations': [{'location': 'AOI', 'quantity': 1}]}]
+    assert run_job_location_refresh() == {'loaded': 1}
+    html = _get_home()
+    assert sap.calls == 2
+    assert len(rendered) == 2
+    assert 'J-NEW' in html and 'J-LATE' not in html
+
+
+def test_failed_refresh_keeps_last_snapshot(sap):
+    sap.should_timeout = True
+    assert 'error' in run_job_location_refresh()
+    assert 'J-LATE' in _get_home()
+    conn = get_db()
+    state = conn.execute('SELECT last_error FROM job_location_sync').fetchone()
+    conn.close()
+    assert 'timed out' in state['last_error']
+
+
+def test_due_dates_are_normalized_and_undated_jobs_come_last(sap):
+    sap.jobs = [
+        {'job': 'J-NONE', 'due_date': None, 'locations': [{'location': 'SMT', 'quantity': 1}]},
+        {'job': 'J-BAD', 'due_date': 'next week', 'locations': [{'location': 'SMT', 'quantity': 2}]},
+        {'job': 'J-TIME', 'due_date': _due(2) + 'T00:00:00', 'locations': [{'location': 'AOI', 'quantity': 3}]},
+        {'job': 'J-DATE', 'due_date': _due(5), 'locations': [{'location': 'AOI', 'quantity': 4}]},
+    ]
+    assert run_job_location_refresh() == {'loaded': 4}
+    conn = get_db()
+    stored = dict(conn.execute('SELECT job, due_date FROM job_locations').fetchall())
+    board = build_job_board(conn, date.today())
+    conn.close()
+    assert stored == {'J-NONE': None, 'J-BAD': None, 'J-TIME': _due(2), 'J-DATE': _due(5)}
+    assert [j['job'] for j in board] == ['J-TIME', 'J-DATE', 'J-BAD', 'J-NONE']
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        assert client.get('/').status_code == 200
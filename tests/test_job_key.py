@@ -0,0 +1,70 @@
+import os
+import sys
+import math
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db, normalize_job_key, job_key_sql, load_operator_grades
+
+INSERT_AOI = "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)"
+INSERT_FI = "INSERT INTO fi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)"
+
+SAMPLES = [
+    'J100', ' j100 ', 'J 100', '12345', '12345.0', '12345.000', ' 12345.0\t',
+    '12345.5', '1.0.0', '.0', '0012', 'abc.0', '', '   ', None, 12345.0, 12345,
+]
+
+
+@pytest.fixture()
+def conn(tmp_path, monkeypatch):
+    db_path = tmp_path / 'test.db'
+    monkeypatch.setattr('run.DATABASE', str(db_path))
+    init_db()
+    conn = get_db()
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('value', SAMPLES)
+def test_sql_matches_python(conn, value):
+    sql_value = str(value) if isinstance(value, float) else value
+    stored = conn.execute(
+        f'SELECT {job_key_sql("v")} FROM (SELECT ? AS v)', (sql_value,)
+    ).fetchone()[0]
+    assert stored == normalize_job_key(value)
+
+
+def test_normalize_examples():
+    assert normalize_job_key(' j100 ') == 'J100'
+    assert normalize_job_key('12345.0') == '12345'
+    assert normalize_job_key(12345.0) == '12345'
+    assert normalize_job_key('12345.5') == '12345.5'
+    assert normalize_job_key('  ') is None
+
+
+def test_key_follows_patch(conn):
+    conn.execute(INSERT_AOI, ('2024-01-01', '1st', 'Alice', 'Cust', 'Asm1', 'R1', 'J1', 10, 1, ''))
+    conn.execute("UPDATE aoi_reports SET job_number = ' 777.0 ' WHERE id = 1")
+    assert conn.execute('SELECT job_key FROM aoi_facts WHERE id = 1').fetchone()[0] == '777'
+
+
+def test_grades_join_on_job_key(conn):
+    conn.execute(INSERT_AOI, ('2024-01-01', '1st', 'Jim', 'Cust', 'Asm1', 'R1', '12345.0', 100, 2, ''))
+    conn.execute(INSERT_FI, ('2024-01-03', '1st', 'Sam', 'Cust', 'Asm1', 'R1', ' 12345 ', 100, 6, ''))
+    grades = {g['operator']: g for g in load_operator_grades(conn)}
+    assert math.isclose(grades['Jim']['coverage'], 0.25)
+
+
+def test_job_endpoints_use_job_key(conn):
+    conn.execute("INSERT INTO users (username, password, analysis) VALUES ('tester', 'pw', 1)")
+    conn.execute(INSERT_AOI, ('2024-01-01', '1st', 'Alice', 'Cust', 'Asm1', 'R1', 'j100', 10, 1, ''))
+    conn.execute(INSERT_FI, ('2024-01-01', '1st', 'Bob', 'Cust', 'Asm1', 'R1', 'J100 ', 20, 2, ''))
+    conn.commit()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        single = client.get('/analysis/compare/jobs?job_number=J100').get_json()
+        batch = client.get('/analysis/compare/jobs/batch?job_numbers=j100').get_json()
+    assert single['aoi']['rows'][0]['operator'] == 'Alice'
+    assert single['fi']['rows'][0]['operator'] == 'Bob'
+    assert batch['jobs']['j100']['fi']['rows'][0]['operator'] == 'Bob'
@@ -0,0 +1,109 @@
+import os
+import sys
+import math
+import random
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import init_db, get_db, load_operator_grades
+
+INSERT_AOI = "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)"
+INSERT_FI = "INSERT INTO fi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)"
+
+
+@pytest.fixture()
+def conn(tmp_path, monkeypatch):
+    db_path = tmp_path / 'test.db'
+    monkeypatch.setattr('run.DATABASE', str(db_path))
+    init_db()
+    conn = get_db()
+    yield conn
+    conn.close()
+
+
+def _summary(conn):
+    return {
+        r['operator']: (r['aoi_inspected'], r['aoi_rejected'], r['fi_allocated'])
+        for r in conn.execute(
+            'SELECT dim_operator.name AS operator, aoi_inspected, aoi_rejected, fi_allocated '
+            'FROM job_operator_summary JOIN dim_operator ON dim_operator.id = operator_id'
+        )
+    }
+
+
+def test_summary_tracks_inserts_updates_and_deletes(conn):
+    conn.execute(INSERT_AOI, ('2024-02-01', '1st', 'Alice', 'Cust', 'Asm1', 'R1', 'J100', 80, 8, ''))
+    conn.execute(INSERT_AOI, ('2024-02-01', '1st', 'Bob', 'Cust', 'Asm1', 'R1', 'J100', 20, 1, ''))
+    assert _summary(conn) == {'Alice': (80, 8, None), 'Bob': (20, 1, None)}
+
+    conn.execute(INSERT_FI, ('2024-02-02', '1st', 'Frank', 'Cust', 'Asm1', 'R1', 'J100', 100, 30, ''))
+    summary = _summary(conn)
+    assert math.isclose(summary['Alice'][2], 24)
+    assert math.isclose(summary['Bob'][2], 6)
+
+    # Re-splitting happens when an operator's inspected share changes
+    conn.execute('UPDATE aoi_reports SET qty_inspected = 70 WHERE id = 1')
+    summary = _summary(conn)
+    assert math.isclose(summary['Alice'][2], 30 * 70 / 90)
+    assert math.isclose(summary['Bob'][2], 30 * 20 / 90)
+
+    conn.execute('DELETE FROM aoi_reports WHERE id = 2')
+    assert math.isclose(_summary(conn)['Alice'][2], 30)
+    conn.execute('DELETE FROM fi_reports WHERE id = 1')
+    assert _summary(conn) == {'Alice': (70, 8, None)}
+    assert conn.execute('SELECT COUNT(*) FROM job_fi_summary').fetchone()[0] == 0
+
+
+def test_grades_read_from_summary(conn):
+    conn.execute(INSERT_AOI, ('2024-01-01', '1st', 'Jim', 'Cust', 'Asm1', 'R1', 'J1', 100, 2, ''))
+    conn.execute(INSERT_FI, ('2024-01-03', '1st', 'Sam', 'Cust', 'Asm1', 'R1', 'J1', 100, 6, ''))
+    conn.execute(INSERT_AOI, ('2024-01-05', '1st', 'Bob', 'Cust', 'Asm3', 'R1', 'J3', 100, 3, ''))
+    grades = {g['operator']: g for g in load_operator_grades(conn)}
+    assert math.isclose(grades['Jim']['coverage'], 0.25)
+    assert grades['Jim']['grade'] == 'D'
+    assert grades['Bob']['coverage'] is None
+
+
+def test_grades_for_date_range(conn):
+    # One job inspected across two days, FI rejects split by inspected share
+    conn.execute(INSERT_AOI, ('2024-03-01', '1st', 'Ann', 'Cust', 'Asm1', 'R1', 'J7', 75, 3, ''))
+    conn.execute(INSERT_AOI, ('2024-03-02', '1st', 'Ann', 'Cust', 'Asm1', 'R1', 'J7', 25, 1, ''))
+    conn.execute(INSERT_FI, ('2024-03-05', '1st', 'Sam', 'Cust', 'Asm1', 'R1', 'J7', 100, 4, ''))
+    first_day = {g['operator']: g for g in load_operator_grades(conn, '2024-03-01', '2024-03-01')}
+    assert math.isclose(first_day['Ann']['coverage'], 3 / (3 + 3))
+    second_day = {g['operator']: g for g in load_operator_grades(conn, start='2024-03-02')}
+    assert math.isclose(second_day['Ann']['coverage'], 1 / (1 + 1))
+    assert load_operator_grades(conn, end='2024-02-28') == []
+
+
+def test_day_summary_matches_rebuild(conn):
+    rng = random.Random(1)
+    for i in range(200):
+        insert = INSERT_AOI if rng.random() < 0.7 else INSERT_FI
+        conn.execute(insert, (
+            f'2024-04-{rng.randrange(1, 15):02d}', '1st', f'Op{rng.randrange(4)}', 'Cust',
+            f'Asm{rng.randrange(3)}', 'R1', f'J{rng.randrange(20)}',
+            rng.randrange(1, 100), rng.randrange(10), '',
+        ))
+    for _ in range(40):
+        conn.execute(
+            'UPDATE aoi_reports SET qty_inspected = ?, report_date = ? WHERE id = ?',
+            (rng.randrange(1, 100), f'2024-04-{rng.randrange(1, 15):02d}', rng.randrange(1, 200)),
+        )
+        conn.execute('DELETE FROM fi_reports WHERE id = ?', (rng.randrange(1, 200),))
+    incremental = [tuple(r) for r in conn.execute(
+        'SELECT report_date, operator_id, aoi_inspected, aoi_rejected, fi_rows, ROUND(fi_allocated, 6) '
+        'FROM operator_day_summary ORDER BY 1, 2'
+    )]
+    conn.execute('DELETE FROM job_operator_day')
+    conn.execute('DELETE FROM operator_day_summary')
+    conn.commit()
+    conn.close()
+    init_db()
+    conn = get_db()
+    rebuilt = [tuple(r) for r in conn.execute(
+        'SELECT report_date, operator_id, aoi_inspected, aoi_rejected, fi_rows, ROUND(fi_allocated, 6) '
+        'FROM operator_day_summary ORDER BY 1, 2'
+    )]
+    conn.close()
+    assert incremental == rebuilt
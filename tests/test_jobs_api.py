@@ -0,0 +1,81 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    init_db()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        yield client
+
+
+def test_jobs_page_renders(client):
+    assert client.get('/jobs').status_code == 200
+
+
+def test_add_update_and_list(client):
+    resp = client.post('/api/add', json={'name': 'Board A'})
+    assert resp.status_code == 201
+    job_id = resp.get_json()['ids'][0]
+    client.post('/api/update', json={'job_id': str(job_id), 'status': 'In Progress', 'location': 'SMT'})
+    jobs = client.get('/api/jobs').get_json()
+    assert [(j['name'], j['status'], j['location']) for j in jobs] == [('Board A', 'In Progress', 'SMT')]
+
+
+def test_polling_gets_304_then_only_changes(client):
+    client.post('/api/add', json={'jobs': [{'name': 'A'}, {'name': 'B', 'location': 'AOI'}]})
+    first = client.get('/api/jobs')
+    etag = first.headers['ETag']
+    cursor = first.headers['X-Jobs-Cursor']
+    assert len(first.get_json()) == 2
+
+    # The cursor is part of the validator: the full list's ETag does not
+    # match a since= poll, whose body differs
+    since = client.get(f'/api/jobs?since={cursor}', headers={'If-None-Match': etag})
+    assert since.status_code == 200 and since.get_json() == []
+    assert since.headers['ETag'] != etag
+    assert client.get('/api/jobs?since=0').headers['ETag'] not in (etag, since.headers['ETag'])
+    etag = since.headers['ETag']
+    unchanged = client.get(f'/api/jobs?since={cursor}', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+
+    client.post('/api/update', json={'updates': [{'job_id': 2, 'status': 'Done'}]})
+    changed = client.get(f'/api/jobs?since={cursor}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert [(j['id'], j['status'], j['location']) for j in changed.get_json()] == [(2, 'Done', 'AOI')]
+    assert int(changed.headers['X-Jobs-Cursor']) > int(cursor)
+
+
+def test_batch_update_is_atomic(client):
+    client.post('/api/add', json={'name': 'A'})
+    resp = client.post('/api/update', json={'updates': [
+        {'job_id': 1, 'status': 'Blocked'},
+        {'job_id': 99, 'status': 'Done'},
+    ]})
+    assert resp.status_code == 404
+    assert resp.get_json()['missing'] == [99]
+    assert client.get('/api/jobs').get_json()[0]['status'] == 'Waiting'
+    conn = get_db()
+    generation = conn.execute("SELECT generation FROM data_generations WHERE table_name = 'jobs'").fetchone()[0]
+    conn.close()
+    assert generation == 1
+
+
+def test_invalid_payloads_rejected(client):
+    assert client.post('/api/add', json={'name': ''}).status_code == 400
+    assert client.post('/api/add', json={'name': 'A', 'status': 'Lost'}).status_code == 400
+    assert client.post('/api/update', json={'job_id': 'x'}).status_code == 400
+    # Bodies and items that are not JSON objects
+    assert client.post('/api/add', json=[{'name': 'A'}]).status_code == 400
+    assert client.post('/api/add', json={'jobs': ['x']}).status_code == 400
+    assert client.post('/api/update', json=[1]).status_code == 400
+    assert client.post('/api/update', json={'updates': [{'job_id': 1}, None]}).status_code == 400
+    assert client.get('/api/jobs').get_json() == []
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from sap_client import MockSAPClient, SAPService, create_sap_service
+from run import (
+    app, init_db, get_db, sync_materials, claim_lease, run_background_job, run_job_location_refresh,
+    run_material_sync,
+)
+
+
+class CountingClient(MockSAPClient):
+    def __init__(self, data):
+        super().__init__(data)
+        self.listings = []
+        self.lookups = 0
+
+    def list_material_data(self, changed_since=None):
+        self.listings.append(changed_since)
+        return super().list_material_data(changed_since)
+
+    def get_material_data_batch(self, material_ids):
+        self.lookups += 1
+        return super().get_material_data_batch(material_ids)
+
+
+@pytest.fixture()
+def sap(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    client = CountingClient({
+        'P1': {'id': 'P1', 'description': 'Resistor', 'changed_at': '2024-01-01T00:00:00'},
+        'P2': {'id': 'P2', 'description': 'Capacitor', 'changed_at': '2024-01-02T00:00:00'},
+    })
+    monkeypatch.setattr('run.sap_service', SAPService(client))
+    init_db()
+    conn = get_db()
+    conn.execute("INSERT INTO users (username, password, is_admin) VALUES ('boss', 'pw', 1)")
+    conn.commit()
+    conn.close()
+    return client
+
+
+def _sync(full=False):
+    conn = get_db()
+    result = sync_materials(conn, full)
+    conn.commit()
+    conn.close()
+    return result
+
+
+def test_full_then_delta_sync(sap):
+    assert _sync() == {'mode': 'full', 'fetched': 2, 'removed': 0}
+
+    sap.data['P2'] = {'id': 'P2', 'description': 'Cap 10uF', 'changed_at': '2024-02-01T00:00:00'}
+    assert _sync() == {'mode': 'delta', 'fetched': 1, 'removed': 0}
+    assert sap.listings == [None, '2024-01-02T00:00:00']
+
+    # A full sync drops materials SAP no longer has
+    del sap.data['P1']
+    assert _sync(full=True) == {'mode': 'full', 'fetched': 1, 'removed': 1}
+    conn = get_db()
+    rows = [tuple(r) for r in conn.execute('SELECT id, description FROM materials')]
+    conn.close()
+    assert rows == [('P2', 'Cap 10uF')]
+
+
+def test_routes_read_from_mirror(sap, monkeypatch):
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'boss'
+        resp = client.post('/admin/materials/sync')
+        assert resp.get_json()['fetched'] == 2
+        assert client.get('/sap/material/P1').get_json() == {'id': 'P1', 'description': 'Resistor'}
+        assert client.get('/sap/material/NOPE').status_code == 404
+        data = client.get('/sap/materials?ids=P1,P2,NOPE').get_json()
+        assert sorted(data['materials']) == ['P1', 'P2']
+        assert data['missing'] == ['NOPE']
+        status = client.get('/admin/materials').get_json()
+    assert sap.lookups == 0
+    assert status['rows'] == 2
+    assert status['last_mode'] == 'full'
+    assert status['last_sync'] == status['last_full_sync']
+    assert status['delta_supported'] is True
+
+
+def test_failed_sync_is_recorded(sap):
+    sap.should_timeout = True
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['sync-materials'])
+    assert 'timed out' in result.output
+    conn = get_db()
+    state = conn.execute('SELECT last_sync, last_error FROM material_sync').fetchone()
+    conn.close()
+    assert state['last_sync'] is None
+    assert 'timed out' in state['last_error']
+
+    sap.should_timeout = False
+    result = runner.invoke(args=['sync-materials', '--full'])
+    assert 'full sync: 2 fetched' in result.output
+
+
+def test_pages_do_not_call_sap_before_the_first_sync(sap):
+    conn = get_db()
+    conn.execute("INSERT INTO verified_markings (part_number, verified_markings) VALUES ('P1', 'R1')")
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'boss'
+        assert b'Resistor' not in client.get('/part-markings').data
+        assert sap.lookups == 0
+        _sync()
+        assert b'Resistor' in client.get('/part-markings').data
+    assert sap.lookups == 0
+
+
+def test_background_jobs_run_in_the_lease_holder_only(sap, monkeypatch, caplog):
+    runs = []
+    monkeypatch.setattr('run.WORKER_ID', 'host:1')
+    assert run_background_job('sync', lambda: runs.append(1))
+    monkeypatch.setattr('run.WORKER_ID', 'host:2')
+    assert not run_background_job('sync', lambda: runs.append(2))
+    assert runs == [1]
+
+    # An expired lease is taken over by the next process to ask
+    conn = get_db()
+    conn.execute("UPDATE background_leases SET expires_at = '2000-01-01T00:00:00'")
+    conn.commit()
+    conn.close()
+    assert claim_lease('sync', 60)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    assert not run_background_job('sync', fail)
+    assert 'Background job sync failed' in caplog.text
+
+
+def test_lease_is_renewed_while_the_job_runs(sap, monkeypatch):
+    monkeypatch.setattr('run.LEASE_GRACE_SECONDS', 0.3)
+    expiries = []
+
+    def slow():
+        time.sleep(0.6)
+        conn = get_db()
+        expiries.append(conn.execute("SELECT expires_at FROM background_leases WHERE name = 'slow'").fetchone()[0])
+        conn.close()
+
+    started = datetime.now()
+    assert run_background_job('slow', slow)
+    # Without renewal the lease would have lapsed 0.3s after the start
+    assert datetime.fromisoformat(expiries[0]) > started + timedelta(seconds=0.5)
+
+
+def test_misconfigured_real_client_never_writes_mock_data(sap, monkeypatch):
+    _sync()
+    sap.jobs = [{'job': 'J-REAL', 'due_date': None, 'locations': [{'location': 'AOI', 'quantity': 3}]}]
+    assert run_job_location_refresh() == {'loaded': 1}
+    monkeypatch.setattr('run.sap_service', create_sap_service(use_real=True, base_url=''))
+    assert 'SAP client not configured' in run_material_sync(full=True)['error']
+    assert 'error' in run_job_location_refresh()
+    conn = get_db()
+    materials = [r[0] for r in conn.execute('SELECT id FROM materials ORDER BY id')]
+    jobs = [r[0] for r in conn.execute('SELECT job FROM job_locations')]
+    state = conn.execute('SELECT last_error FROM material_sync').fetchone()
+    conn.close()
+    assert materials == ['P1', 'P2']
+    assert jobs == ['J-REAL']
+    assert 'SAP client not configured' in state['last_error']
@@ -0,0 +1,92 @@
+import logging
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from metrics import Registry
+from run import app, init_db, REQUEST_SECONDS, REQUEST_SQL_STATEMENTS, DATA_WRITES, CACHE_LOOKUPS
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run.get_fi_rate_client', lambda: None)
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    init_db()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry('t_')
+    hits = registry.counter('hits_total', 'Hits.', ('path',))
+    hits.inc(path='/a"b')
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+    registry.gauge('size', 'Size.', collect=lambda: [((), 3)])
+    assert registry.render().splitlines() == [
+        '# HELP t_hits_total Hits.',
+        '# TYPE t_hits_total counter',
+        't_hits_total{path="/a\\"b"} 1',
+        '# HELP t_latency_seconds Latency.',
+        '# TYPE t_latency_seconds histogram',
+        't_latency_seconds_bucket{le="0.1"} 1',
+        't_latency_seconds_bucket{le="1"} 2',
+        't_latency_seconds_bucket{le="+Inf"} 3',
+        't_latency_seconds_sum 5.55',
+        't_latency_seconds_count 3',
+        '# HELP t_size Size.',
+        '# TYPE t_size gauge',
+        't_size 3',
+    ]
+
+
+def test_requests_record_latency_and_sql(client):
+    before = REQUEST_SECONDS.count(endpoint='aoi_report_data', method='GET')
+    statements = REQUEST_SQL_STATEMENTS.sum(endpoint='aoi_report_data')
+    resp = client.get('/aoi/report-data?freq=daily')
+    assert resp.status_code == 200
+    assert resp.headers['Server-Timing'].startswith('app;dur=')
+    assert REQUEST_SECONDS.count(endpoint='aoi_report_data', method='GET') == before + 1
+    assert REQUEST_SQL_STATEMENTS.sum(endpoint='aoi_report_data') > statements
+
+    hits = CACHE_LOOKUPS.value(cache='etag', result='hit')
+    client.get('/aoi/report-data?freq=daily', headers={'If-None-Match': resp.headers['ETag']})
+    assert CACHE_LOOKUPS.value(cache='etag', result='hit') == hits + 1
+
+    writes = DATA_WRITES.value(table='aoi_reports')
+    client.post('/aoi', data={
+        'report_date': '2024-03-01', 'shift': '1', 'operator': 'Op', 'customer': 'C',
+        'assembly': 'A1', 'qty_inspected': '10', 'qty_rejected': '1',
+    })
+    assert DATA_WRITES.value(table='aoi_reports') == writes + 1
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE spcapp_request_duration_seconds histogram' in text
+    assert 'spcapp_request_duration_seconds_count{endpoint="aoi_report_data",method="GET"}' in text
+    assert 'spcapp_request_sql_seconds_sum{endpoint="aoi_report_data"}' in text
+    assert 'spcapp_cache_lookups_total{cache="etag",result="hit"}' in text
+    assert 'spcapp_slow_query_threshold_seconds 0.25' in text
+
+
+def test_slow_queries_are_logged(client, monkeypatch, caplog):
+    monkeypatch.setattr('run.SLOW_QUERY_SECONDS', 0)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/uploads')
+    assert any('Slow query' in r.getMessage() and 'FROM moat' in r.getMessage() for r in caplog.records)
+
+
+def test_metrics_requires_admin_or_token(client, monkeypatch):
+    with client.session_transaction() as sess:
+        sess['user'] = 'nobody'
+    assert client.get('/metrics').status_code == 403
+    monkeypatch.setattr('run.METRICS_TOKEN', 's3cret')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    resp = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain; version=0.0.4')
@@ -4,7 +4,7 @@ import math
 import pytest
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from run import app, init_db, get_db
+from run import app, init_db, get_db, load_operator_grade_series
 
 
 @pytest.fixture()
@@ -113,3 +113,52 @@ def test_operator_grades_multiple_operators(client):
     assert math.isclose(grades['Bob']['coverage'], 1 / (1 + 6))
     assert grades['Alice']['grade'] == 'D'
     assert grades['Bob']['grade'] == 'D'
+
+
+def test_operator_grade_series(client):
+    conn = get_db()
+    insert = "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)"
+    # One job inspected by Alice across two months
+    conn.execute(insert, ('2024-01-30', '1st', 'Alice', 'Cust', 'Asm1', 'R1', 'J1', 60, 6, ''))
+    conn.execute(insert, ('2024-02-02', '1st', 'Alice', 'Cust', 'Asm1', 'R1', 'J1', 40, 4, ''))
+    conn.execute(
+        "INSERT INTO fi_reports (report_date, shift, operator, customer, assembly, rev, job_number, qty_inspected, qty_rejected, additional_info) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        ('2024-02-05', '1st', 'Sue', 'Cust', 'Asm1', 'R1', 'J1', 100, 10, ''),
+    )
+    conn.commit()
+    conn.close()
+
+    with client.session_transaction() as sess:
+        sess['user'] = 'analyst'
+    data = client.get('/analysis/operator-grades/series?freq=monthly').get_json()
+    series = {(s['operator'], s['period']): s for s in data['series']}
+    assert math.isclose(series[('Alice', '2024-01')]['fi_rejected'], 6)
+    assert math.isclose(series[('Alice', '2024-02')]['fi_rejected'], 4)
+    assert math.isclose(series[('Alice', '2024-01')]['coverage'], 0.5)
+
+    # New FI data invalidates the cached series
+    conn = get_db()
+    conn.execute("UPDATE fi_reports SET qty_rejected = 30 WHERE id = 1")
+    conn.commit()
+    conn.close()
+    data = client.get('/analysis/operator-grades/series?freq=monthly').get_json()
+    series = {(s['operator'], s['period']): s for s in data['series']}
+    assert math.isclose(series[('Alice', '2024-01')]['fi_rejected'], 18)
+
+    assert client.get('/analysis/operator-grades/series?freq=daily').status_code == 400
+
+
+def test_grade_series_cache_is_per_database(tmp_path, monkeypatch):
+    # Both databases sit at the same generation after one insert each
+    for name, operator in (('a.db', 'Alice'), ('b.db', 'Bob')):
+        monkeypatch.setattr('run.DATABASE', str(tmp_path / name))
+        init_db()
+        conn = get_db()
+        conn.execute(
+            "INSERT INTO aoi_reports (report_date, operator, assembly, job_number, qty_inspected, qty_rejected) "
+            "VALUES ('2024-01-05', ?, 'Asm1', 'J1', 10, 1)",
+            (operator,),
+        )
+        conn.commit()
+        assert [s['operator'] for s in load_operator_grade_series(conn, 'monthly')] == [operator]
+        conn.close()
@@ -0,0 +1,93 @@
+import os
+import sys
+import random
+import sqlite3
+from datetime import date, timedelta
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import app, init_db, get_db, read_ppm_rollup, PPM_PERIODS
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    db_path = tmp_path / 'test.db'
+    monkeypatch.setattr('run.DATABASE', str(db_path))
+    init_db()
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO users (username, password, analysis, reports) VALUES (?,?,1,1)",
+        ('tester', 'pw')
+    )
+    rng = random.Random(0)
+    rows = []
+    for i in range(200):
+        day = date(2023, 12, 1) + timedelta(days=rng.randrange(75))
+        rows.append((
+            f'M{rng.randrange(5)}', rng.randrange(1, 50), 10, rng.randrange(100, 1000),
+            rng.randrange(5), rng.randrange(20), '2024-03-01T00:00:00',
+            f'file{i % 7}.xls', day.isoformat(), rng.choice(['L1', 'L2', None]),
+        ))
+    conn.executemany(
+        "INSERT INTO moat (model_name, total_boards, total_parts_per_board, total_parts, ng_parts, falsecall_parts, upload_time, filename, report_date, line) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        yield client
+
+
+def _raw(conn, freq, start, end, line=None):
+    query = (
+        f"SELECT strftime('{PPM_PERIODS[freq]}', report_date) AS period, SUM(total_boards), "
+        'SUM(total_parts), SUM(falsecall_parts), SUM(ng_parts) FROM moat '
+        'WHERE report_date BETWEEN ? AND ?'
+    )
+    params = [start.isoformat(), end.isoformat()]
+    if line:
+        query += ' AND line = ?'
+        params.append(line)
+    return [tuple(r) for r in conn.execute(query + ' GROUP BY period ORDER BY period', params)]
+
+
+@pytest.mark.parametrize('freq', list(PPM_PERIODS))
+def test_rollups_match_raw_aggregation(client, freq):
+    conn = get_db()
+    conn.execute("DELETE FROM moat WHERE filename = 'file3.xls'")
+    conn.execute("UPDATE moat SET line = 'L2', total_parts = 5 WHERE filename = 'file4.xls'")
+    conn.commit()
+    start, end = date(2023, 12, 10), date(2024, 2, 5)
+    for line in (None, 'L1', 'L2'):
+        rolled = [tuple(r) for r in read_ppm_rollup(conn, freq, start, end, line or '')]
+        assert rolled == _raw(conn, freq, start, end, line)
+    conn.close()
+
+
+def test_long_daily_ranges_do_not_hit_the_variable_limit(client):
+    # Builds before SQLite 3.32 allow only 999 bound parameters
+    start, end = date(2020, 1, 1), date(2025, 12, 31)
+    conn = get_db()
+    conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    rolled = [tuple(r) for r in read_ppm_rollup(conn, 'daily', start, end)]
+    assert rolled == _raw(conn, 'daily', start, end)
+    conn.close()
+
+
+def test_report_data_reads_rollups(client):
+    conn = get_db()
+    conn.execute('DELETE FROM moat_facts')
+    conn.execute(
+        "INSERT INTO moat (model_name, total_boards, total_parts, ng_parts, falsecall_parts, report_date, line) VALUES ('M1', 2, 1000, 1, 3, '2024-01-10', 'L1')"
+    )
+    conn.commit()
+    assert conn.execute('SELECT COUNT(*) FROM moat_ppm_rollup').fetchone()[0] == 8
+    conn.close()
+    resp = client.get('/analysis/report-data?freq=weekly')
+    data = resp.get_json()
+    assert data['labels'] == ['2024-02']
+    assert data['table'][0]['boards'] == 2
+    assert data['falsecall_ppm'] == [pytest.approx(3000.0)]
+    assert data['ng_ppm'] == [pytest.approx(1000.0)]
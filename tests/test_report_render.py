@@ -0,0 +1,113 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from report_renderer import render_pdf
+from run import app, init_db, get_db
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run._report_render_cache', {})
+    init_db()
+    conn = get_db()
+    conn.executemany(
+        'INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, qty_inspected, qty_rejected) '
+        'VALUES (?,?,?,?,?,?,?)',
+        [
+            ('2024-03-01', '1', 'Alice', 'Acme', 'ASM-1', 100, 4),
+            ('2024-03-02', '2', 'Bob', 'Acme', 'ASM-2', 50, 1),
+        ],
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def test_pdf_is_well_formed_and_paginates():
+    rows = [[f'ASM-{i}', i] for i in range(200)]
+    pdf = render_pdf('Big (report)', [{'title': 'Rows', 'table': {'columns': ['A', 'B'], 'rows': rows}}])
+    assert pdf.startswith(b'%PDF-1.4') and pdf.rstrip().endswith(b'%%EOF')
+    assert pdf.count(b'/Type /Page ') > 1
+    assert b'Big \\(report\\)' in pdf
+    # The xref offset points at the table
+    xref = int(pdf.rsplit(b'startxref\n', 1)[1].split()[0])
+    assert pdf[xref:xref + 4] == b'xref'
+
+
+def test_pdf_text_uses_winansi_codes():
+    pdf = render_pdf('Costs \u20ac \u2013 \u201cnet\u201d caf\u00e9 \u4e2d', [])
+    # cp1252 codes for the euro sign, en dash and curly quotes, not Latin-1 '?'
+    assert b'Costs \x80 \x96 \x93net\x94 caf\xe9 ?' in pdf
+
+
+def test_render_aoi_pdf_and_html(client):
+    resp = client.get('/reports/render/aoi?period=weekly')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/pdf'
+    assert b'Alice' in resp.data and b'2024-02-25 to 2024-03-02' in resp.data
+
+    html = client.get('/reports/render/aoi?period=weekly&format=html').get_data(as_text=True)
+    assert '<svg' in html and 'ASM-1' in html and 'Avg reject rate: 3.33%' in html
+    assert client.get('/reports/render/aoi?period=hourly').status_code == 400
+    assert client.get('/reports/render/aoi?start=2024-03-01&end=bad').status_code == 400
+
+
+def test_render_is_cached_until_data_changes(client, monkeypatch):
+    calls = []
+    import run
+    original = run.build_report_sections
+
+    def counting(*args, **kwargs):
+        calls.append(args[1:])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr('run.build_report_sections', counting)
+    first = client.get('/reports/render/aoi?period=daily').data
+    assert client.get('/reports/render/aoi?period=daily').data == first
+    assert len(calls) == 1
+
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, qty_inspected, qty_rejected) "
+        "VALUES ('2024-03-02', '1', 'Carol', 'Acme', 'ASM-1', 10, 0)"
+    )
+    conn.commit()
+    conn.close()
+    assert b'Carol' in client.get('/reports/render/aoi?period=daily').data
+    assert len(calls) == 2
+
+
+def test_render_cache_is_per_database(client, tmp_path, monkeypatch):
+    assert b'Alice' in client.get('/reports/render/aoi?period=weekly').data
+    # Same number of writes, so the same data generation as the first database
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'other.db'))
+    init_db()
+    conn = get_db()
+    conn.executemany(
+        'INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, qty_inspected, qty_rejected) '
+        'VALUES (?,?,?,?,?,?,?)',
+        [('2024-03-01', '1', 'Zoe', 'Acme', 'ASM-1', 100, 4), ('2024-03-02', '2', 'Yan', 'Acme', 'ASM-2', 50, 1)],
+    )
+    conn.commit()
+    conn.close()
+    data = client.get('/reports/render/aoi?period=weekly').data
+    assert b'Zoe' in data and b'Alice' not in data
+
+
+def test_moat_report_and_permissions(client):
+    resp = client.get('/reports/render/moat?format=html')
+    assert resp.status_code == 200
+    assert 'No data for this period.' in resp.get_data(as_text=True)
+    conn = get_db()
+    conn.execute("INSERT INTO users (username, password) VALUES ('viewer', 'pw')")
+    conn.commit()
+    conn.close()
+    with client.session_transaction() as sess:
+        sess['user'] = 'viewer'
+    assert client.get('/reports/render/moat').status_code == 403
@@ -0,0 +1,178 @@
+import os
+import sys
+from datetime import date
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from run import (
+    app, init_db, get_db, generate_report_snapshots, record_data_event, run_nightly_reports, snapshot_period,
+)
+
+TODAY = date(2024, 3, 12)
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    init_db()
+    conn = get_db()
+    conn.executemany(
+        'INSERT INTO aoi_reports (report_date, shift, operator, customer, assembly, qty_inspected, qty_rejected) '
+        'VALUES (?,?,?,?,?,?,?)',
+        [
+            ('2024-03-04', '1', 'Alice', 'Acme', 'ASM-1', 100, 5),
+            ('2024-03-05', '1', 'Bob', 'Acme', 'ASM-1', 50, 0),
+        ],
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        yield client
+
+
+def _generate(**kwargs):
+    conn = get_db()
+    written = generate_report_snapshots(conn, today=TODAY, **kwargs)
+    conn.commit()
+    conn.close()
+    return written
+
+
+def test_snapshot_periods():
+    assert snapshot_period('daily', date(2024, 3, 5)) == ('2024-03-05', date(2024, 3, 5), date(2024, 3, 5))
+    assert snapshot_period('weekly', date(2024, 3, 5)) == ('2024-10', date(2024, 3, 4), date(2024, 3, 10))
+    # Weeks split at the turn of the year, like the PPM rollup's %Y-%W
+    assert snapshot_period('weekly', date(2024, 12, 31)) == ('2024-53', date(2024, 12, 30), date(2024, 12, 31))
+    assert snapshot_period('weekly', date(2025, 1, 2)) == ('2025-00', date(2025, 1, 1), date(2025, 1, 5))
+    assert snapshot_period('monthly', date(2024, 2, 10)) == ('2024-02', date(2024, 2, 1), date(2024, 2, 29))
+
+
+def test_snapshots_serve_closed_periods_without_raw_queries(client, monkeypatch):
+    assert _generate() > 0
+    snap = client.get('/reports/snapshots/aoi-operators/weekly/2024-10').get_json()
+    assert (snap['start'], snap['end']) == ('2024-03-04', '2024-03-10')
+    assert snap['data']['summary']['inspected'] == 150
+    latest = client.get('/reports/snapshots/aoi-yield/monthly/latest').get_json()
+    assert latest['period'] == '2024-03'
+
+    def fail(*args):
+        raise AssertionError('raw tables queried')
+
+    monkeypatch.setattr('run.load_aoi_operator_report', fail)
+    resp = client.get('/reports/aoi-operators/data?start=2024-03-04&end=2024-03-10')
+    assert resp.get_json()['summary']['inspected'] == 150
+    assert client.get('/reports/snapshots/aoi-operators/weekly/2020-01').status_code == 404
+    assert client.get('/reports/snapshots/nope').status_code == 404
+
+
+def test_only_changed_periods_are_rebuilt(client):
+    _generate()
+    # No new events: 4 reports x (2 days + 1 week + 1 month) around today
+    assert _generate() == 16
+
+    client.post('/aoi', data={
+        'report_date': '2024-02-20', 'shift': '1', 'operator': 'Carol', 'customer': 'Acme',
+        'assembly': 'ASM-2', 'qty_inspected': '40', 'qty_rejected': '2',
+    })
+    _generate()
+    snap = client.get('/reports/snapshots/aoi-operators/monthly/2024-02').get_json()
+    assert snap['data']['summary']['inspected'] == 40
+    periods = client.get('/reports/snapshots/aoi-operators').get_json()['periods']
+    assert [p['period'] for p in periods['monthly']] == ['2024-03', '2024-02']
+
+
+def test_cli_backfills_since_date(client):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['snapshot-reports', '--since', '2024-01-01'])
+    assert 'report snapshots written' in result.output
+    conn = get_db()
+    months = [r[0] for r in conn.execute(
+        "SELECT period FROM report_snapshots WHERE report = 'fi-yield' AND freq = 'monthly' ORDER BY period"
+    )]
+    conn.close()
+    assert months[:3] == ['2024-01', '2024-02', '2024-03']
+
+
+def test_snapshots_are_not_served_after_a_write(client, monkeypatch):
+    _generate()
+    client.post('/aoi', data={
+        'report_date': '2024-03-05', 'shift': '2', 'operator': 'Dave', 'customer': 'Acme',
+        'assembly': 'ASM-1', 'qty_inspected': '10', 'qty_rejected': '1',
+    })
+    data = client.get('/reports/aoi-operators/data?start=2024-03-05&end=2024-03-05').get_json()
+    assert [o['operator'] for o in data['operators']] == ['Bob', 'Dave']
+
+    # The next run rebuilds 2024-03-05 and re-stamps the periods it did not touch
+    _generate()
+
+    def fail(*args):
+        raise AssertionError('raw tables queried')
+
+    monkeypatch.setattr('run.load_aoi_operator_report', fail)
+    data = client.get('/reports/aoi-operators/data?start=2024-03-05&end=2024-03-05').get_json()
+    assert [o['operator'] for o in data['operators']] == ['Bob', 'Dave']
+    assert client.get('/reports/aoi-operators/data?start=2024-03-04&end=2024-03-04').status_code == 200
+
+
+def test_unparseable_event_dates_are_skipped(client):
+    _generate()
+    conn = get_db()
+    record_data_event(conn, 'aoi_reports', dates=['3/5/2024'])
+    conn.commit()
+    latest = conn.execute('SELECT MAX(id) FROM data_events').fetchone()[0]
+    conn.close()
+    assert _generate() == 16
+    conn = get_db()
+    state = conn.execute('SELECT last_event_id FROM report_snapshot_state').fetchone()
+    conn.close()
+    assert state['last_event_id'] == latest
+
+
+def test_nightly_run_survives_a_failed_import(client, monkeypatch):
+    def broken():
+        raise OSError('share not mounted')
+
+    monkeypatch.setattr('run.import_public_ppm_reports', broken)
+    assert run_nightly_reports() > 0
+
+
+def test_year_end_week_matches_the_rollup(client, monkeypatch):
+    client.post('/aoi', data={
+        'report_date': '2024-12-31', 'shift': '1', 'operator': 'Eve', 'customer': 'Acme',
+        'assembly': 'ASM-1', 'qty_inspected': '20', 'qty_rejected': '0',
+    })
+    conn = get_db()
+    generate_report_snapshots(conn, today=date(2025, 1, 10), since=date(2024, 12, 28))
+    conn.commit()
+    conn.close()
+    snap = client.get('/reports/snapshots/aoi-operators/weekly/2024-53').get_json()
+    assert (snap['start'], snap['end']) == ('2024-12-30', '2024-12-31')
+    ppm = client.get('/reports/snapshots/analysis-ppm/weekly/2025-00').get_json()
+    assert (ppm['start'], ppm['end']) == ('2025-01-01', '2025-01-05')
+
+    def fail(*args):
+        raise AssertionError('raw tables queried')
+
+    monkeypatch.setattr('run.load_aoi_operator_report', fail)
+    data = client.get('/reports/aoi-operators/data?start=2024-12-30&end=2024-12-31').get_json()
+    assert [o['operator'] for o in data['operators']] == ['Eve']
+
+
+def test_iso_week_snapshots_are_dropped(client):
+    _generate()
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO report_snapshots VALUES ('aoi-operators', 'weekly', '2024-W10', '2024-03-04', "
+        "'2024-03-10', 0, '2024-03-12T00:00:00', '{}')"
+    )
+    conn.commit()
+    conn.close()
+    init_db()
+    conn = get_db()
+    old = conn.execute("SELECT COUNT(*) FROM report_snapshots WHERE period LIKE '%-W%'").fetchone()[0]
+    state = conn.execute('SELECT last_event_id FROM report_snapshot_state').fetchone()
+    conn.close()
+    assert old == 0 and state['last_event_id'] is None
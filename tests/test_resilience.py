@@ -0,0 +1,194 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from resilience import CircuitBreaker, CircuitOpenError, SWRCache
+from sap_client import MockSAPClient, SAPService
+from run import app, init_db, get_db
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    def fail():
+        raise TimeoutError('slow')
+
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            breaker.call(fail)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'never called')
+
+    # After the reset timeout one failing probe reopens the circuit
+    clock.now = 10
+    with pytest.raises(TimeoutError):
+        breaker.call(fail)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    assert breaker.call(lambda: 'ok') == 'ok'
+    metrics = breaker.metrics()
+    assert metrics['state'] == 'closed'
+    assert metrics['rejected_calls'] == 1
+    assert metrics['times_opened'] == 2
+
+
+def test_breaker_ignores_lookup_misses():
+    breaker = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(KeyError):
+        breaker.call({}.__getitem__, 'missing')
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cache_serves_stale_value_while_refreshing():
+    clock = FakeClock()
+    cache = SWRCache(ttl=10, stale_ttl=100, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(clock.now)
+        return len(calls)
+
+    assert cache.get('k', loader) == 1
+    assert cache.get('k', loader) == 1
+    clock.now = 50
+    assert cache.get('k', loader) == 1
+    assert _wait_for(lambda: cache.peek('k') == (SWRCache.FRESH, 2))
+    clock.now = 500
+    assert cache.get('k', loader) == 3
+    metrics = cache.metrics()
+    assert (metrics['hits'], metrics['stale_hits'], metrics['misses']) == (1, 1, 2)
+    assert metrics['hit_rate'] == 0.5
+
+
+def test_sap_service_serves_stale_data_during_outage():
+    clock = FakeClock()
+    client = MockSAPClient()
+    service = SAPService(
+        client,
+        cache=SWRCache(ttl=10, stale_ttl=100, clock=clock),
+        breaker=CircuitBreaker(failure_threshold=1, clock=clock),
+    )
+    assert service.get_material('MAT1').description == 'Sample material 1'
+
+    client.should_timeout = True
+    clock.now = 20
+    assert service.get_material('MAT1').description == 'Sample material 1'
+    assert _wait_for(lambda: service.breaker.state == CircuitBreaker.OPEN)
+    # Uncached materials fail fast instead of waiting on SAP
+    with pytest.raises(CircuitOpenError):
+        service.get_material('MAT2')
+    assert _wait_for(lambda: service.metrics()['cache']['refresh_errors'] == 1)
+
+
+class FlakySupabase(BaseHTTPRequestHandler):
+    """``combined_reports`` stub that can be switched to slow or failing."""
+
+    mode = 'ok'
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        if self.mode == 'slow':
+            time.sleep(0.3)
+        if self.mode == 'fail':
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps([{'assembly': 'Asm1', 'fi_reject_rate': 0.1}]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def flaky():
+    pytest.importorskip('requests')
+    FlakySupabase.mode = 'ok'
+    FlakySupabase.hits = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakySupabase)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_fi_rates_stay_available_when_supabase_fails(flaky):
+    from supabase_client import FIRateClient
+
+    clock = FakeClock()
+    client = FIRateClient(
+        flaky,
+        'key',
+        budget=1,
+        timeout=0.1,
+        cache=SWRCache(ttl=10, stale_ttl=100, clock=clock),
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60, clock=clock),
+    )
+    assert client.get_rates(['Asm1']) == ({'Asm1': 0.1}, [])
+
+    FlakySupabase.mode = 'fail'
+    clock.now = 20
+    # Stale rate is returned at once; refreshes fail in the background
+    assert client.get_rates(['Asm1']) == ({'Asm1': 0.1}, [])
+    assert _wait_for(lambda: not client._inflight)
+    assert client.get_rates(['Asm2']) == ({}, ['Asm2'])
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # While open, lookups no longer reach the server
+    FlakySupabase.mode = 'slow'
+    hits = FlakySupabase.hits
+    started = time.monotonic()
+    assert client.get_rates(['Asm3']) == ({}, ['Asm3'])
+    assert time.monotonic() - started < 0.2
+    assert FlakySupabase.hits == hits
+    assert client.metrics()['breaker']['rejected_calls'] >= 1
+
+
+def test_integration_status_requires_admin(tmp_path, monkeypatch):
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.delenv('SUPABASE_URL', raising=False)
+    init_db()
+    conn = get_db()
+    conn.execute("INSERT INTO users (username, password, is_admin) VALUES ('boss', 'pw', 1)")
+    conn.execute("INSERT INTO users (username, password) VALUES ('clerk', 'pw')")
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'clerk'
+        assert client.get('/admin/integrations').status_code == 403
+        with client.session_transaction() as sess:
+            sess['user'] = 'boss'
+        data = client.get('/admin/integrations').get_json()
+    assert data['supabase'] is None
+    assert data['sap']['breaker']['state'] == 'closed'
@@ -3,7 +3,8 @@ import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from sap_client import MockSAPClient, SAPService, create_sap_service
+from resilience import SWRCache
+from sap_client import MockSAPClient, SAPClient, SAPService, create_sap_service
 
 
 def test_mock_service_returns_material():
@@ -23,3 +24,91 @@ def test_timeout_raises_timeout_error():
     service = SAPService(MockSAPClient(should_timeout=True))
     with pytest.raises(TimeoutError):
         service.get_material('MAT1')
+
+
+class CountingClient(MockSAPClient):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def get_material_data_batch(self, material_ids):
+        self.batches.append(list(material_ids))
+        return super().get_material_data_batch(material_ids)
+
+
+def test_get_materials_uses_one_batch_and_cache():
+    client = CountingClient()
+    service = SAPService(client, cache=SWRCache(max_entries=10))
+    materials = service.get_materials(['MAT1', 'MAT2', 'NOPE', 'MAT1'])
+    assert sorted(materials) == ['MAT1', 'MAT2']
+    assert materials['MAT2'].description == 'Sample material 2'
+    assert client.batches == [['MAT1', 'MAT2', 'NOPE']]
+
+    # Known and unknown ids are both served from cache afterwards
+    assert sorted(service.get_materials(['MAT1', 'NOPE', 'MAT2'])) == ['MAT1', 'MAT2']
+    assert len(client.batches) == 1
+    assert service.get_material('MAT1').id == 'MAT1'
+    with pytest.raises(KeyError):
+        service.get_material('NOPE')
+
+
+def test_default_batch_falls_back_to_single_lookups():
+    class SingleOnly(SAPClient):
+        def get_material_data(self, material_id):
+            return MockSAPClient().get_material_data(material_id)
+
+    assert list(SingleOnly().get_material_data_batch(['MAT2', 'X'])) == ['MAT2']
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SWRCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.lookup('a')
+    cache.put('c', 3)
+    assert cache.peek('b')[0] == SWRCache.MISSING
+    assert cache.peek('a') == (SWRCache.FRESH, 1)
+    assert cache.metrics()['evictions'] == 1
+
+
+def test_bulk_material_route(tmp_path, monkeypatch):
+    from run import app, init_db
+
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run.sap_service', SAPService(MockSAPClient(), cache=SWRCache()))
+    init_db()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        data = client.get('/sap/materials?ids=MAT1,NOPE,MAT1').get_json()
+        assert data == {
+            'materials': {'MAT1': {'id': 'MAT1', 'description': 'Sample material 1'}},
+            'missing': ['NOPE'],
+        }
+        assert client.get('/sap/materials').status_code == 400
+        monkeypatch.setattr('run.sap_service', SAPService(MockSAPClient(should_timeout=True)))
+        assert client.get('/sap/materials?ids=MAT1').status_code == 504
+
+
+def test_pages_render_without_sap_descriptions_when_sap_is_down(tmp_path, monkeypatch):
+    from run import app, init_db, get_db
+
+    class Unreachable(MockSAPClient):
+        def get_material_data_batch(self, material_ids):
+            raise ConnectionError('connection refused')
+
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run.sap_service', SAPService(Unreachable(), cache=SWRCache()))
+    init_db()
+    conn = get_db()
+    conn.execute("INSERT INTO verified_markings (part_number, verified_markings) VALUES ('MAT1', 'ABC')")
+    conn.execute("INSERT INTO stencils (stencil_number, part_number) VALUES ('S1', 'MAT2')")
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'ADMIN'
+        for path in ('/part-markings', '/rework'):
+            resp = client.get(path)
+            assert resp.status_code == 200
+            assert b'Sample material' not in resp.data
@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(__file__))
+from sap_client import HTTPResponse, HTTPTransport, RealSAPClient, SAPService, create_sap_service
+from sap_stub import sap_stub_server
+
+
+@pytest.fixture()
+def stub():
+    with sap_stub_server() as server:
+        yield server
+
+
+def test_real_client_fetches_single_and_batched_materials(stub):
+    client = RealSAPClient(stub.base_url)
+    assert client.get_material_data('MAT1')['description'] == 'Sample material 1'
+    with pytest.raises(KeyError):
+        client.get_material_data('NOPE')
+    assert sorted(client.get_material_data_batch(['MAT1', 'MAT2', 'NOPE'])) == ['MAT1', 'MAT2']
+    # All calls reuse one keep-alive connection
+    assert len(stub.connections) == 1
+
+
+def test_service_from_factory_uses_real_client(stub):
+    service = create_sap_service(use_real=True, base_url=stub.base_url)
+    assert service.get_materials(['MAT2'])['MAT2'].description == 'Sample material 2'
+
+
+def test_real_client_requires_base_url(caplog):
+    with pytest.raises(ValueError):
+        RealSAPClient('')
+    # The app still starts, but SAP calls fail instead of serving mock data
+    service = create_sap_service(use_real=True, base_url='')
+    with pytest.raises(ConnectionError):
+        service.get_material('MAT1')
+    with pytest.raises(ConnectionError):
+        service.list_job_locations()
+    assert 'SAP client not configured' in caplog.text
+
+
+def test_retries_with_backoff_on_server_errors(stub):
+    stub.failures = 2
+    sleeps = []
+    client = RealSAPClient(stub.base_url, retries=2, backoff=0.1, sleep=sleeps.append)
+    assert client.get_material_data('MAT1')['id'] == 'MAT1'
+    assert sleeps == [0.1, 0.2]
+
+    stub.failures = 3
+    with pytest.raises(ConnectionError):
+        client.get_material_data('MAT1')
+
+
+def test_backoff_releases_the_concurrency_slot():
+    class FlakyTransport(HTTPTransport):
+        calls = 0
+
+        def get(self, url, *, params=None, timeout):
+            self.calls += 1
+            return HTTPResponse(503 if self.calls == 1 else 200, {'id': 'MAT1', 'description': 'x'})
+
+    free_while_sleeping = []
+
+    def sleep(seconds):
+        free = client._slots.acquire(blocking=False)
+        if free:
+            client._slots.release()
+        free_while_sleeping.append(free)
+
+    client = RealSAPClient('http://sap', transport=FlakyTransport(), max_concurrency=1, sleep=sleep)
+    assert client.get_material_data('MAT1')['id'] == 'MAT1'
+    assert free_while_sleeping == [True]
+
+
+def test_per_call_timeout(stub):
+    stub.delay = 0.5
+    client = RealSAPClient(stub.base_url, timeout=0.1, retries=0)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.get_material_data('MAT1')
+    assert time.monotonic() - started < 0.4
+
+
+def test_concurrency_is_bounded(stub):
+    stub.delay = 0.2
+    client = RealSAPClient(stub.base_url, max_concurrency=2, timeout=1)
+    threads = [threading.Thread(target=client.get_material_data, args=('MAT1',)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stub.requests == 6
+    assert stub.peak_active <= 2
+
+
+def test_waiting_for_a_slot_times_out():
+    release = threading.Event()
+
+    class BlockingTransport(HTTPTransport):
+        def get(self, url, *, params=None, timeout):
+            release.wait()
+            return HTTPResponse(200, {'id': 'MAT1', 'description': 'x'})
+
+    client = RealSAPClient('http://sap', transport=BlockingTransport(), max_concurrency=1, timeout=0.1)
+    busy = threading.Thread(target=client.get_material_data, args=('MAT1',))
+    busy.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            client.get_material_data('MAT1')
+    finally:
+        release.set()
+        busy.join()
+
+
+def test_service_wraps_real_client_failures(stub):
+    stub.delay = 0.3
+    service = SAPService(RealSAPClient(stub.base_url, timeout=0.05, retries=0))
+    with pytest.raises(TimeoutError):
+        service.get_material('MAT1')
+
+
+def test_real_client_lists_changed_materials(stub):
+    stub.materials['MAT3'] = {'id': 'MAT3', 'description': 'New', 'changed_at': '2024-05-01T00:00:00'}
+    client = RealSAPClient(stub.base_url)
+    assert len(client.list_material_data()) == 3
+    assert [m['id'] for m in client.list_material_data('2024-01-01T00:00:00')] == ['MAT3']
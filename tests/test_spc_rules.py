@@ -0,0 +1,159 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from spc_rules import SeriesState, evaluate_point
+from run import app, init_db, get_db, refresh_spc_rules
+
+
+def _feed(values):
+    state = SeriesState()
+    return [evaluate_point(state, v) for v in values], state
+
+
+BASELINE = [10, 11, 9, 10, 11, 9, 10, 11, 9, 10]
+
+
+def test_point_beyond_three_sigma():
+    hits, _ = _feed(BASELINE + [20])
+    assert 'WE1' in hits[-1]
+    assert all(not h for h in hits[:-1])
+
+
+def test_two_of_three_beyond_two_sigma():
+    hits, _ = _feed(BASELINE + [12.2, 10, 12.2])
+    assert 'WE2' in hits[-1]
+
+
+def test_run_of_eight_on_one_side():
+    hits, _ = _feed(BASELINE * 3 + [10.5] * 8)
+    assert 'WE4' in hits[-1]
+    assert 'WE4' not in hits[-2]
+
+
+def test_trend_of_six():
+    hits, _ = _feed([1, 2, 3, 4, 5, 6])
+    assert hits[-1] == ['NELSON3']
+
+
+def test_state_round_trip():
+    _, state = _feed(BASELINE)
+    restored = SeriesState.from_json(state.to_json())
+    assert restored == state
+    assert evaluate_point(restored, 20) == evaluate_point(state, 20)
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    db_path = tmp_path / 'test.db'
+    monkeypatch.setattr('run.DATABASE', str(db_path))
+    init_db()
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO users (username, password, analysis) VALUES (?,?,1)",
+        ('tester', 'pw'),
+    )
+    conn.executemany(
+        "INSERT INTO moat (model_name, total_boards, falsecall_parts, report_date) VALUES (?,?,?,?)",
+        [('M1', 10, v, f'2024-01-{i + 1:02d}') for i, v in enumerate(BASELINE)],
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        yield client
+
+
+def _add_moat(values):
+    conn = get_db()
+    conn.executemany(
+        "INSERT INTO moat (model_name, total_boards, falsecall_parts, report_date) VALUES ('M1', 10, ?, ?)",
+        values,
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_violations_endpoint_processes_new_points_only(client):
+    refresh_spc_rules()
+    resp = client.get('/analysis/spc-violations?type=moat')
+    assert resp.get_json()['violations'] == []
+
+    _add_moat([(20, '2024-01-20')])
+    # Reading does not evaluate; the write paths do
+    assert client.get('/analysis/spc-violations?type=moat').get_json()['violations'] == []
+    refresh_spc_rules()
+
+    resp = client.get('/analysis/spc-violations?type=moat&key=M1')
+    data = resp.get_json()
+    assert [v['rule'] for v in data['violations']] == ['WE1']
+    assert data['violations'][0]['report_date'] == '2024-01-20'
+
+    conn = get_db()
+    watermark = conn.execute("SELECT last_id FROM spc_watermarks WHERE series_type = 'moat'").fetchone()[0]
+    state = conn.execute("SELECT * FROM spc_series_state WHERE series_key = 'M1'").fetchone()
+    conn.close()
+    assert watermark == 11
+    assert SeriesState.from_json(state['state']).n == 11
+    assert (state['last_date'], state['last_id']) == ('2024-01-20', 11)
+
+    # A second run finds nothing new and records no duplicates
+    refresh_spc_rules()
+    resp = client.get('/analysis/spc-violations?type=moat')
+    assert len(resp.get_json()['violations']) == 1
+
+
+def test_backfilled_points_replay_the_series_in_date_order(client):
+    refresh_spc_rules()
+    _add_moat([(20, '2024-01-20')])
+    refresh_spc_rules()
+    # A day-11 upload arriving late: the spike is now judged against it
+    _add_moat([(10, '2024-01-11')])
+    refresh_spc_rules()
+
+    conn = get_db()
+    state = conn.execute("SELECT * FROM spc_series_state WHERE series_key = 'M1'").fetchone()
+    rows = conn.execute('SELECT source_id, report_date FROM spc_violations').fetchall()
+    conn.close()
+    assert SeriesState.from_json(state['state']).n == 12
+    assert (state['last_date'], state['last_id']) == ('2024-01-20', 11)
+    assert [tuple(r) for r in rows] == [(11, '2024-01-20')]
+
+
+def test_deleted_and_edited_rows_rebuild_the_series(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'WTF_CSRF_ENABLED', False)
+    _add_moat([(20, '2024-01-20')])
+    refresh_spc_rules()
+    with client.session_transaction() as sess:
+        sess['user'] = 'ADMIN'
+
+    conn = get_db()
+    conn.execute("UPDATE moat SET falsecall_parts = 10 WHERE id = 11")
+    conn.commit()
+    conn.close()
+    refresh_spc_rules()
+    assert client.get('/analysis/spc-violations?type=moat').get_json()['violations'] == []
+
+    conn = get_db()
+    conn.execute("UPDATE moat SET falsecall_parts = 25, filename = 'spike.xlsx' WHERE id = 11")
+    conn.commit()
+    conn.close()
+    refresh_spc_rules()
+    assert len(client.get('/analysis/spc-violations?type=moat').get_json()['violations']) == 1
+
+    resp = client.post('/uploads/delete', json={'filename': 'spike.xlsx'})
+    assert resp.status_code == 200
+    assert client.get('/analysis/spc-violations?type=moat').get_json()['violations'] == []
+    conn = get_db()
+    state = conn.execute("SELECT state FROM spc_series_state WHERE series_key = 'M1'").fetchone()
+    dirty = conn.execute('SELECT COUNT(*) FROM spc_dirty').fetchone()[0]
+    conn.close()
+    assert SeriesState.from_json(state['state']).n == 10
+    assert dirty == 0
+
+
+def test_violations_endpoint_rejects_unknown_type(client):
+    resp = client.get('/analysis/spc-violations?type=bogus')
+    assert resp.status_code == 400
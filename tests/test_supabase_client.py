@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip('requests')
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from supabase_client import FIRateClient
+from run import app, init_db, get_db
+
+RATES = {'Asm1': 0.02, 'Asm,2': 0.05}
+
+
+class StubSupabase(BaseHTTPRequestHandler):
+    """Minimal ``combined_reports`` endpoint understanding ``assembly=in.(...)``."""
+
+    delay = 0.0
+    requests_seen = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        type(self).requests_seen.append(query)
+        time.sleep(type(self).delay)
+        values = json.loads('[' + query['assembly'][0][len('in.('):-1] + ']')
+        rows = [{'assembly': a, 'fi_reject_rate': RATES[a]} for a in values if a in RATES]
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub():
+    StubSupabase.delay = 0.0
+    StubSupabase.requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSupabase)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_rates_fetched_in_one_batch_and_cached(stub):
+    client = FIRateClient(stub, 'key', budget=2)
+    rates, pending = client.get_rates(['Asm1', 'Asm,2', 'Asm3', 'Asm1'])
+    assert rates == {'Asm1': 0.02, 'Asm,2': 0.05, 'Asm3': None}
+    assert pending == []
+    assert len(StubSupabase.requests_seen) == 1
+
+    client.get_rates(['Asm1', 'Asm3'])
+    assert len(StubSupabase.requests_seen) == 1
+
+
+def test_slow_lookup_returns_pending_within_budget(stub):
+    StubSupabase.delay = 0.5
+    client = FIRateClient(stub, 'key', budget=0.05)
+    started = time.monotonic()
+    rates, pending = client.get_rates(['Asm1'])
+    assert time.monotonic() - started < 0.4
+    assert rates == {}
+    assert pending == ['Asm1']
+
+    # The lookup completes in the background and later calls are served from cache
+    time.sleep(0.7)
+    rates, pending = client.get_rates(['Asm1'])
+    assert rates == {'Asm1': 0.02}
+    assert pending == []
+    assert len(StubSupabase.requests_seen) == 1
+
+
+def test_report_data_includes_pending_assemblies(stub, tmp_path, monkeypatch):
+    StubSupabase.delay = 0.5
+    monkeypatch.setattr('run.DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr('run._fi_rate_client', None)
+    monkeypatch.setenv('SUPABASE_URL', stub)
+    monkeypatch.setenv('SUPABASE_KEY', 'key')
+    monkeypatch.setenv('SUPABASE_TIME_BUDGET', '0.05')
+    init_db()
+    conn = get_db()
+    conn.execute("INSERT INTO users (username, password, aoi) VALUES ('tester', 'pw', 1)")
+    conn.execute(
+        "INSERT INTO aoi_reports (report_date, operator, assembly, job_number, qty_inspected, qty_rejected) "
+        "VALUES ('2024-01-01', 'Alice', 'Asm1', 'J1', 10, 1)"
+    )
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user'] = 'tester'
+        data = client.get('/aoi/report-data?freq=daily').get_json()
+        assert data['fi_pending'] == ['Asm1']
+        assert data['assemblies'][0]['fi_reject_rate'] is None
+        time.sleep(0.7)
+        data = client.get('/aoi/report-data?freq=daily').get_json()
+    assert data['fi_pending'] == []
+    assert data['assemblies'][0]['fi_reject_rate'] == 0.02